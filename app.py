@@ -4,7 +4,9 @@ Single-page app with sidebar navigation and purple gradient theme
 """
 
 import streamlit as st
+import threading
 from datetime import datetime
+from config.settings import Settings
 from config.database import init_db, get_db
 from database.models import Project, ResearchData, GeneratedContent
 from utils.session_manager import initialize_session_state
@@ -15,6 +17,7 @@ from pages.ideate import render_ideate_page
 from pages.prototype import render_prototype_page
 from pages.test import render_test_page
 from pages.implement import render_implement_page
+from services.llm_registry import get_llm_registry
 
 import os
 
@@ -35,6 +38,17 @@ def load_css():
     except FileNotFoundError:
         pass
 
+@st.cache_resource(show_spinner=False)
+def warm_up_ai_clients():
+    """Open pooled AI client connections once per server process (in the background)"""
+    registry = get_llm_registry()
+    threading.Thread(
+        target=registry.warm_up,
+        args=(Settings.AI_WARMUP_MODELS,),
+        daemon=True
+    ).start()
+    return registry
+
 # Stage configuration
 STAGES = {
     1: {"name": "Empathise", "icon": "💭", "indicator": "🟢"},
@@ -170,6 +184,9 @@ def main():
     # Initialize database
     init_db()
 
+    # Shared AI clients (no-op after the first run)
+    warm_up_ai_clients()
+
     # Initialize session state
     initialize_session_state()
 
@@ -0,0 +1,101 @@
+"""
+Job Status Component
+Progress display for background generation jobs (see services/job_runner.py)
+"""
+
+import streamlit as st
+from typing import List, Optional
+from config.settings import Settings
+from config.database import get_db
+from database.crud.jobs import ACTIVE_STATUSES, get_job, get_project_jobs
+
+JOB_LABELS = {
+    "roadmap": "🧠 Roadmap",
+    "tasks": "🧠 Tasks",
+    "define_analyses": "🤖 Define analyses",
+    "mockup": "🎨 Mockup",
+    "mockup_refine": "🔄 Mockup refinement",
+}
+
+def _matches(job, params: Optional[dict]) -> bool:
+    """Whether a job's params contain every key/value in params"""
+    return not params or all((job.params or {}).get(name) == value for name, value in params.items())
+
+def watch_job(key: str, job_id: int):
+    """
+    Report a job's outcome in the display_job_status block with the same key
+
+    Args:
+        key: Key of the display_job_status block
+        job_id: Job ID returned by submit_job
+    """
+    st.session_state.setdefault(f"jobs_watched_{key}", set()).add(job_id)
+
+def display_job_status(project_id: int, job_types: List[str], key: str, params: Optional[dict] = None):
+    """
+    Show progress of a project's queued and running jobs
+
+    Polls while jobs are active without blocking the rest of the page. When
+    a watched job finishes, the page reruns so the rows it created appear,
+    and its success or error is shown once.
+
+    Args:
+        project_id: Project ID
+        job_types: Job types to show
+        key: Unique key for this block on the page
+        params: Only show jobs whose params contain these values
+    """
+    watched_key = f"jobs_watched_{key}"
+    finished_key = f"jobs_finished_{key}"
+
+    for status, label, error in st.session_state.pop(finished_key, []):
+        if status == "succeeded":
+            st.success(f"✅ {label} finished")
+        else:
+            st.error(f"❌ {label} failed: {error}")
+
+    db = get_db()
+    try:
+        has_active = any(
+            _matches(job, params) for job in get_project_jobs(db, project_id, job_types, active_only=True)
+        )
+    finally:
+        db.close()
+
+    watched = st.session_state.setdefault(watched_key, set())
+    if not has_active and not watched:
+        return
+
+    @st.fragment(run_every=Settings.JOB_POLL_SECONDS)
+    def job_progress():
+        db = get_db()
+        try:
+            jobs = get_project_jobs(db, project_id, job_types, active_only=True)
+            active_ids = {job.id for job in jobs}
+            for job_id in watched - active_ids:
+                job = get_job(db, job_id)
+                if job:
+                    jobs.append(job)
+                else:
+                    watched.discard(job_id)
+        finally:
+            db.close()
+
+        finished = []
+        for job in jobs:
+            if not _matches(job, params):
+                continue
+            label = JOB_LABELS.get(job.job_type, job.job_type)
+            if job.status in ACTIVE_STATUSES:
+                watched.add(job.id)
+                message = job.progress_message or ("Waiting for a worker..." if job.status == "queued" else "Working...")
+                st.progress(job.progress or 0.0, text=f"{label}: {message}")
+            else:
+                watched.discard(job.id)
+                finished.append((job.status, label, job.error))
+
+        if finished:
+            st.session_state[finished_key] = finished
+            st.rerun(scope="app")
+
+    job_progress()
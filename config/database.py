@@ -3,18 +3,96 @@ Database Configuration
 SQLAlchemy setup and session management
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from config.settings import Settings
 from contextlib import contextmanager
+import threading
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune each new SQLite connection
+
+    WAL lets readers run alongside the writer, and synchronous=NORMAL is
+    durable in WAL mode while fsyncing far less often. busy_timeout makes
+    a writer wait for the lock instead of failing with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {Settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode = {Settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {Settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size = -{Settings.SQLITE_CACHE_SIZE_KB}")  # Negative = KiB
+        cursor.execute(f"PRAGMA mmap_size = {Settings.SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+def create_app_engine(url: str = None) -> Engine:
+    """
+    Create an engine with the production profile for its backend
+
+    SQLite connections get the pragmas from _apply_sqlite_pragmas; other
+    backends get a pre-pinged, recycled connection pool sized by the DB_POOL_*
+    settings. SQL is only logged when SQL_ECHO is set.
+
+    Args:
+        url: Database URL, defaults to Settings.DATABASE_URL
+
+    Returns:
+        SQLAlchemy engine
+    """
+    url = url or Settings.DATABASE_URL
+    if url.startswith("sqlite"):
+        sqlite_engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": Settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+            },
+            echo=Settings.SQL_ECHO
+        )
+        event.listen(sqlite_engine, "connect", _apply_sqlite_pragmas)
+        return sqlite_engine
+
+    return create_engine(
+        url,
+        pool_size=Settings.DB_POOL_SIZE,
+        max_overflow=Settings.DB_MAX_OVERFLOW,
+        pool_timeout=Settings.DB_POOL_TIMEOUT,
+        pool_recycle=Settings.DB_POOL_RECYCLE,
+        pool_pre_ping=Settings.DB_POOL_PRE_PING,
+        echo=Settings.SQL_ECHO
+    )
+
+def describe_engine(db_engine: Engine) -> dict:
+    """
+    Effective settings of an engine, read back from the database for SQLite
+
+    Args:
+        db_engine: SQLAlchemy engine
+
+    Returns:
+        Dictionary of setting name -> value
+    """
+    settings = {"backend": db_engine.dialect.name, "echo": db_engine.echo}
+    if db_engine.dialect.name == "sqlite":
+        with db_engine.connect() as conn:
+            for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout"):
+                settings[pragma] = conn.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+    else:
+        settings.update({
+            "pool_size": db_engine.pool.size(),
+            "max_overflow": Settings.DB_MAX_OVERFLOW,
+            "pool_timeout": Settings.DB_POOL_TIMEOUT,
+            "pool_recycle": Settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": Settings.DB_POOL_PRE_PING,
+        })
+    return settings
 
 # Create database engine
-engine = create_engine(
-    Settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in Settings.DATABASE_URL else {},
-    echo=Settings.DEBUG
-)
+engine = create_app_engine()
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -22,11 +100,24 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create Base class for models
 Base = declarative_base()
 
+_settings_logged = False
+_settings_lock = threading.Lock()
+
 def init_db():
-    """Initialize database - create all tables"""
+    """Initialize database - create all tables and log the engine settings once per process"""
+    global _settings_logged
     from database.models import Project, StageProgress, ResearchData, GeneratedContent, Template
     Base.metadata.create_all(bind=engine)
 
+    with _settings_lock:
+        if not _settings_logged:
+            _settings_logged = True
+            try:
+                settings = describe_engine(engine)
+                print("Database engine: " + ", ".join(f"{name}={value}" for name, value in settings.items()))
+            except Exception as e:
+                print(f"Warning: could not read database engine settings: {str(e)}")
+
 def get_db() -> Session:
     """
     Get database session
@@ -45,6 +45,24 @@ class Settings:
 
     # Database
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./design_thinking.db')
+    SQL_ECHO = os.getenv('SQL_ECHO', 'False').lower() == 'true'  # Log every SQL statement (independent of DEBUG)
+
+    # SQLite tuning, applied to every connection
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+    # Connection pool for server databases (PostgreSQL, MySQL)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
+
+    DB_TEXT_COMPRESSION = os.getenv('DB_TEXT_COMPRESSION', 'zstd').lower()  # zstd, zlib or none (large generated text columns)
+    DB_TEXT_COMPRESSION_LEVEL = int(os.getenv('DB_TEXT_COMPRESSION_LEVEL', '6'))
 
     # Security
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -61,13 +79,114 @@ class Settings:
     BASE_DIR = Path(__file__).resolve().parent.parent
     UPLOAD_DIR = BASE_DIR / 'data' / 'uploads'
     EXPORT_DIR = BASE_DIR / 'data' / 'exports'
+    BLOB_DIR = Path(os.getenv('BLOB_DIR', str(BASE_DIR / 'data' / 'blobs')))  # Filesystem blob store root
     TEMPLATE_DIR = BASE_DIR / 'assets' / 'templates'
 
+    # Image blob store for sketches and mockups: filesystem (BLOB_DIR, sharded by SHA-256) or database (image_blobs table)
+    BLOB_STORE = os.getenv('BLOB_STORE', 'filesystem').lower()
+
+    # WebP variants served by the prototype steps instead of the original image
+    IMAGE_THUMBNAIL_SIZE = int(os.getenv('IMAGE_THUMBNAIL_SIZE', '256'))  # Longest side of history thumbnails
+    IMAGE_DISPLAY_SIZE = int(os.getenv('IMAGE_DISPLAY_SIZE', '1024'))  # Longest side of the full-width view
+    IMAGE_VARIANT_QUALITY = int(os.getenv('IMAGE_VARIANT_QUALITY', '80'))
+    IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', '2'))
+
     # OpenAI
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4.1')
     OPENAI_TEMPERATURE = float(os.getenv('OPENAI_TEMPERATURE', '0.7'))
     OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', '16000'))  # Increased for comprehensive outputs like affinity mapping
 
+    # Shared LLM client pool (see services/llm_registry.py)
+    AI_HTTP_MAX_CONNECTIONS = int(os.getenv('AI_HTTP_MAX_CONNECTIONS', '50'))
+    AI_HTTP_MAX_KEEPALIVE = int(os.getenv('AI_HTTP_MAX_KEEPALIVE', '20'))
+    AI_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('AI_HTTP_KEEPALIVE_EXPIRY', '120'))  # seconds
+    AI_REQUEST_TIMEOUT = float(os.getenv('AI_REQUEST_TIMEOUT', '600'))  # seconds
+    AI_MAX_CONCURRENCY = {  # Concurrent requests per provider for batch generation
+        'openai': int(os.getenv('AI_MAX_CONCURRENCY_OPENAI', '6')),
+        'anthropic': int(os.getenv('AI_MAX_CONCURRENCY_ANTHROPIC', '4')),
+        'xai': int(os.getenv('AI_MAX_CONCURRENCY_XAI', '4')),
+        'fake': int(os.getenv('AI_MAX_CONCURRENCY_FAKE', '16')),
+    }
+    AI_WARMUP_MODELS = [m.strip() for m in os.getenv('AI_WARMUP_MODELS', OPENAI_MODEL).split(',') if m.strip()]
+
+    # Provider rate limits (requests/min and tokens/min, shared by all sessions in a process)
+    AI_RATE_LIMITS = {
+        'openai': {
+            'rpm': int(os.getenv('AI_RATE_LIMIT_OPENAI_RPM', '500')),
+            'tpm': int(os.getenv('AI_RATE_LIMIT_OPENAI_TPM', '200000')),
+        },
+        'anthropic': {
+            'rpm': int(os.getenv('AI_RATE_LIMIT_ANTHROPIC_RPM', '50')),
+            'tpm': int(os.getenv('AI_RATE_LIMIT_ANTHROPIC_TPM', '40000')),
+        },
+        'xai': {
+            'rpm': int(os.getenv('AI_RATE_LIMIT_XAI_RPM', '60')),
+            'tpm': int(os.getenv('AI_RATE_LIMIT_XAI_TPM', '100000')),
+        },
+        'fake': {
+            'rpm': int(os.getenv('AI_RATE_LIMIT_FAKE_RPM', '100000')),
+            'tpm': int(os.getenv('AI_RATE_LIMIT_FAKE_TPM', '100000000')),
+        },
+    }
+    AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '5'))
+    AI_BACKOFF_BASE_SECONDS = float(os.getenv('AI_BACKOFF_BASE_SECONDS', '1.0'))
+    AI_BACKOFF_MAX_SECONDS = float(os.getenv('AI_BACKOFF_MAX_SECONDS', '60'))
+
+    # AI Response Cache (in-process LRU + database table)
+    AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'True').lower() == 'true'
+    AI_CACHE_TTL_SECONDS = int(os.getenv('AI_CACHE_TTL_SECONDS', '86400'))  # 24 hours
+    AI_CACHE_MEMORY_ENTRIES = int(os.getenv('AI_CACHE_MEMORY_ENTRIES', '256'))
+    AI_CACHE_MAX_ROWS = int(os.getenv('AI_CACHE_MAX_ROWS', '5000'))
+
+    # Prompt assembly: cap on input tokens per request, even for very large context windows
+    AI_PROMPT_MAX_INPUT_TOKENS = int(os.getenv('AI_PROMPT_MAX_INPUT_TOKENS', '100000'))
+    # Mark static system prompts as cacheable (Anthropic cache_control; OpenAI caches prefixes automatically)
+    AI_PROMPT_CACHING_ENABLED = os.getenv('AI_PROMPT_CACHING_ENABLED', 'True').lower() == 'true'
+
+    # LLM call telemetry (written to llm_call_logs in background batches)
+    AI_TELEMETRY_ENABLED = os.getenv('AI_TELEMETRY_ENABLED', 'True').lower() == 'true'
+    AI_TELEMETRY_BATCH_SIZE = int(os.getenv('AI_TELEMETRY_BATCH_SIZE', '50'))
+    AI_TELEMETRY_FLUSH_SECONDS = float(os.getenv('AI_TELEMETRY_FLUSH_SECONDS', '2.0'))
+
+    # Vision uploads: downscale to the model's working resolution and re-encode before sending
+    AI_VISION_PREPROCESS = os.getenv('AI_VISION_PREPROCESS', 'True').lower() == 'true'
+    AI_VISION_FORMAT = os.getenv('AI_VISION_FORMAT', 'JPEG')  # JPEG or WEBP
+    AI_VISION_QUALITY = int(os.getenv('AI_VISION_QUALITY', '85'))
+    AI_VISION_DETAIL = os.getenv('AI_VISION_DETAIL', 'auto')  # auto, low or high
+
+    # Single-flight: identical requests in flight (any process) are waited for instead of re-sent
+    AI_SINGLE_FLIGHT_ENABLED = os.getenv('AI_SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+    AI_SINGLE_FLIGHT_LEASE_SECONDS = float(os.getenv('AI_SINGLE_FLIGHT_LEASE_SECONDS', '60'))
+    AI_SINGLE_FLIGHT_RESULT_SECONDS = float(os.getenv('AI_SINGLE_FLIGHT_RESULT_SECONDS', '60'))
+    AI_SINGLE_FLIGHT_POLL_SECONDS = float(os.getenv('AI_SINGLE_FLIGHT_POLL_SECONDS', '0.5'))
+    AI_SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv('AI_SINGLE_FLIGHT_WAIT_SECONDS', '600'))
+
+    # Model for repairing structured output that failed validation ("" = the calling model)
+    AI_REPAIR_MODEL = os.getenv('AI_REPAIR_MODEL', '')
+
+    # Offline testing: "fake*" models (services/fake_llm.py) and record/replay cassettes (services/cassette.py)
+    AI_FAKE_TTFT_MS = float(os.getenv('AI_FAKE_TTFT_MS')) if os.getenv('AI_FAKE_TTFT_MS') else None
+    AI_FAKE_TOKENS_PER_SECOND = float(os.getenv('AI_FAKE_TOKENS_PER_SECOND')) if os.getenv('AI_FAKE_TOKENS_PER_SECOND') else None
+    AI_CASSETTE_MODE = os.getenv('AI_CASSETTE_MODE', 'off').lower()  # off, record or replay
+    AI_CASSETTE_PATH = os.getenv('AI_CASSETTE_PATH', str(BASE_DIR / 'data' / 'cassettes' / 'ai.jsonl'))
+    AI_CASSETTE_REPLAY_TIMING = os.getenv('AI_CASSETTE_REPLAY_TIMING', 'True').lower() == 'true'
+
+    # Background generation jobs (see services/job_runner.py)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))  # Jobs running at the same time
+    JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '2.0'))  # UI refresh interval while jobs run
+    JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', '15'))
+    JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', '120'))  # Running jobs without a heartbeat this long are re-queued
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '2'))
+
+    # Hedged requests: if the primary model is slower than its recent p95 (or fails),
+    # also send the request to AI_HEDGE_MODEL and use whichever answers first
+    AI_HEDGING_ENABLED = os.getenv('AI_HEDGING_ENABLED', 'False').lower() == 'true'
+    AI_HEDGE_MODEL = os.getenv('AI_HEDGE_MODEL', '')
+    AI_HEDGE_PERCENTILE = float(os.getenv('AI_HEDGE_PERCENTILE', '95'))
+    AI_HEDGE_MIN_SAMPLES = int(os.getenv('AI_HEDGE_MIN_SAMPLES', '20'))
+    AI_HEDGE_MIN_DELAY_SECONDS = float(os.getenv('AI_HEDGE_MIN_DELAY_SECONDS', '2.0'))
+    AI_HEDGE_MAX_DELAY_SECONDS = float(os.getenv('AI_HEDGE_MAX_DELAY_SECONDS', '10.0'))  # First-token delay cap (streamed calls only)
+
     @classmethod
     def ensure_directories(cls):
         """Create necessary directories if they don't exist"""
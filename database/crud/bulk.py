@@ -0,0 +1,42 @@
+"""
+Bulk write helpers
+"""
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Sequence, Type
+
+def bulk_insert(db: Session, model: Type, rows: Sequence[Dict[str, Any]], commit: bool = True) -> List[int]:
+    """
+    Insert many rows of a model in one statement
+
+    Uses a Core INSERT with the rows as parameters, which SQLAlchemy sends
+    as a multi-row INSERT ... VALUES ... RETURNING id instead of flushing
+    one ORM object at a time. Column defaults and custom column types are
+    applied as for ORM inserts; no objects are added to the session.
+
+    Args:
+        db: Database session
+        model: Mapped class with an integer id primary key
+        rows: Column values, one dict per row; all rows must have the same keys
+        commit: Commit the transaction afterwards
+
+    Returns:
+        Inserted IDs in the order of rows
+    """
+    if not rows:
+        return []
+
+    if db.get_bind().dialect.insert_executemany_returning:
+        result = db.execute(insert(model).returning(model.id), list(rows))
+        # Autoincrement ids are assigned in VALUES order, but RETURNING does not
+        # promise that order; asking SQLAlchemy to guarantee it would make it
+        # fall back to one statement per row on tables without a sentinel column
+        ids = sorted(result.scalars())
+    else:
+        # Without RETURNING for executemany, ids have to be read per row
+        ids = [db.execute(insert(model).values(**row)).inserted_primary_key[0] for row in rows]
+
+    if commit:
+        db.commit()
+    return ids
@@ -0,0 +1,141 @@
+"""
+CRUD operations for background generation jobs
+"""
+
+from sqlalchemy.orm import Session
+from database.models import GenerationJob
+from typing import Optional, List
+from datetime import datetime, timedelta
+
+ACTIVE_STATUSES = ("queued", "running")
+
+def create_job(db: Session, project_id: int, job_type: str, params: Optional[dict] = None) -> GenerationJob:
+    """
+    Queue a new job
+
+    Args:
+        db: Database session
+        project_id: Project ID
+        job_type: Handler name (see services/job_runner.py JOB_HANDLERS)
+        params: Handler inputs (JSON-serializable)
+
+    Returns:
+        Created GenerationJob
+    """
+    job = GenerationJob(project_id=project_id, job_type=job_type, status="queued", params=params or {})
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def get_job(db: Session, job_id: int) -> Optional[GenerationJob]:
+    """
+    Get a job by ID
+
+    Args:
+        db: Database session
+        job_id: Job ID
+
+    Returns:
+        GenerationJob or None
+    """
+    return db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+
+def get_project_jobs(
+    db: Session,
+    project_id: int,
+    job_types: Optional[List[str]] = None,
+    active_only: bool = False
+) -> List[GenerationJob]:
+    """
+    List a project's jobs, newest first
+
+    Args:
+        db: Database session
+        project_id: Project ID
+        job_types: Optional job type filter
+        active_only: Only return queued and running jobs
+
+    Returns:
+        List of GenerationJob objects
+    """
+    query = db.query(GenerationJob).filter(GenerationJob.project_id == project_id)
+    if job_types:
+        query = query.filter(GenerationJob.job_type.in_(job_types))
+    if active_only:
+        query = query.filter(GenerationJob.status.in_(ACTIVE_STATUSES))
+    return query.order_by(GenerationJob.created_at.desc(), GenerationJob.id.desc()).all()
+
+def claim_job(db: Session, job_id: int) -> bool:
+    """
+    Move a queued job to running
+
+    The update is conditional on the job still being queued, so only one
+    worker can claim it.
+
+    Args:
+        db: Database session
+        job_id: Job ID
+
+    Returns:
+        True if this caller claimed the job
+    """
+    now = datetime.utcnow()
+    claimed = db.query(GenerationJob).filter(
+        GenerationJob.id == job_id,
+        GenerationJob.status == "queued"
+    ).update({
+        GenerationJob.status: "running",
+        GenerationJob.started_at: now,
+        GenerationJob.heartbeat_at: now,
+        GenerationJob.attempts: GenerationJob.attempts + 1
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def update_job(db: Session, job_id: int, **fields):
+    """
+    Update columns on a job and refresh its heartbeat
+
+    Args:
+        db: Database session
+        job_id: Job ID
+        **fields: GenerationJob column values
+    """
+    fields.setdefault("heartbeat_at", datetime.utcnow())
+    db.query(GenerationJob).filter(GenerationJob.id == job_id).update(fields, synchronize_session=False)
+    db.commit()
+
+def requeue_stale_jobs(db: Session, stale_after_seconds: float, max_attempts: int) -> List[int]:
+    """
+    Recover jobs left behind by a stopped process
+
+    Running jobs whose heartbeat is older than stale_after_seconds are put
+    back in the queue, or failed once they have used max_attempts.
+
+    Args:
+        db: Database session
+        stale_after_seconds: Heartbeat age after which a running job is considered dead
+        max_attempts: Attempts allowed per job
+
+    Returns:
+        IDs of all queued jobs (including the re-queued ones), oldest first
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+    stale = db.query(GenerationJob).filter(
+        GenerationJob.status == "running",
+        GenerationJob.heartbeat_at < cutoff
+    ).all()
+    for job in stale:
+        if (job.attempts or 0) >= max_attempts:
+            job.status = "failed"
+            job.error = "Job was interrupted too many times"
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = "queued"
+            job.progress_message = "Re-queued after restart"
+    db.commit()
+
+    return [job_id for (job_id,) in db.query(GenerationJob.id).filter(
+        GenerationJob.status == "queued"
+    ).order_by(GenerationJob.id).all()]
@@ -0,0 +1,111 @@
+"""
+CRUD operations for LLM call telemetry
+"""
+
+from sqlalchemy.orm import Session
+from database.models import LLMCallLog
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+import math
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """
+    Nearest-rank percentile
+
+    Args:
+        values: Sample values
+        pct: Percentile (0-100)
+
+    Returns:
+        Percentile value, or None for an empty sample
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+def get_llm_call_summary(
+    db: Session,
+    project_id: Optional[int] = None,
+    since: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Summarize LLM calls per content type (falling back to the caller name)
+
+    Cache hits are counted but excluded from the latency and token
+    percentiles, so the numbers reflect real provider calls.
+
+    Args:
+        db: Database session
+        project_id: Optional project filter
+        since: Optional lower bound on created_at
+
+    Returns:
+        List of dicts with calls, cache_hits, errors, p50/p95 latency and
+        time-to-first-token (ms), p50/p95 total tokens, prompt tokens read
+        from the provider's prompt cache and total cost, sorted by p95
+        latency (slowest first)
+    """
+    query = db.query(
+        LLMCallLog.content_type,
+        LLMCallLog.caller,
+        LLMCallLog.latency_ms,
+        LLMCallLog.ttft_ms,
+        LLMCallLog.prompt_tokens,
+        LLMCallLog.completion_tokens,
+        LLMCallLog.cache_read_tokens,
+        LLMCallLog.cache_hit,
+        LLMCallLog.cost_usd,
+        LLMCallLog.error_type
+    )
+    if project_id is not None:
+        query = query.filter(LLMCallLog.project_id == project_id)
+    if since is not None:
+        query = query.filter(LLMCallLog.created_at >= since)
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for row in query.yield_per(1000):
+        key = row.content_type or row.caller or "unknown"
+        group = groups.setdefault(key, {
+            "calls": 0, "cache_hits": 0, "errors": 0, "cost_usd": 0.0,
+            "prompt_tokens": 0, "cache_read_tokens": 0,
+            "latency": [], "ttft": [], "tokens": []
+        })
+        group["calls"] += 1
+        group["cost_usd"] += row.cost_usd or 0.0
+        if row.error_type:
+            group["errors"] += 1
+            continue
+        if row.cache_hit:
+            group["cache_hits"] += 1
+            continue
+        group["latency"].append(row.latency_ms)
+        group["prompt_tokens"] += row.prompt_tokens or 0
+        group["cache_read_tokens"] += row.cache_read_tokens or 0
+        if row.ttft_ms is not None:
+            group["ttft"].append(row.ttft_ms)
+        if row.prompt_tokens is not None or row.completion_tokens is not None:
+            group["tokens"].append((row.prompt_tokens or 0) + (row.completion_tokens or 0))
+
+    summary = []
+    for key, group in groups.items():
+        summary.append({
+            "content_type": key,
+            "calls": group["calls"],
+            "cache_hits": group["cache_hits"],
+            "errors": group["errors"],
+            "p50_latency_ms": percentile(group["latency"], 50),
+            "p95_latency_ms": percentile(group["latency"], 95),
+            "p50_ttft_ms": percentile(group["ttft"], 50),
+            "p95_ttft_ms": percentile(group["ttft"], 95),
+            "p50_tokens": percentile(group["tokens"], 50),
+            "p95_tokens": percentile(group["tokens"], 95),
+            "cache_read_tokens": group["cache_read_tokens"],
+            "cached_prompt_ratio": (
+                group["cache_read_tokens"] / group["prompt_tokens"] if group["prompt_tokens"] else 0.0
+            ),
+            "cost_usd": round(group["cost_usd"], 6),
+        })
+
+    return sorted(summary, key=lambda item: item["p95_latency_ms"] or 0, reverse=True)
@@ -102,6 +102,9 @@ def update_project(db: Session, project_id: int, **kwargs) -> Optional[Project]:
     project.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(project)
+
+    # Cached responses were generated from the old project details
+    _invalidate_ai_cache(db, project_id)
     return project
 
 def delete_project(db: Session, project_id: int) -> bool:
@@ -121,4 +124,15 @@ def delete_project(db: Session, project_id: int) -> bool:
 
     db.delete(project)
     db.commit()
+
+    _invalidate_ai_cache(db, project_id)
     return True
+
+def _invalidate_ai_cache(db: Session, project_id: int):
+    """Drop cached AI responses belonging to a project"""
+    from config.settings import Settings
+    if not Settings.AI_CACHE_ENABLED:
+        return
+
+    from services.ai_cache import get_response_cache
+    get_response_cache().invalidate_project(project_id, db=db)
@@ -0,0 +1,119 @@
+"""
+CRUD operations for Prototype iterations (sketches and mockups)
+"""
+
+from sqlalchemy.orm import Session, load_only
+from database.models import SketchIteration, MockupIteration
+from database.crud.sequences import next_iteration_number
+from services.blob_store import BlobStore, load_image, store_image
+from services.image_variants import load_variant
+from typing import Any, List, Optional, Type, Union
+
+Iteration = Union[SketchIteration, MockupIteration]
+
+# Columns needed to list iterations; everything else (image_data, AI
+# analysis, prompts) is loaded on first access
+SKETCH_LIST_COLUMNS = (
+    SketchIteration.id, SketchIteration.prototype_page_id, SketchIteration.iteration_number,
+    SketchIteration.image_sha256, SketchIteration.image_size, SketchIteration.image_mime_type,
+    SketchIteration.image_width, SketchIteration.image_height, SketchIteration.image_filename,
+    SketchIteration.user_instructions, SketchIteration.created_at
+)
+
+MOCKUP_LIST_COLUMNS = (
+    MockupIteration.id, MockupIteration.prototype_page_id, MockupIteration.iteration_number,
+    MockupIteration.image_sha256, MockupIteration.image_size, MockupIteration.image_mime_type,
+    MockupIteration.image_width, MockupIteration.image_height, MockupIteration.image_filename,
+    MockupIteration.style_params, MockupIteration.user_refinement, MockupIteration.created_at
+)
+
+def list_sketch_iterations(db: Session, prototype_page_id: int) -> List[SketchIteration]:
+    """
+    List a page's sketch iterations without their images
+
+    Args:
+        db: Database session
+        prototype_page_id: Prototype page ID
+
+    Returns:
+        List of SketchIteration objects ordered by iteration number, with only
+        the listing columns loaded
+    """
+    return db.query(SketchIteration).options(load_only(*SKETCH_LIST_COLUMNS)).filter(
+        SketchIteration.prototype_page_id == prototype_page_id
+    ).order_by(SketchIteration.iteration_number).all()
+
+def list_mockup_iterations(db: Session, prototype_page_id: int) -> List[MockupIteration]:
+    """
+    List a page's mockup iterations without their images
+
+    Args:
+        db: Database session
+        prototype_page_id: Prototype page ID
+
+    Returns:
+        List of MockupIteration objects ordered by iteration number, with only
+        the listing columns loaded
+    """
+    return db.query(MockupIteration).options(load_only(*MOCKUP_LIST_COLUMNS)).filter(
+        MockupIteration.prototype_page_id == prototype_page_id
+    ).order_by(MockupIteration.iteration_number).all()
+
+def get_iteration_image(db: Session, model: Type[Iteration], iteration_id: int,
+                        variant: Optional[str] = None) -> Optional[bytes]:
+    """
+    Load the image of one iteration
+
+    Reads only the blob reference (and the legacy Base64 column) of the row,
+    then the bytes from the blob store.
+
+    Args:
+        db: Database session
+        model: SketchIteration or MockupIteration
+        iteration_id: Iteration ID
+        variant: Variant to load (see services/image_variants.py), defaults to the original
+
+    Returns:
+        Image bytes, or None if the iteration or its image does not exist
+    """
+    row = db.query(model.image_sha256, model.image_data).filter(model.id == iteration_id).first()
+    if row is None:
+        return None
+    return load_variant(row, variant) if variant else load_image(row)
+
+def create_iteration(
+    db: Session,
+    model: Type[Iteration],
+    prototype_page_id: int,
+    image: Union[bytes, memoryview],
+    store: Optional[BlobStore] = None,
+    **fields: Any
+) -> Iteration:
+    """
+    Store an image and save it as a page's next sketch or mockup iteration
+
+    The image is written to the blob store before the iteration number is
+    allocated: allocation holds the database write lock until the commit,
+    and the database blob store writes through a session of its own.
+
+    Args:
+        db: Database session
+        model: SketchIteration or MockupIteration
+        prototype_page_id: Prototype page ID
+        image: Raw image bytes
+        store: Blob store, defaults to get_blob_store()
+        **fields: Other column values (e.g. image_filename, user_instructions)
+
+    Returns:
+        The committed iteration
+    """
+    image_values = store_image(image, store)
+    iteration = model(
+        prototype_page_id=prototype_page_id,
+        iteration_number=next_iteration_number(db, model, prototype_page_id),
+        **image_values,
+        **fields
+    )
+    db.add(iteration)
+    db.commit()
+    return iteration
@@ -0,0 +1,106 @@
+"""
+CRUD operations for per-parent sequence numbers (iteration numbers, summary versions)
+"""
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database.models import SequenceCounter, SketchIteration, MockupIteration, StageSummary
+from typing import Callable, Type, Union
+
+def allocate_number(db: Session, scope: str, current_max: Callable[[], int]) -> int:
+    """
+    Hand out the next number of a scope
+
+    Increments the scope's counter row in the caller's transaction, so the
+    row lock (or SQLite write lock) serializes concurrent callers until they
+    commit and no two of them get the same number. The counter is created on
+    first use, starting after the largest number already stored.
+
+    Args:
+        db: Database session
+        scope: Counter key, "<table>:<parent key>"
+        current_max: Returns the largest number already used in the scope
+            (only called when the counter does not exist yet)
+
+    Returns:
+        Next number (1 for an empty scope)
+    """
+    value = _increment(db, scope)
+    if value is None:
+        _create_counter(db, scope, current_max() or 0)
+        value = _increment(db, scope)
+    return value
+
+def next_iteration_number(
+    db: Session,
+    model: Type[Union[SketchIteration, MockupIteration]],
+    prototype_page_id: int
+) -> int:
+    """
+    Allocate the next sketch or mockup iteration number of a page
+
+    Args:
+        db: Database session
+        model: SketchIteration or MockupIteration
+        prototype_page_id: Prototype page ID
+
+    Returns:
+        Iteration number
+    """
+    return allocate_number(
+        db, f"{model.__tablename__}:{prototype_page_id}",
+        lambda: db.query(func.max(model.iteration_number)).filter(
+            model.prototype_page_id == prototype_page_id
+        ).scalar()
+    )
+
+def next_summary_version(db: Session, project_id: int, stage: str) -> int:
+    """
+    Allocate the next summary version of a project's stage
+
+    Args:
+        db: Database session
+        project_id: Project ID
+        stage: Stage name
+
+    Returns:
+        Version number
+    """
+    return allocate_number(
+        db, f"stage_summaries:{project_id}:{stage}",
+        lambda: db.query(func.max(StageSummary.version)).filter(
+            StageSummary.project_id == project_id,
+            StageSummary.stage == stage
+        ).scalar()
+    )
+
+def _increment(db: Session, scope: str):
+    """Increment a counter; None if it does not exist"""
+    statement = update(SequenceCounter).where(SequenceCounter.scope == scope).values(
+        value=SequenceCounter.value + 1
+    )
+    if db.get_bind().dialect.update_returning:
+        return db.execute(statement.returning(SequenceCounter.value)).scalar()
+    if db.execute(statement).rowcount == 0:
+        return None
+    return db.execute(select(SequenceCounter.value).where(SequenceCounter.scope == scope)).scalar()
+
+def _create_counter(db: Session, scope: str, value: int):
+    """Create a counter unless a concurrent caller just did"""
+    dialect = db.get_bind().dialect.name
+    values = {"scope": scope, "value": value}
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        db.execute(dialect_insert(SequenceCounter).values(**values).on_conflict_do_nothing(index_elements=["scope"]))
+    elif dialect in ("mysql", "mariadb"):
+        db.execute(insert(SequenceCounter).values(**values).prefix_with("IGNORE"))
+    else:
+        try:
+            with db.begin_nested():
+                db.execute(insert(SequenceCounter).values(**values))
+        except IntegrityError:
+            pass  # Created concurrently; the increment below finds it
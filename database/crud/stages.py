@@ -2,9 +2,10 @@
 CRUD operations for Stage Progress
 """
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from database.models import StageProgress
-from typing import Optional, List
+from database.models import StageProgress, StageSummary
+from typing import Dict, Optional, List, Sequence
 from datetime import datetime
 
 def get_stage_progress(db: Session, project_id: int, stage_number: int) -> Optional[StageProgress]:
@@ -125,3 +126,29 @@ def initialize_project_stages(db: Session, project_id: int):
             )
             db.add(stage)
     db.commit()
+
+def get_latest_stage_summaries(db: Session, project_id: int, stages: Sequence[str]) -> Dict[str, StageSummary]:
+    """
+    Get the latest summary version of several stages in one query
+
+    Args:
+        db: Database session
+        project_id: Project ID
+        stages: Stage names (e.g. ["empathise", "define"])
+
+    Returns:
+        Dict of stage name -> latest StageSummary; stages without a summary are missing
+    """
+    ranked = db.query(
+        StageSummary.id,
+        func.row_number().over(
+            partition_by=StageSummary.stage,
+            order_by=(StageSummary.version.desc(), StageSummary.id.desc())
+        ).label("rank")
+    ).filter(
+        StageSummary.project_id == project_id,
+        StageSummary.stage.in_(stages)
+    ).subquery()
+
+    summaries = db.query(StageSummary).join(ranked, StageSummary.id == ranked.c.id).filter(ranked.c.rank == 1).all()
+    return {summary.stage: summary for summary in summaries}
@@ -0,0 +1,57 @@
+"""
+CRUD operations for User Tests
+"""
+
+from sqlalchemy.orm import Session, contains_eager, selectinload
+from database.models import UserTest, TestInsight
+from typing import List, Optional, Sequence
+
+def list_user_tests(
+    db: Session,
+    project_id: int,
+    test_type: Optional[str] = None,
+    newest_first: bool = True
+) -> List[UserTest]:
+    """
+    List a project's tests with their page, feedback and insights loaded
+
+    The related rows are fetched in one batched query per relationship, so
+    rendering the results costs a constant number of queries.
+
+    Args:
+        db: Database session
+        project_id: Project ID
+        test_type: Only tests of this type (e.g. "feedback")
+        newest_first: Order by creation time, newest first; otherwise by ID
+
+    Returns:
+        List of UserTest objects with prototype_page, feedback_items and insights loaded
+    """
+    query = db.query(UserTest).options(
+        selectinload(UserTest.prototype_page),
+        selectinload(UserTest.feedback_items),
+        selectinload(UserTest.insights)
+    ).filter(UserTest.project_id == project_id)
+    if test_type:
+        query = query.filter(UserTest.test_type == test_type)
+    order = UserTest.created_at.desc() if newest_first else UserTest.id
+    return query.order_by(order).all()
+
+def list_insights_by_priority(db: Session, project_id: int, priorities: Sequence[str]) -> List[TestInsight]:
+    """
+    Get a project's test insights with the given priorities in one query
+
+    Args:
+        db: Database session
+        project_id: Project ID
+        priorities: Priorities to include (e.g. ["critical", "high"])
+
+    Returns:
+        List of TestInsight objects with user_test loaded, ordered by test then insight
+    """
+    return db.query(TestInsight).join(TestInsight.user_test).options(
+        contains_eager(TestInsight.user_test)
+    ).filter(
+        UserTest.project_id == project_id,
+        TestInsight.priority.in_(priorities)
+    ).order_by(UserTest.id, TestInsight.id).all()
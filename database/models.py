@@ -3,10 +3,11 @@ Database Models
 SQLAlchemy ORM models for all database tables
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, Float, Index, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from config.database import Base
+from database.types import CompressedText
 
 class Project(Base):
     """Project model - represents a design thinking project"""
@@ -68,11 +69,14 @@ class ResearchData(Base):
 class GeneratedContent(Base):
     """AI-generated content for various stages"""
     __tablename__ = "generated_content"
+    __table_args__ = (
+        Index("ix_generated_content_project_type_created", "project_id", "content_type", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     content_type = Column(String(100), nullable=False)  # empathy_map, persona, journey_map, etc.
-    content = Column(Text, nullable=False)
+    content = Column(CompressedText, nullable=False)
     model_used = Column(String(100), nullable=True)  # AI model used to generate this content
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -100,12 +104,15 @@ class Template(Base):
 class StageSummary(Base):
     """AI-generated summaries for each stage"""
     __tablename__ = "stage_summaries"
+    __table_args__ = (
+        Index("uq_stage_summaries_project_stage_version", "project_id", "stage", "version", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     stage = Column(String(50), nullable=False)  # empathise, define, ideate, etc.
-    summary_text = Column(Text, nullable=False)
-    version = Column(Integer, default=1)  # Auto-increment for each new summary
+    summary_text = Column(CompressedText, nullable=False)
+    version = Column(Integer, default=1)  # Per project + stage, allocated by database/crud/sequences.py
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -117,6 +124,9 @@ class StageSummary(Base):
 class BrainstormIdea(Base):
     """Brainstorming ideas - both seed ideas and expansions"""
     __tablename__ = "brainstorm_ideas"
+    __table_args__ = (
+        Index("ix_brainstorm_ideas_project_type_created", "project_id", "idea_type", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -137,10 +147,13 @@ class BrainstormIdea(Base):
 class IdeaCategorization(Base):
     """AI-generated categorization of brainstorming ideas"""
     __tablename__ = "idea_categorizations"
+    __table_args__ = (
+        Index("ix_idea_categorizations_project_updated", "project_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
-    categorization_text = Column(Text, nullable=False)  # Brief categorization result
+    categorization_text = Column(CompressedText, nullable=False)  # Brief categorization result
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -153,6 +166,9 @@ class IdeaCategorization(Base):
 class PrototypePage(Base):
     """Represents one page being prototyped (e.g., Home, Profile, Settings)"""
     __tablename__ = "prototype_pages"
+    __table_args__ = (
+        Index("ix_prototype_pages_project_order", "project_id", "order_index"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -167,8 +183,8 @@ class PrototypePage(Base):
     final_mockup_id = Column(Integer, nullable=True)
 
     code_generated = Column(Boolean, default=False)
-    html_code = Column(Text, nullable=True)
-    css_code = Column(Text, nullable=True)
+    html_code = Column(CompressedText, nullable=True)
+    css_code = Column(CompressedText, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -184,11 +200,19 @@ class PrototypePage(Base):
 class SketchIteration(Base):
     """Each sketch upload/iteration for vision analysis"""
     __tablename__ = "sketch_iterations"
+    __table_args__ = (
+        Index("uq_sketch_iterations_page_iteration", "prototype_page_id", "iteration_number", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     prototype_page_id = Column(Integer, ForeignKey("prototype_pages.id"), nullable=False)
     iteration_number = Column(Integer, nullable=False)
-    image_data = Column(Text, nullable=True)  # Base64 encoded image data
+    image_sha256 = Column(String(64), nullable=True, index=True)  # Key in the blob store (services/blob_store.py)
+    image_size = Column(Integer, nullable=True)  # Bytes
+    image_mime_type = Column(String(50), nullable=True)
+    image_width = Column(Integer, nullable=True)
+    image_height = Column(Integer, nullable=True)
+    image_data = deferred(Column(Text, nullable=True), group="image")  # Legacy Base64 image (loaded on access), moved out by migrations/move_images_to_blob_store.py
     image_filename = Column(Text, nullable=True)  # Original filename
     user_instructions = Column(Text, nullable=True)
     ai_analysis = Column(Text, nullable=True)
@@ -204,11 +228,19 @@ class SketchIteration(Base):
 class MockupIteration(Base):
     """Each AI-generated mockup iteration"""
     __tablename__ = "mockup_iterations"
+    __table_args__ = (
+        Index("uq_mockup_iterations_page_iteration", "prototype_page_id", "iteration_number", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     prototype_page_id = Column(Integer, ForeignKey("prototype_pages.id"), nullable=False)
     iteration_number = Column(Integer, nullable=False)
-    image_data = Column(Text, nullable=True)  # Base64 encoded image data
+    image_sha256 = Column(String(64), nullable=True, index=True)  # Key in the blob store (services/blob_store.py)
+    image_size = Column(Integer, nullable=True)  # Bytes
+    image_mime_type = Column(String(50), nullable=True)
+    image_width = Column(Integer, nullable=True)
+    image_height = Column(Integer, nullable=True)
+    image_data = deferred(Column(Text, nullable=True), group="image")  # Legacy Base64 image (loaded on access), moved out by migrations/move_images_to_blob_store.py
     image_filename = Column(Text, nullable=True)  # Original filename
     generation_prompt = Column(Text, nullable=False)
     style_params = Column(JSON, nullable=True)  # {style: "minimalist", color: "blue", etc.}
@@ -224,6 +256,9 @@ class MockupIteration(Base):
 class UserTest(Base):
     """Records of user testing sessions"""
     __tablename__ = "user_tests"
+    __table_args__ = (
+        Index("ix_user_tests_project_created", "project_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -246,6 +281,9 @@ class UserTest(Base):
 class TestFeedback(Base):
     """Raw feedback collected from testers"""
     __tablename__ = "test_feedback"
+    __table_args__ = (
+        Index("ix_test_feedback_user_test", "user_test_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_test_id = Column(Integer, ForeignKey("user_tests.id"), nullable=False)
@@ -263,11 +301,14 @@ class TestFeedback(Base):
 class TestInsight(Base):
     """AI-analyzed insights from test feedback"""
     __tablename__ = "test_insights"
+    __table_args__ = (
+        Index("ix_test_insights_user_test_priority", "user_test_id", "priority"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_test_id = Column(Integer, ForeignKey("user_tests.id"), nullable=False)
     insight_type = Column(String(50), nullable=False)  # sentiment, theme, issue, recommendation
-    insight_text = Column(Text, nullable=False)
+    insight_text = Column(CompressedText, nullable=False)
     priority = Column(String(20), nullable=True)  # critical, high, medium, low
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -378,3 +419,117 @@ class OAuthState(Base):
 
     def __repr__(self):
         return f"<OAuthState(state='{self.state[:20]}...', user_id='{self.user_id}')>"
+
+class AIResponseCache(Base):
+    """Persistent tier of the AI response cache (see services/ai_cache.py)"""
+    __tablename__ = "ai_response_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # SHA-256 of model, params and prompts
+    project_id = Column(Integer, nullable=True, index=True)  # For per-project invalidation
+    model = Column(String(100), nullable=True)
+    response_text = Column(Text, nullable=False)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)  # Used for LRU eviction
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<AIResponseCache(key='{self.cache_key[:12]}...', project_id={self.project_id})>"
+
+class LLMCallLog(Base):
+    """One row per AI provider call (text, vision or image), written by services/telemetry.py"""
+    __tablename__ = "llm_call_logs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, nullable=True, index=True)
+    provider = Column(String(50), nullable=False)  # openai, anthropic, xai
+    model = Column(String(100), nullable=False)
+    call_type = Column(String(20), nullable=False)  # text, stream, vision, image
+    caller = Column(String(255), nullable=True)  # e.g. define.generate_analysis
+    content_type = Column(String(100), nullable=True, index=True)  # e.g. empathy_map
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cache_read_tokens = Column(Integer, nullable=True)  # Prompt tokens served from the provider's prefix cache
+    cache_write_tokens = Column(Integer, nullable=True)  # Prompt tokens written to the cache (Anthropic)
+    ttft_ms = Column(Float, nullable=True)  # Time to first token (streaming only)
+    latency_ms = Column(Float, nullable=False)
+    cache_hit = Column(Boolean, default=False)
+    cost_usd = Column(Float, nullable=True)  # Estimated from services/telemetry.py MODEL_PRICING
+    error_type = Column(String(100), nullable=True)  # Exception class name when the call failed
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<LLMCallLog(id={self.id}, model='{self.model}', latency_ms={self.latency_ms})>"
+
+class GenerationJob(Base):
+    """Long-running AI generation run by the background job runner (see services/job_runner.py)"""
+    __tablename__ = "generation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    job_type = Column(String(50), nullable=False)  # roadmap, tasks, mockup, mockup_refine, define_analyses
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, succeeded, failed
+    params = Column(JSON, nullable=True)  # Handler inputs
+    progress = Column(Float, default=0.0)  # 0.0 - 1.0
+    progress_message = Column(String(255), nullable=True)
+    result = Column(JSON, nullable=True)  # Ids of the rows the handler created, e.g. {"roadmap_id": 3}
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # Refreshed while running; stale jobs are re-queued
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<GenerationJob(id={self.id}, type='{self.job_type}', status='{self.status}')>"
+
+class GenerationLease(Base):
+    """Single-flight lease on an identical AI request, shared across processes (see services/single_flight.py)"""
+    __tablename__ = "generation_leases"
+
+    lease_key = Column(String(64), primary_key=True)  # Request fingerprint (same as the response cache key)
+    holder = Column(String(36), nullable=False)  # Token of the caller generating the response
+    status = Column(String(20), nullable=False, default="running")  # running, done
+    project_id = Column(Integer, nullable=True)
+    result = Column(Text, nullable=True)  # Response text, kept briefly for waiting callers
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)  # Renewed while running; a crashed holder's lease lapses
+
+    def __repr__(self):
+        return f"<GenerationLease(key='{self.lease_key[:12]}...', status='{self.status}')>"
+
+class ImageBlob(Base):
+    """Image bytes keyed by SHA-256, used when BLOB_STORE=database (see services/blob_store.py)"""
+    __tablename__ = "image_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ImageBlob(sha256='{self.sha256[:12]}...', size={self.size})>"
+
+class ImageBlobVariant(Base):
+    """Downscaled copy (thumbnail, display size) of an image blob, used when BLOB_STORE=database"""
+    __tablename__ = "image_blob_variants"
+
+    sha256 = Column(String(64), primary_key=True)  # Hash of the original blob
+    variant = Column(String(20), primary_key=True)  # thumb, display
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ImageBlobVariant(sha256='{self.sha256[:12]}...', variant='{self.variant}', size={self.size})>"
+
+class SequenceCounter(Base):
+    """Last number handed out per scope, e.g. iteration numbers of one prototype page (see database/crud/sequences.py)"""
+    __tablename__ = "sequence_counters"
+
+    scope = Column(String(100), primary_key=True)  # "<table>:<parent key>"
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SequenceCounter(scope='{self.scope}', value={self.value})>"
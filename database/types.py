@@ -0,0 +1,121 @@
+"""
+Custom column types
+"""
+
+import zlib
+from typing import Optional, Union
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from config.settings import Settings
+
+try:
+    import zstandard
+except ImportError:  # zlib is used instead
+    zstandard = None
+
+# Stored values start with MARKER + a codec byte. Text never starts with a
+# NUL byte, so values written before compression (str or UTF-8 bytes) are
+# still read back as-is.
+MARKER = b"\x00"
+CODEC_RAW = b"r"
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+# Values shorter than this are stored raw; compression would not pay off
+COMPRESS_MIN_BYTES = 256
+
+_zstd_compressor = None
+_zstd_decompressor = None
+
+
+def compress_text(value: str, codec: Optional[str] = None) -> bytes:
+    """
+    Encode text for a CompressedText column
+
+    Args:
+        value: Text to store
+        codec: "zstd", "zlib" or "none", defaults to Settings.DB_TEXT_COMPRESSION.
+            zstd falls back to zlib when the zstandard package is missing.
+
+    Returns:
+        Marked, possibly compressed bytes
+    """
+    global _zstd_compressor
+    data = value.encode("utf-8")
+    codec = codec or Settings.DB_TEXT_COMPRESSION
+    if codec == "none" or len(data) < COMPRESS_MIN_BYTES:
+        return MARKER + CODEC_RAW + data
+
+    if codec == "zstd" and zstandard is not None:
+        if _zstd_compressor is None:
+            _zstd_compressor = zstandard.ZstdCompressor(level=Settings.DB_TEXT_COMPRESSION_LEVEL)
+        compressed = MARKER + CODEC_ZSTD + _zstd_compressor.compress(data)
+    else:
+        compressed = MARKER + CODEC_ZLIB + zlib.compress(data, min(Settings.DB_TEXT_COMPRESSION_LEVEL, 9))
+
+    if len(compressed) >= len(data) + 2:
+        return MARKER + CODEC_RAW + data
+    return compressed
+
+
+def decompress_text(value: Union[bytes, memoryview, str]) -> str:
+    """
+    Decode a stored CompressedText value
+
+    Args:
+        value: Stored value, compressed or written before compression was enabled
+
+    Returns:
+        Original text
+
+    Raises:
+        ValueError: If the value uses an unknown codec or zstd without zstandard installed
+    """
+    global _zstd_decompressor
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value.startswith(MARKER):
+        return value.decode("utf-8")
+
+    codec, payload = value[1:2], value[2:]
+    if codec == CODEC_RAW:
+        return payload.decode("utf-8")
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("Value is zstd-compressed but the zstandard package is not installed")
+        if _zstd_decompressor is None:
+            _zstd_decompressor = zstandard.ZstdDecompressor()
+        return _zstd_decompressor.decompress(payload).decode("utf-8")
+    raise ValueError(f"Unknown compression codec: {codec!r}")
+
+
+def is_compressed(value: Union[bytes, memoryview, str, None]) -> bool:
+    """Whether a stored value is already in the CompressedText format"""
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:1]) == MARKER
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored compressed as binary
+
+    Reads and writes str like Text. Existing plain-text rows keep working;
+    migrations/compress_text_columns.py converts them in place. The column
+    cannot be searched or compared in SQL.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_text(value)
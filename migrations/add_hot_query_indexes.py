@@ -0,0 +1,54 @@
+"""
+Database Migration: Add composite indexes for the hot per-project queries
+Creates the indexes declared in __table_args__ on database/models.py (latest
+content per project + type, latest summary per stage, iterations per page,
+feedback and insights per test) - and any other declared index that is
+missing - on databases created before they existed. Safe to re-run:
+existing indexes are skipped.
+"""
+
+from sqlalchemy import create_engine, inspect, text
+from config.settings import Settings
+from database.models import Base
+import sys
+
+def run_migration():
+    """Create indexes declared on the models that are missing from the database"""
+
+    engine = create_engine(Settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            print("Starting migration: Adding hot query indexes...")
+            inspector = inspect(conn)
+            tables = set(inspector.get_table_names())
+            created = []
+            for table in Base.metadata.sorted_tables:
+                if table.name not in tables:
+                    continue  # Created with all its indexes by init_db
+                existing = {item["name"] for item in inspector.get_indexes(table.name)}
+                for index in sorted(table.indexes, key=lambda index: index.name):
+                    if index.name in existing:
+                        continue
+                    print(f"  Creating {index.name} on {table.name}({', '.join(c.name for c in index.columns)})...")
+                    index.create(bind=conn)
+                    created.append(index.name)
+
+            if engine.dialect.name in ("sqlite", "postgresql"):
+                # Refresh planner statistics so the new indexes get picked
+                conn.execute(text("ANALYZE"))
+
+            conn.commit()
+            print("✅ Migration completed successfully!")
+            print(f"\nCreated {len(created)} index(es)")
+            return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        return False
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
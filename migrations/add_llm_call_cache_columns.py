@@ -0,0 +1,47 @@
+"""
+Database Migration: Add prompt cache columns to llm_call_logs
+Adds cache_read_tokens and cache_write_tokens for provider prompt-prefix caching
+"""
+
+from sqlalchemy import create_engine, text
+from config.settings import Settings
+import sys
+
+def run_migration():
+    """Add prompt cache token columns to llm_call_logs"""
+
+    engine = create_engine(Settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            print("Starting migration: Adding prompt cache columns...")
+
+            print("  Adding cache_read_tokens column to llm_call_logs...")
+            conn.execute(text("""
+                ALTER TABLE llm_call_logs
+                ADD COLUMN cache_read_tokens INTEGER
+            """))
+
+            print("  Adding cache_write_tokens column to llm_call_logs...")
+            conn.execute(text("""
+                ALTER TABLE llm_call_logs
+                ADD COLUMN cache_write_tokens INTEGER
+            """))
+
+            conn.commit()
+            print("✅ Migration completed successfully!")
+            print("\nChanges made:")
+            print("  - llm_call_logs.cache_read_tokens: Prompt tokens read from the provider's prompt cache")
+            print("  - llm_call_logs.cache_write_tokens: Prompt tokens written to the prompt cache")
+            return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        print("\nNote: If columns already exist, this is normal.")
+        return False
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
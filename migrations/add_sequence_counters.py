@@ -0,0 +1,98 @@
+"""
+Database Migration: Unique iteration numbers and summary versions
+Creates the sequence_counters table used by database/crud/sequences.py and
+replaces the (parent, number) indexes of sketch_iterations,
+mockup_iterations and stage_summaries with unique ones. Duplicate numbers
+left by the old count() + 1 allocation are renumbered first: the oldest row
+keeps its number, later duplicates move after the parent's current maximum.
+Safe to re-run.
+"""
+
+from sqlalchemy import create_engine, inspect, text
+from config.settings import Settings
+from database.models import Base, SequenceCounter
+import sys
+
+# (table, parent columns, number column, old index, unique index)
+SEQUENCES = [
+    ("sketch_iterations", ["prototype_page_id"], "iteration_number",
+     "ix_sketch_iterations_page_iteration", "uq_sketch_iterations_page_iteration"),
+    ("mockup_iterations", ["prototype_page_id"], "iteration_number",
+     "ix_mockup_iterations_page_iteration", "uq_mockup_iterations_page_iteration"),
+    ("stage_summaries", ["project_id", "stage"], "version",
+     "ix_stage_summaries_project_stage_version", "uq_stage_summaries_project_stage_version"),
+]
+
+def renumber_duplicates(conn, table, parents, number):
+    """
+    Give every duplicate (parent, number) row after the first a new number
+
+    Returns:
+        Number of rows renumbered
+    """
+    parent_list = ", ".join(parents)
+    duplicates = conn.execute(text(f"""
+        SELECT {parent_list}, {number} FROM {table}
+        GROUP BY {parent_list}, {number} HAVING COUNT(*) > 1
+    """)).fetchall()
+
+    renumbered = 0
+    for row in duplicates:
+        keys = dict(zip(parents, row[:len(parents)]))
+        parent_filter = " AND ".join(f"{column} = :{column}" for column in parents)
+        ids = [found[0] for found in conn.execute(text(
+            f"SELECT id FROM {table} WHERE {parent_filter} AND {number} = :number ORDER BY created_at, id"
+        ), {**keys, "number": row[-1]})]
+        for row_id in ids[1:]:
+            next_number = conn.execute(text(
+                f"SELECT MAX({number}) FROM {table} WHERE {parent_filter}"
+            ), keys).scalar() + 1
+            conn.execute(text(f"UPDATE {table} SET {number} = :number WHERE id = :id"),
+                         {"number": next_number, "id": row_id})
+            print(f"  {table} #{row_id}: {number} {row[-1]} -> {next_number}")
+            renumbered += 1
+    return renumbered
+
+def run_migration():
+    """Create sequence_counters and make iteration numbers / summary versions unique"""
+
+    engine = create_engine(Settings.DATABASE_URL)
+
+    try:
+        Base.metadata.create_all(bind=engine, tables=[SequenceCounter.__table__])
+
+        with engine.connect() as conn:
+            print("Starting migration: Adding unique sequence numbers...")
+            inspector = inspect(conn)
+            tables = set(inspector.get_table_names())
+            renumbered = 0
+            for table, parents, number, old_index, unique_index in SEQUENCES:
+                if table not in tables:
+                    continue  # Created with its unique index by init_db
+                renumbered += renumber_duplicates(conn, table, parents, number)
+
+                existing = {index["name"] for index in inspector.get_indexes(table)}
+                if old_index in existing:
+                    print(f"  Dropping {old_index}...")
+                    conn.execute(text(f"DROP INDEX {old_index}" if engine.dialect.name != "mysql"
+                                      else f"DROP INDEX {old_index} ON {table}"))
+                if unique_index not in existing:
+                    print(f"  Creating {unique_index} on {table}({', '.join(parents)}, {number})...")
+                    conn.execute(text(
+                        f"CREATE UNIQUE INDEX {unique_index} ON {table} ({', '.join(parents)}, {number})"
+                    ))
+
+            conn.commit()
+            print("✅ Migration completed successfully!")
+            print(f"\nRenumbered {renumbered} duplicate row(s)")
+            return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        return False
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    success = run_migration()
+    sys.exit(0 if success else 1)
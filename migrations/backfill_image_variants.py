@@ -0,0 +1,93 @@
+"""
+Database Migration: Create WebP variants for existing sketch and mockup images
+Creates the thumbnail and display-size variants (services/image_variants.py)
+of every image in the blob store that is referenced by sketch_iterations or
+mockup_iterations. Run migrations/move_images_to_blob_store.py first; rows
+still holding Base64 image_data are only counted. Safe to re-run: existing
+variants are skipped.
+
+Usage:
+    python -m migrations.backfill_image_variants            # create missing variants
+    python -m migrations.backfill_image_variants --force    # recreate all (e.g. after changing IMAGE_*_SIZE)
+"""
+
+from sqlalchemy import create_engine, text
+from config.settings import Settings
+from database.models import Base, ImageBlobVariant
+from services.blob_store import DatabaseBlobStore, FileBlobStore
+from services.image_variants import create_variants
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import sessionmaker
+import argparse
+import sys
+
+IMAGE_TABLES = ["sketch_iterations", "mockup_iterations"]
+
+def run_migration(force=False):
+    """Create missing variants for all stored images"""
+
+    engine = create_engine(Settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            print("Starting migration: Creating image variants...")
+            digests = set()
+            legacy = 0
+            for table in IMAGE_TABLES:
+                digests.update(row[0] for row in conn.execute(text(
+                    f"SELECT DISTINCT image_sha256 FROM {table} WHERE image_sha256 IS NOT NULL"
+                )))
+                legacy += conn.execute(text(
+                    f"SELECT COUNT(*) FROM {table} WHERE image_sha256 IS NULL AND image_data IS NOT NULL"
+                )).scalar()
+
+        if Settings.BLOB_STORE == "database":
+            Base.metadata.create_all(bind=engine, tables=[ImageBlobVariant.__table__])
+            store = DatabaseBlobStore(sessionmaker(bind=engine))
+        else:
+            store = FileBlobStore(Settings.BLOB_DIR)
+
+        def backfill(digest):
+            try:
+                return create_variants(digest, store, force=force), None
+            except Exception as e:
+                return [], f"{digest[:12]}: {str(e)}"
+
+        created = skipped = 0
+        errors = []
+        with ThreadPoolExecutor(max_workers=max(1, Settings.IMAGE_VARIANT_WORKERS)) as executor:
+            for done, (variants, error) in enumerate(executor.map(backfill, sorted(digests)), start=1):
+                if error:
+                    errors.append(error)
+                elif variants:
+                    created += 1
+                else:
+                    skipped += 1
+                if done % 50 == 0:
+                    print(f"  {done}/{len(digests)} images processed...")
+
+        for error in errors:
+            print(f"  ⚠️  {error}")
+        if errors:
+            print(f"⚠️  Migration completed, {len(errors)} image(s) could not be processed")
+        else:
+            print("✅ Migration completed successfully!")
+        print(f"\n{len(digests)} unique image(s): {created} got new variants, {skipped} already had them")
+        if legacy:
+            print(f"{legacy} row(s) still store Base64 image_data - run migrations/move_images_to_blob_store.py first")
+        return not errors
+
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create WebP variants for existing sketch and mockup images")
+    parser.add_argument("--force", action="store_true", help="Recreate variants that already exist")
+    args = parser.parse_args()
+    success = run_migration(force=args.force)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,160 @@
+"""
+Database Migration: Compress large generated text columns
+Rewrites existing rows of the CompressedText columns (see database/types.py)
+in batches and prints a size report. On PostgreSQL the columns are first
+converted from TEXT to BYTEA. Safe to re-run: compressed rows are skipped.
+
+Usage:
+    python -m migrations.compress_text_columns            # backfill + report
+    python -m migrations.compress_text_columns --report   # report only
+    python -m migrations.compress_text_columns --vacuum   # backfill, then VACUUM (SQLite) to shrink the file
+"""
+
+from sqlalchemy import create_engine, text, bindparam, LargeBinary
+from config.settings import Settings
+from database.types import compress_text, decompress_text, is_compressed
+from pathlib import Path
+import argparse
+import sys
+
+# (table, column) pairs stored as CompressedText
+COMPRESSED_COLUMNS = [
+    ("generated_content", "content"),
+    ("stage_summaries", "summary_text"),
+    ("test_insights", "insight_text"),
+    ("prototype_pages", "html_code"),
+    ("prototype_pages", "css_code"),
+    ("idea_categorizations", "categorization_text"),
+]
+
+BATCH_SIZE = 500
+
+def _sqlite_path():
+    """Database file for a SQLite URL, or None"""
+    if Settings.DATABASE_URL.startswith("sqlite:///"):
+        return Path(Settings.DATABASE_URL[len("sqlite:///"):])
+    return None
+
+def _format_size(num_bytes):
+    """Human-readable byte count"""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def convert_postgres_columns(conn):
+    """Change TEXT columns to BYTEA so they can hold compressed values"""
+    for table, column in COMPRESSED_COLUMNS:
+        data_type = conn.execute(text("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = :table AND column_name = :column
+        """), {"table": table, "column": column}).scalar()
+        if data_type and data_type != "bytea":
+            print(f"  Converting {table}.{column} to BYTEA...")
+            conn.execute(text(
+                f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BYTEA USING convert_to({column}, 'UTF8')"
+            ))
+    conn.commit()
+
+def process_column(conn, table, column, compress):
+    """
+    Scan one column in id order, compressing rows when requested
+
+    Returns:
+        dict with rows, compressed (rows rewritten), stored_before, stored_after and text bytes
+    """
+    stats = {"rows": 0, "compressed": 0, "stored_before": 0, "stored_after": 0, "text": 0}
+    update = text(f"UPDATE {table} SET {column} = :value WHERE id = :id").bindparams(
+        bindparam("value", type_=LargeBinary)
+    )
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            f"SELECT id, {column} FROM {table} WHERE id > :last_id AND {column} IS NOT NULL ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+
+        for row_id, value in rows:
+            stored = len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+            original = decompress_text(value)
+            stats["rows"] += 1
+            stats["stored_before"] += stored
+            stats["text"] += len(original.encode("utf-8"))
+            if compress and not is_compressed(value):
+                value = compress_text(original)
+                conn.execute(update, {"value": value, "id": row_id})
+                stats["compressed"] += 1
+                stored = len(value)
+            stats["stored_after"] += stored
+        last_id = rows[-1][0]
+
+        if compress:
+            conn.commit()
+            print(f"    {table}.{column}: {stats['rows']} rows scanned, {stats['compressed']} compressed")
+    return stats
+
+def run_migration(report_only=False, vacuum=False):
+    """Backfill compressed text columns and report their size"""
+
+    engine = create_engine(Settings.DATABASE_URL)
+    db_file = _sqlite_path()
+    file_size_before = db_file.stat().st_size if db_file and db_file.exists() else None
+
+    try:
+        with engine.connect() as conn:
+            if not report_only:
+                print("Starting migration: Compressing large text columns...")
+                if engine.dialect.name == "postgresql":
+                    convert_postgres_columns(conn)
+
+            results = []
+            for table, column in COMPRESSED_COLUMNS:
+                results.append((table, column, process_column(conn, table, column, not report_only)))
+
+            if vacuum and engine.dialect.name == "sqlite":
+                print("  Running VACUUM to reclaim free pages...")
+                conn.execute(text("VACUUM"))
+
+        print("\n" + "=" * 78)
+        print(f"{'Column':<42}{'Rows':>7}{'Text':>11}{'Stored':>11}{'Ratio':>7}")
+        print("-" * 78)
+        total_text = total_stored = 0
+        for table, column, stats in results:
+            ratio = stats["text"] / stats["stored_after"] if stats["stored_after"] else 1.0
+            total_text += stats["text"]
+            total_stored += stats["stored_after"]
+            print(f"{table + '.' + column:<42}{stats['rows']:>7}{_format_size(stats['text']):>11}"
+                  f"{_format_size(stats['stored_after']):>11}{ratio:>6.1f}x")
+        print("-" * 78)
+        ratio = total_text / total_stored if total_stored else 1.0
+        print(f"{'Total':<42}{'':>7}{_format_size(total_text):>11}{_format_size(total_stored):>11}{ratio:>6.1f}x")
+
+        if file_size_before is not None:
+            file_size_after = db_file.stat().st_size
+            print(f"\nDatabase file: {_format_size(file_size_before)} -> {_format_size(file_size_after)}")
+            if not vacuum and not report_only:
+                print("  (SQLite only returns freed pages to the OS after VACUUM - re-run with --vacuum)")
+        print("=" * 78)
+
+        if not report_only:
+            print("✅ Migration completed successfully!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress large generated text columns")
+    parser.add_argument("--report", action="store_true", help="Only print the size report")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM a SQLite database afterwards")
+    args = parser.parse_args()
+    success = run_migration(report_only=args.report, vacuum=args.vacuum)
+    sys.exit(0 if success else 1)
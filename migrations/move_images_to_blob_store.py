@@ -0,0 +1,152 @@
+"""
+Database Migration: Move sketch and mockup images to the blob store
+Adds the image_sha256 / image_size / image_mime_type / image_width /
+image_height columns, then streams the legacy Base64 image_data of
+sketch_iterations and mockup_iterations into the content-addressed blob store
+(services/blob_store.py) in batches and clears image_data. Safe to re-run:
+rows already moved are skipped.
+
+Usage:
+    python -m migrations.move_images_to_blob_store            # move images
+    python -m migrations.move_images_to_blob_store --vacuum   # move, then VACUUM (SQLite) to shrink the file
+"""
+
+from sqlalchemy import create_engine, inspect, text
+from config.settings import Settings
+from database.models import Base, ImageBlob
+from services.blob_store import DatabaseBlobStore, FileBlobStore, store_image
+from sqlalchemy.orm import sessionmaker
+import argparse
+import base64
+import sys
+
+IMAGE_TABLES = ["sketch_iterations", "mockup_iterations"]
+
+NEW_COLUMNS = [
+    ("image_sha256", "VARCHAR(64)"),
+    ("image_size", "INTEGER"),
+    ("image_mime_type", "VARCHAR(50)"),
+    ("image_width", "INTEGER"),
+    ("image_height", "INTEGER"),
+]
+
+BATCH_SIZE = 100
+
+def add_columns(conn):
+    """Add the blob reference columns that are missing"""
+    inspector = inspect(conn)
+    for table in IMAGE_TABLES:
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for column, column_type in NEW_COLUMNS:
+            if column not in existing:
+                print(f"  Adding {table}.{column}...")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+        index_name = f"ix_{table}_image_sha256"
+        if index_name not in {index["name"] for index in inspector.get_indexes(table)}:
+            conn.execute(text(f"CREATE INDEX {index_name} ON {table} (image_sha256)"))
+    conn.commit()
+
+def move_table(conn, table, store):
+    """
+    Move one table's images in id order, committing per batch
+
+    Returns:
+        dict with rows, moved, failed, base64 (bytes stored before), image (decoded bytes)
+        and digests (set of blob hashes)
+    """
+    stats = {"rows": 0, "moved": 0, "failed": 0, "base64": 0, "image": 0, "digests": set()}
+    update = text(f"""
+        UPDATE {table}
+        SET image_sha256 = :image_sha256, image_size = :image_size, image_mime_type = :image_mime_type,
+            image_width = :image_width, image_height = :image_height, image_data = NULL
+        WHERE id = :id
+    """)
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            f"SELECT id, image_data FROM {table} WHERE id > :last_id AND image_data IS NOT NULL "
+            f"AND image_sha256 IS NULL ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+
+        # Store the whole batch before updating any row: the UPDATEs hold the
+        # write lock until the commit, and the database blob store writes
+        # through a session of its own
+        updates = []
+        for row_id, image_data in rows:
+            stats["rows"] += 1
+            try:
+                data = base64.b64decode(image_data)
+            except Exception as e:
+                print(f"    ⚠️  {table} #{row_id}: cannot decode image ({e}), left in place")
+                stats["failed"] += 1
+                continue
+            values = store_image(data, store)
+            updates.append({**values, "id": row_id})
+            stats["base64"] += len(image_data)
+            stats["image"] += len(data)
+            stats["digests"].add(values["image_sha256"])
+        last_id = rows[-1][0]
+
+        if updates:
+            conn.execute(update, updates)
+            stats["moved"] += len(updates)
+        conn.commit()
+        print(f"    {table}: {stats['rows']} rows scanned, {stats['moved']} moved")
+    return stats
+
+def run_migration(vacuum=False):
+    """Move legacy Base64 images into the blob store"""
+
+    engine = create_engine(Settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            print("Starting migration: Moving images to the blob store...")
+            add_columns(conn)
+
+            if Settings.BLOB_STORE == "database":
+                Base.metadata.create_all(bind=engine, tables=[ImageBlob.__table__])
+                store = DatabaseBlobStore(sessionmaker(bind=engine))
+                print("  Blob store: image_blobs table")
+            else:
+                store = FileBlobStore(Settings.BLOB_DIR)
+                print(f"  Blob store: {Settings.BLOB_DIR}")
+
+            results = [(table, move_table(conn, table, store)) for table in IMAGE_TABLES]
+
+            if vacuum and engine.dialect.name == "sqlite":
+                print("  Running VACUUM to reclaim free pages...")
+                conn.execute(text("VACUUM"))
+
+        failed = sum(stats["failed"] for _, stats in results)
+        if failed:
+            print(f"⚠️  Migration completed, {failed} undecodable image(s) left in image_data")
+        else:
+            print("✅ Migration completed successfully!")
+        digests = set()
+        for table, stats in results:
+            digests |= stats["digests"]
+            print(f"\n{table}: {stats['moved']} image(s) moved, {stats['failed']} failed, "
+                  f"{stats['base64']:,} Base64 bytes -> {stats['image']:,} image bytes")
+        moved = sum(stats["moved"] for _, stats in results)
+        print(f"\n{moved} image(s) stored as {len(digests)} unique blob(s) ({moved - len(digests)} deduplicated)")
+        if not vacuum and engine.dialect.name == "sqlite" and moved:
+            print("  (SQLite only returns freed pages to the OS after VACUUM - re-run with --vacuum)")
+        return failed == 0
+
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move sketch and mockup images to the blob store")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM a SQLite database afterwards")
+    args = parser.parse_args()
+    success = run_migration(vacuum=args.vacuum)
+    sys.exit(0 if success else 1)
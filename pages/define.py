@@ -1,7 +1,12 @@
 import streamlit as st
 from config.database import get_db
 from database.models import GeneratedContent, ResearchData, Project, StageSummary
+from database.crud.sequences import next_summary_version
 from services.ai_service import AIService
+from services.ai_errors import AIServiceError
+from services.prompt_builder import PromptBuilder, count_tokens, get_input_budget
+from services.job_runner import submit_job
+from components.job_status import display_job_status, watch_job
 from datetime import datetime
 from utils.time_utils import format_local_time
 from utils.model_badge import display_model_badge
@@ -15,6 +20,9 @@ ANALYSIS_METHODS = {
     "stakeholder_map": {"name": "Stakeholder Map", "icon": "🌐"}
 }
 
+# Token cap per analysis when synthesizing the stage summary
+SUMMARY_SECTION_MAX_TOKENS = 1500
+
 def generate_stage_summary(project_id):
     """
     Automatically generate Define stage summary from latest analyses.
@@ -42,38 +50,40 @@ def generate_stage_summary(project_id):
         if not latest_analyses:
             return
 
-        # Format analyses for prompt
-        analyses_text = ""
-        for method_key, content in latest_analyses.items():
-            method_name = ANALYSIS_METHODS[method_key]["name"]
-            analyses_text += f"\n**{method_name}:**\n{content[:1000]}\n\n"  # Limit each to 1000 chars
-
         # Generate summary using AI
-        from prompts.summary import DEFINE_STAGE_SUMMARY_PROMPT
-        ai_service = AIService(model=project.preferred_model)
-
-        user_prompt = f"""
-        Analyze and synthesize the following Define stage analyses into a problem statement.
+        from prompts.summary import DEFINE_STAGE_SUMMARY_PROMPT, DEFINE_STAGE_SUMMARY_INPUT
+        ai_service = AIService(model=project.preferred_model, project_id=project.id)
+
+        # Format analyses for prompt. Each analysis is capped so the summary
+        # stays focused on the headline findings.
+        builder = PromptBuilder(
+            budget=get_input_budget(ai_service.model),
+            reserved=count_tokens(DEFINE_STAGE_SUMMARY_PROMPT) + count_tokens(DEFINE_STAGE_SUMMARY_INPUT)
+        )
+        for method_key, content in latest_analyses.items():
+            builder.add(method_key, content, priority=0, max_size=SUMMARY_SECTION_MAX_TOKENS)
+        sections = builder.fit()
+        builder.log_report("define.stage_summary")
 
-        **Analyses Available:**
-        {analyses_text}
-        """
+        analyses_text = ""
+        for method_key, content in sections.items():
+            method_name = ANALYSIS_METHODS[method_key]["name"]
+            analyses_text += f"\n**{method_name}:**\n{content}\n\n"
 
-        system_prompt = DEFINE_STAGE_SUMMARY_PROMPT.format(
+        user_prompt = DEFINE_STAGE_SUMMARY_INPUT.format(
             project_name=project.name,
             project_area=project.area,
             project_goal=project.goal,
             define_analyses=analyses_text
         )
 
-        summary_text = ai_service._call_openai(system_prompt, user_prompt)
+        # Each summary is saved as a new version, so never replay a cached one
+        summary_text = ai_service._call_openai(DEFINE_STAGE_SUMMARY_PROMPT, user_prompt,
+                                               content_type="define_summary", use_cache=False)
 
         if summary_text:
-            # Get current version number
-            current_version = db.query(StageSummary).filter(
-                StageSummary.project_id == project_id,
-                StageSummary.stage == "define"
-            ).count() + 1
+            # Allocate the next version number
+            current_version = next_summary_version(db, project_id, "define")
 
             # Save summary to database
             new_summary = StageSummary(
@@ -130,6 +140,12 @@ def render_define_page(project):
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+    # One-shot mode: all six analyses in parallel
+    st.markdown('<div style="margin-top: 1rem;"></div>', unsafe_allow_html=True)
+    if st.button("⚡ Generate All Analyses", key="generate_all_analyses", use_container_width=True):
+        generate_all_analyses(project.id)
+    display_job_status(project.id, ["define_analyses"], "define_all")
+
 
 @st.dialog("Analysis Manager")
 def open_analysis_dialog(project, method_key, method_name, research_data):
@@ -198,20 +214,8 @@ def generate_analysis(project_id, content_type, content_name, research_data):
         bool: True if successful, False if failed
     """
 
-    # Import the appropriate prompt based on content type
-    if content_type == "empathy_map":
-        from prompts.define.empathy_map import EMPATHY_MAP_PROMPT as ANALYSIS_PROMPT
-    elif content_type == "persona":
-        from prompts.define.persona import PERSONA_PROMPT as ANALYSIS_PROMPT
-    elif content_type == "journey_map":
-        from prompts.define.journey_map import JOURNEY_MAP_PROMPT as ANALYSIS_PROMPT
-    elif content_type == "affinity_map":
-        from prompts.define.affinity_map import AFFINITY_MAP_PROMPT as ANALYSIS_PROMPT
-    elif content_type == "storytelling":
-        from prompts.define.storytelling import STORYTELLING_PROMPT as ANALYSIS_PROMPT
-    elif content_type == "stakeholder_map":
-        from prompts.define.stakeholder_map import STAKEHOLDER_MAP_PROMPT as ANALYSIS_PROMPT
-    else:
+    ANALYSIS_PROMPT = get_analysis_prompt(content_type)
+    if ANALYSIS_PROMPT is None:
         st.error(f"Unknown analysis type: {content_type}")
         return False
 
@@ -228,7 +232,7 @@ def generate_analysis(project_id, content_type, content_name, research_data):
         with st.spinner(f"🤖 Generating {content_name}... This may take a moment."):
             # Initialize AI service with project's preferred model
             try:
-                ai_service = AIService(model=project.preferred_model)
+                ai_service = AIService(model=project.preferred_model, project_id=project.id)
             except ValueError as e:
                 # Handle missing API key error
                 if "API_KEY not set" in str(e):
@@ -243,44 +247,32 @@ def generate_analysis(project_id, content_type, content_name, research_data):
                     st.error(f"Configuration error: {str(e)}")
                 return False
 
-            # Format research data
-            research_section = ""
-            if research_data:
-                research_section = "\n**Research Data:**\n"
-                for idx, data in enumerate(research_data, 1):
-                    method_name = data.method_type.replace('_', ' ').title()
-                    research_section += f"\n--- {method_name} Data {idx} ---\n"
-                    research_section += f"{data.file_content[:5000]}\n"  # Limit to first 5000 chars per file
-
-            # Build user prompt
-            user_prompt = f"""
-            **Project Context:**
-            Project: {project.name}
-            Area: {project.area}
-            Goal: {project.goal}
-            {research_section}
-
-            Generate a comprehensive {content_name.lower()} based on the research data provided above.
-            Include specific references to the research data sources.
-            """
+            user_prompt = build_analysis_user_prompt(
+                project, content_name, research_data, ai_service.model, ANALYSIS_PROMPT
+            )
 
-            # Call AI service
-            generated_content = ai_service._call_openai(ANALYSIS_PROMPT, user_prompt)
+            def save_content(text):
+                # Save to database with model info once the stream completes
+                new_content = GeneratedContent(
+                    project_id=project_id,
+                    content_type=content_type,
+                    content=text,
+                    model_used=ai_service.last_model_used
+                )
+                db.add(new_content)
+                db.commit()
+
+            # Stream the analysis so it renders as it is generated; the user asked
+            # for a new analysis, so skip the response cache
+            generated_content = st.write_stream(
+                ai_service.stream_text(ANALYSIS_PROMPT, user_prompt, on_complete=save_content,
+                                       content_type=content_type, use_cache=False)
+            )
 
             if not generated_content:
                 st.error("Failed to generate content. Please try again.")
                 return False
 
-            # Save to database with model info
-            new_content = GeneratedContent(
-                project_id=project_id,
-                content_type=content_type,
-                content=generated_content,
-                model_used=project.preferred_model
-            )
-            db.add(new_content)
-            db.commit()
-
             # Auto-generate stage summary in background (silent)
             # generate_stage_summary(project_id)
 
@@ -294,3 +286,148 @@ def generate_analysis(project_id, content_type, content_name, research_data):
 
     finally:
         db.close()
+
+
+def get_analysis_prompt(content_type):
+    """Get the system prompt for an analysis type, or None if unknown"""
+    if content_type == "empathy_map":
+        from prompts.define.empathy_map import EMPATHY_MAP_PROMPT as ANALYSIS_PROMPT
+    elif content_type == "persona":
+        from prompts.define.persona import PERSONA_PROMPT as ANALYSIS_PROMPT
+    elif content_type == "journey_map":
+        from prompts.define.journey_map import JOURNEY_MAP_PROMPT as ANALYSIS_PROMPT
+    elif content_type == "affinity_map":
+        from prompts.define.affinity_map import AFFINITY_MAP_PROMPT as ANALYSIS_PROMPT
+    elif content_type == "storytelling":
+        from prompts.define.storytelling import STORYTELLING_PROMPT as ANALYSIS_PROMPT
+    elif content_type == "stakeholder_map":
+        from prompts.define.stakeholder_map import STAKEHOLDER_MAP_PROMPT as ANALYSIS_PROMPT
+    else:
+        return None
+    return ANALYSIS_PROMPT
+
+
+def build_analysis_user_prompt(project, content_name, research_data, model, system_prompt=""):
+    """
+    Build the user prompt shared by all Define analyses
+
+    Research files share the model's input budget left after the system
+    prompt and project context, so small uploads are sent whole and large
+    ones are trimmed evenly.
+    """
+    user_prompt = """
+            **Project Context:**
+            Project: {project_name}
+            Area: {project_area}
+            Goal: {project_goal}
+            {research_section}
+
+            Generate a comprehensive {content_name} based on the research data provided above.
+            Include specific references to the research data sources.
+            """
+    fields = {
+        "project_name": project.name,
+        "project_area": project.area,
+        "project_goal": project.goal,
+        "content_name": content_name.lower(),
+    }
+
+    # Format research data
+    research_section = ""
+    if research_data:
+        headers = []
+        builder = PromptBuilder(
+            budget=get_input_budget(model),
+            reserved=count_tokens(system_prompt) + count_tokens(user_prompt.format(research_section="", **fields))
+        )
+        for idx, data in enumerate(research_data, 1):
+            method_name = data.method_type.replace('_', ' ').title()
+            headers.append(f"\n--- {method_name} Data {idx} ---\n")
+            builder.add(f"research_{idx}", data.file_content, priority=0)
+        builder.reserved += count_tokens("\n**Research Data:**\n" + "".join(headers))
+
+        sections = builder.fit()
+        builder.log_report(f"define.{content_name.lower().replace(' ', '_')}")
+
+        research_section = "\n**Research Data:**\n"
+        for idx, header in enumerate(headers, 1):
+            research_section += header
+            research_section += f"{sections[f'research_{idx}']}\n"
+
+    return user_prompt.format(research_section=research_section, **fields)
+
+
+def generate_all_analyses(project_id):
+    """Queue generation of all six Define analyses as a background job"""
+    job_id = submit_job(project_id, "define_analyses")
+    watch_job("define_all", job_id)
+
+def run_define_analyses_job(job, db, progress):
+    """
+    Generate all six Define analyses concurrently (runs on the background job runner).
+    Each GeneratedContent row is saved as soon as its analysis lands, and the
+    stage summary is generated once at the end.
+
+    Args:
+        job: GenerationJob for the project
+        db: Database session
+        progress: Progress callback (fraction, message)
+
+    Returns:
+        dict: {"generated": [...], "errors": {method_key: message}}
+
+    Raises:
+        ValueError: If the project is missing or every analysis failed
+    """
+    project = db.query(Project).filter(Project.id == job.project_id).first()
+    if not project:
+        raise ValueError("Project not found")
+    research_data = db.query(ResearchData).filter(ResearchData.project_id == project.id).all()
+
+    ai_service = AIService(model=project.preferred_model, project_id=project.id)
+
+    method_keys = list(ANALYSIS_METHODS.keys())
+    prompts = []
+    for method_key in method_keys:
+        system_prompt = get_analysis_prompt(method_key)
+        prompts.append((
+            system_prompt,
+            build_analysis_user_prompt(
+                project, ANALYSIS_METHODS[method_key]["name"], research_data, ai_service.model, system_prompt
+            )
+        ))
+
+    # The summary counts as one more step after the analyses
+    steps = len(method_keys) + 1
+    progress(0.0, f"Generating {len(method_keys)} analyses in parallel...")
+
+    generated = []
+    errors = {}
+    for done, (idx, result) in enumerate(
+        ai_service.iter_generate_many(prompts, return_exceptions=True, content_types=method_keys), 1
+    ):
+        method_key = method_keys[idx]
+        method_info = ANALYSIS_METHODS[method_key]
+
+        if isinstance(result, AIServiceError) or not result:
+            errors[method_key] = str(result or 'empty response')
+            progress(done / steps, f"❌ {method_info['name']}: {errors[method_key]}")
+            continue
+
+        db.add(GeneratedContent(
+            project_id=project.id,
+            content_type=method_key,
+            content=result,
+            model_used=ai_service.last_model_used
+        ))
+        db.commit()
+        generated.append(method_key)
+        progress(done / steps, f"✅ {method_info['name']}")
+
+    if not generated:
+        raise ValueError("No analyses generated: " + "; ".join(f"{key}: {error}" for key, error in errors.items()))
+
+    progress(len(method_keys) / steps, "📝 Updating Define stage summary...")
+    generate_stage_summary(project.id)
+
+    return {"generated": generated, "errors": errors}
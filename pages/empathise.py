@@ -3,6 +3,7 @@ import streamlit as st
 from config.database import get_db
 from database.models import ResearchData
 from services.ai_service import AIService
+from services.ai_errors import AIServiceError
 from docx import Document
 import io
 
@@ -166,7 +167,7 @@ def generate_template(method_type, method_name, project):
 
     if st.button(button_label, key=f"gen_btn_{method_type}", type="primary", use_container_width=True):
         with st.spinner(f"Generating {method_name} template for {project.name}..."):
-            ai_service = AIService(model=project.preferred_model)
+            ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
             user_prompt = f"""
             Generate a professional {method_name} template for {additional_context}.
@@ -185,7 +186,11 @@ def generate_template(method_type, method_name, project):
                 project_goal=project.goal,
                 tone=tone
             )
-            template_content = ai_service._call_openai(system_prompt, user_prompt)
+            try:
+                template_content = ai_service._call_openai(system_prompt, user_prompt)
+            except AIServiceError as e:
+                st.error(f"Error generating template: {str(e)}")
+                return
 
             # Show generated template
             show_generated_template(method_name, template_content, method_type, project)
@@ -1,6 +1,7 @@
 import streamlit as st
 from config.database import get_db
 from database.models import BrainstormIdea, StageSummary, Project, IdeaCategorization, GeneratedContent
+from database.crud.bulk import bulk_insert
 from services.ai_service import AIService
 from datetime import datetime, timezone
 from utils.time_utils import format_local_time
@@ -92,7 +93,7 @@ def open_brainstorming_dialog(project):
                         BrainstormIdea.idea_type.like('seed_%')
                     ).delete()
                     db.commit()
-                    success = generate_seed_ideas(project.id)
+                    success = generate_seed_ideas(project.id, use_cache=False)
                     db.close()
                     if success:
                         st.toast("✅ Seeds regenerated! Reopen Brainstorming to see the new ideas.", icon="✨")
@@ -170,10 +171,14 @@ def display_seed_ideas(seeds):
     for idea in wild:
         st.markdown(f"- {idea.idea_text}")
 
-def generate_seed_ideas(project_id):
+def generate_seed_ideas(project_id, use_cache=True):
     """
     Generate 15 seed ideas (5 practical, 5 bold, 5 wild)
 
+    Args:
+        project_id: Project ID
+        use_cache: Set False to get fresh ideas instead of a cached response
+
     Returns:
         bool: True if successful, False if failed
     """
@@ -207,7 +212,7 @@ def generate_seed_ideas(project_id):
 
         with st.spinner("🤖 Generating seed ideas... This may take a moment."):
             try:
-                ai_service = AIService(model=project.preferred_model)
+                ai_service = AIService(model=project.preferred_model, project_id=project.id)
             except ValueError as e:
                 if "API_KEY not set" in str(e):
                     st.error(f"❌ API key missing: {str(e)}")
@@ -224,11 +229,11 @@ def generate_seed_ideas(project_id):
                 problem_define=problem_define
             )
 
-            result = ai_service._call_openai(system_prompt, user_prompt)
+            result = ai_service._call_openai(system_prompt, user_prompt, use_cache=use_cache)
 
             if result:
                 # Parse and save ideas with model info
-                parse_and_save_seed_ideas(project_id, result, project.preferred_model, db)
+                parse_and_save_seed_ideas(project_id, result, ai_service.last_model_used, db)
                 st.success("✅ Seed ideas generated!")
                 return True
             else:
@@ -247,6 +252,7 @@ def parse_and_save_seed_ideas(project_id, ai_result, model_used, db):
     lines = ai_result.split('\n')
     order = 0
     current_type = None
+    ideas = []
 
     for line in lines:
         line = line.strip()
@@ -258,17 +264,17 @@ def parse_and_save_seed_ideas(project_id, ai_result, model_used, db):
             current_type = 'seed_wild'
         elif line.startswith('-') or line.startswith('*'):
             if current_type:
-                idea = BrainstormIdea(
-                    project_id=project_id,
-                    idea_type=current_type,
-                    idea_text=line.lstrip('-* '),
-                    model_used=model_used,
-                    order_index=order
-                )
-                db.add(idea)
+                ideas.append({
+                    "project_id": project_id,
+                    "idea_type": current_type,
+                    "idea_text": line.lstrip('-* '),
+                    "model_used": model_used,
+                    "order_index": order
+                })
                 order += 1
 
-    db.commit()
+    # One multi-row INSERT for all ideas
+    bulk_insert(db, BrainstormIdea, ideas)
 
 def expand_idea(project_id, user_idea):
     """Expand a user's idea using AI"""
@@ -287,7 +293,7 @@ def expand_idea(project_id, user_idea):
         problem_summary = latest_summary.summary_text if latest_summary else f"{project.goal}"
 
         with st.spinner("🔍 Expanding your idea..."):
-            ai_service = AIService(model=project.preferred_model)
+            ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
             system_prompt = BRAINSTORM_EXPAND_IDEA_PROMPT.format(
                 project_name=project.name,
@@ -296,7 +302,10 @@ def expand_idea(project_id, user_idea):
                 user_idea=user_idea
             )
 
-            expansion = ai_service._call_openai(system_prompt, f"Expand this idea: {user_idea}")
+            # Stream the expansion so it renders as it is generated
+            expansion = st.write_stream(
+                ai_service.stream_text(system_prompt, f"Expand this idea: {user_idea}")
+            )
 
             if expansion:
                 # Save parent idea
@@ -315,7 +324,7 @@ def expand_idea(project_id, user_idea):
                     idea_type='expansion',
                     idea_text=expansion,
                     parent_id=parent.id,
-                    model_used=project.preferred_model
+                    model_used=ai_service.last_model_used
                 )
                 db.add(expanded)
                 db.commit()
@@ -350,7 +359,7 @@ def categorize_ideas(project_id):
             if idea.idea_type in ('user_input', 'expansion'):
                 ideas_text += f"- {idea.idea_text}\n"
 
-        ai_service = AIService(model=project.preferred_model)
+        ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
         system_prompt = BRAINSTORM_CATEGORIZE_IDEAS_PROMPT.format(
             project_name=project.name,
@@ -447,19 +456,17 @@ def generate_ideate_summary(project_id):
             return
 
         # Generate summary using AI
-        from prompts.summary import IDEATE_STAGE_SUMMARY_PROMPT
-        ai_service = AIService(model=project.preferred_model)
+        from prompts.summary import IDEATE_STAGE_SUMMARY_PROMPT, IDEATE_STAGE_SUMMARY_INPUT
+        ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
-        system_prompt = IDEATE_STAGE_SUMMARY_PROMPT.format(
+        user_prompt = IDEATE_STAGE_SUMMARY_INPUT.format(
             project_name=project.name,
             project_area=project.area,
             project_goal=project.goal,
             ideation_data=ideation_data
         )
 
-        user_prompt = "Synthesize the ideation results into a concise summary."
-
-        summary_text = ai_service._call_openai(system_prompt, user_prompt)
+        summary_text = ai_service._call_openai(IDEATE_STAGE_SUMMARY_PROMPT, user_prompt, content_type="ideate_summary")
 
         if summary_text:
             # Check if summary already exists for this project's ideate stage
@@ -4,10 +4,17 @@ import streamlit as st
 import json
 from datetime import datetime
 from database.models import (
-    ImplementationRoadmap, ImplementationTask, JiraConfig,
-    StageSummary, UserTest, TestInsight
+    Project, ImplementationRoadmap, ImplementationTask, JiraConfig,
+    StageSummary, UserTest
 )
 from services.ai_service import AIService
+from prompts.implement.schemas import Roadmap, TaskBreakdown
+from services.job_runner import submit_job
+from database.crud.jobs import get_project_jobs
+from database.crud.stages import get_latest_stage_summaries
+from database.crud.user_tests import list_insights_by_priority
+from database.crud.bulk import bulk_insert
+from components.job_status import display_job_status, watch_job
 from utils.time_utils import format_local_time
 from config.database import get_db
 
@@ -54,6 +61,9 @@ def render_roadmap_tab(project, roadmap, db):
 
     st.markdown("### Strategic Implementation Roadmap")
 
+    # Progress of queued/running roadmap generations
+    display_job_status(project.id, ["roadmap"], "implement_roadmap")
+
     # Show badge if roadmap exists
     if roadmap:
         st.success("✅ Roadmap Complete")
@@ -110,85 +120,105 @@ def render_roadmap_tab(project, roadmap, db):
             submitted = st.form_submit_button("🎯 Generate Roadmap", type="primary", use_container_width=True)
 
             if submitted:
-                generate_roadmap(project, team_size, sprint_duration, target_launch_weeks, development_approach, db)
-                if 'regenerate_roadmap' in st.session_state:
-                    del st.session_state['regenerate_roadmap']
+                regenerate = st.session_state.pop('regenerate_roadmap', False)
+                generate_roadmap(project, team_size, sprint_duration, target_launch_weeks, development_approach, db,
+                                 use_cache=not regenerate)
                 st.rerun()
 
-def generate_roadmap(project, team_size, sprint_duration, target_launch_weeks, development_approach, db):
-    """Generate roadmap using AI"""
+def generate_roadmap(project, team_size, sprint_duration, target_launch_weeks, development_approach, db,
+                     use_cache=True):
+    """Queue roadmap generation as a background job (use_cache=False forces a fresh roadmap)"""
+    job_id = submit_job(project.id, "roadmap", {
+        "team_size": team_size,
+        "sprint_duration": sprint_duration,
+        "target_launch_weeks": target_launch_weeks,
+        "development_approach": development_approach,
+        "use_cache": use_cache
+    })
+    watch_job("implement_roadmap", job_id)
+
+def run_roadmap_job(job, db, progress):
+    """
+    Generate a roadmap with AI (runs on the background job runner)
 
-    with st.spinner("🧠 Generating strategic roadmap..."):
-        # Gather context from previous stages
-        context = gather_project_context(project, db)
+    Args:
+        job: GenerationJob with team_size, sprint_duration, target_launch_weeks,
+            development_approach and (optional) use_cache params
+        db: Database session
+        progress: Progress callback (fraction, message)
 
-        # Get test feedback priorities
-        test_priorities = gather_test_priorities(project, db)
+    Returns:
+        dict: {"roadmap_id": ...}
 
-        # Call AI service
-        ai_service = AIService(model=project.preferred_model)
+    Raises:
+        ValueError: If the project is missing
+        StructuredOutputError: If the response could not be repaired into a roadmap
+        AIServiceError: If the AI request fails
+    """
+    params = job.params
+    project = db.query(Project).filter(Project.id == job.project_id).first()
+    if not project:
+        raise ValueError("Project not found")
 
-        from prompts.implement.roadmap_generation import GENERATE_ROADMAP_PROMPT
+    progress(0.1, "Gathering project context...")
 
-        prompt = GENERATE_ROADMAP_PROMPT.format(
-            project_name=project.name,
-            project_goal=project.goal,
-            team_size=team_size,
-            sprint_duration=sprint_duration,
-            target_launch_weeks=target_launch_weeks,
-            development_approach=development_approach,
-            project_context=context,
-            test_priorities=test_priorities
-        )
+    # Gather context from previous stages
+    context = gather_project_context(project, db)
 
-        roadmap_json = ai_service._call_openai(
-            "You are an expert software architect and project manager creating strategic implementation roadmaps.",
-            prompt
-        )
+    # Get test feedback priorities
+    test_priorities = gather_test_priorities(project, db)
 
-        # Parse JSON response
-        try:
-            # Remove markdown code blocks if present
-            roadmap_json = roadmap_json.strip()
-            if roadmap_json.startswith("```"):
-                roadmap_json = roadmap_json.split("```")[1]
-                if roadmap_json.startswith("json"):
-                    roadmap_json = roadmap_json[4:]
-
-            roadmap_data = json.loads(roadmap_json)
-
-            # Create or update roadmap
-            existing_roadmap = db.query(ImplementationRoadmap).filter(
-                ImplementationRoadmap.project_id == project.id
-            ).first()
-
-            if existing_roadmap:
-                # Update existing
-                existing_roadmap.team_size = team_size
-                existing_roadmap.sprint_duration = sprint_duration
-                existing_roadmap.target_launch_weeks = target_launch_weeks
-                existing_roadmap.development_approach = development_approach
-                existing_roadmap.phases_json = roadmap_data
-                existing_roadmap.updated_at = datetime.utcnow()
-            else:
-                # Create new
-                new_roadmap = ImplementationRoadmap(
-                    project_id=project.id,
-                    team_size=team_size,
-                    sprint_duration=sprint_duration,
-                    target_launch_weeks=target_launch_weeks,
-                    development_approach=development_approach,
-                    phases_json=roadmap_data
-                )
-                db.add(new_roadmap)
+    # Call AI service
+    ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
-            db.commit()
-            st.success("✅ Roadmap generated successfully!")
+    from prompts.implement.roadmap_generation import ROADMAP_SYSTEM_PROMPT, GENERATE_ROADMAP_PROMPT
+
+    prompt = GENERATE_ROADMAP_PROMPT.format(
+        project_name=project.name,
+        project_goal=project.goal,
+        team_size=params["team_size"],
+        sprint_duration=params["sprint_duration"],
+        target_launch_weeks=params["target_launch_weeks"],
+        development_approach=params["development_approach"],
+        project_context=context,
+        test_priorities=test_priorities
+    )
+
+    progress(0.2, "Generating strategic roadmap...")
+    roadmap_data = ai_service.generate_structured(
+        ROADMAP_SYSTEM_PROMPT, prompt, Roadmap, content_type="roadmap",
+        use_cache=params.get("use_cache", True)
+    ).model_dump()
+
+    progress(0.9, "Saving roadmap...")
+
+    # Create or update roadmap
+    roadmap = db.query(ImplementationRoadmap).filter(
+        ImplementationRoadmap.project_id == project.id
+    ).first()
+
+    if roadmap:
+        # Update existing
+        roadmap.team_size = params["team_size"]
+        roadmap.sprint_duration = params["sprint_duration"]
+        roadmap.target_launch_weeks = params["target_launch_weeks"]
+        roadmap.development_approach = params["development_approach"]
+        roadmap.phases_json = roadmap_data
+        roadmap.updated_at = datetime.utcnow()
+    else:
+        # Create new
+        roadmap = ImplementationRoadmap(
+            project_id=project.id,
+            team_size=params["team_size"],
+            sprint_duration=params["sprint_duration"],
+            target_launch_weeks=params["target_launch_weeks"],
+            development_approach=params["development_approach"],
+            phases_json=roadmap_data
+        )
+        db.add(roadmap)
 
-        except json.JSONDecodeError as e:
-            st.error(f"Failed to parse AI response: {e}")
-            with st.expander("🔍 View Raw Response"):
-                st.code(roadmap_json)
+    db.commit()
+    return {"roadmap_id": roadmap.id}
 
 def display_roadmap(roadmap, db):
     """Display the generated roadmap"""
@@ -256,6 +286,9 @@ def render_task_breakdown_tab(project, roadmap, db):
 
     st.markdown("### Development Task Breakdown")
 
+    # Progress of queued/running task generations
+    display_job_status(project.id, ["tasks"], "implement_tasks")
+
     # Check if tasks exist
     tasks = []
     if roadmap:
@@ -271,8 +304,10 @@ def render_task_breakdown_tab(project, roadmap, db):
     if not tasks:
         st.info("No tasks generated yet. Click below to generate tasks from your roadmap.")
 
-        if st.button("🎯 Generate Tasks from Roadmap", type="primary"):
-            generate_tasks_from_roadmap(project, roadmap, db)
+        tasks_running = bool(get_project_jobs(db, project.id, ["tasks"], active_only=True))
+        if st.button("🎯 Generate Tasks from Roadmap", type="primary", disabled=tasks_running):
+            regenerate = st.session_state.pop('regenerate_tasks', False)
+            generate_tasks_from_roadmap(project, roadmap, db, use_cache=not regenerate)
             st.rerun()
     else:
         # Display tasks
@@ -289,6 +324,7 @@ def render_task_breakdown_tab(project, roadmap, db):
                     ImplementationTask.roadmap_id == roadmap.id
                 ).delete()
                 db.commit()
+                st.session_state['regenerate_tasks'] = True
                 st.rerun()
 
         with col2:
@@ -303,66 +339,79 @@ def render_task_breakdown_tab(project, roadmap, db):
     if st.session_state.get('show_add_task_dialog', False):
         show_add_task_dialog(roadmap, db)
 
-def generate_tasks_from_roadmap(project, roadmap, db):
-    """Generate detailed tasks using AI"""
+def generate_tasks_from_roadmap(project, roadmap, db, use_cache=True):
+    """Queue task generation as a background job (use_cache=False forces fresh tasks)"""
+    job_id = submit_job(project.id, "tasks", {"roadmap_id": roadmap.id, "use_cache": use_cache})
+    watch_job("implement_tasks", job_id)
 
-    with st.spinner("🧠 Generating detailed tasks..."):
-        # Gather context
-        roadmap_context = json.dumps(roadmap.phases_json, indent=2)
-        test_priorities = gather_test_priorities(project, db)
+def run_tasks_job(job, db, progress):
+    """
+    Generate detailed tasks with AI (runs on the background job runner)
 
-        # Call AI service
-        ai_service = AIService(model=project.preferred_model)
+    Args:
+        job: GenerationJob with a roadmap_id and (optional) use_cache param
+        db: Database session
+        progress: Progress callback (fraction, message)
 
-        from prompts.implement.task_generation import GENERATE_TASKS_PROMPT
+    Returns:
+        dict: {"roadmap_id": ..., "task_count": ...}
 
-        prompt = GENERATE_TASKS_PROMPT.format(
-            project_name=project.name,
-            project_goal=project.goal,
-            roadmap_context=roadmap_context,
-            test_priorities=test_priorities
-        )
+    Raises:
+        ValueError: If the roadmap is missing
+        StructuredOutputError: If the response could not be repaired into tasks
+        AIServiceError: If the AI request fails
+    """
+    roadmap = db.query(ImplementationRoadmap).filter(
+        ImplementationRoadmap.id == job.params["roadmap_id"]
+    ).first()
+    if not roadmap:
+        raise ValueError("Roadmap not found")
+    project = db.query(Project).filter(Project.id == roadmap.project_id).first()
 
-        tasks_json = ai_service._call_openai(
-            "You are an expert software developer and project planner creating detailed implementation tasks.",
-            prompt
-        )
+    progress(0.1, "Gathering roadmap context...")
 
-        # Parse JSON response
-        try:
-            # Remove markdown code blocks if present
-            tasks_json = tasks_json.strip()
-            if tasks_json.startswith("```"):
-                tasks_json = tasks_json.split("```")[1]
-                if tasks_json.startswith("json"):
-                    tasks_json = tasks_json[4:]
+    # Gather context
+    roadmap_context = json.dumps(roadmap.phases_json, indent=2)
+    test_priorities = gather_test_priorities(project, db)
 
-            tasks_data = json.loads(tasks_json)
+    # Call AI service
+    ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
-            # Create tasks
-            for idx, task_item in enumerate(tasks_data.get("tasks", [])):
-                task = ImplementationTask(
-                    roadmap_id=roadmap.id,
-                    task_title=task_item['title'],
-                    task_description=task_item['description'],
-                    priority=task_item['priority'],
-                    story_points=task_item.get('story_points'),
-                    estimated_hours=task_item.get('estimated_hours'),
-                    skills_required=task_item.get('skills_required', ''),
-                    acceptance_criteria=json.dumps(task_item.get('acceptance_criteria', [])),
-                    dependencies_json=task_item.get('dependencies', []),
-                    moscow_category=task_item.get('moscow_category', 'should'),
-                    order_index=idx
-                )
-                db.add(task)
+    from prompts.implement.task_generation import TASKS_SYSTEM_PROMPT, GENERATE_TASKS_PROMPT
 
-            db.commit()
-            st.success(f"✅ Generated {len(tasks_data.get('tasks', []))} tasks!")
+    prompt = GENERATE_TASKS_PROMPT.format(
+        project_name=project.name,
+        project_goal=project.goal,
+        roadmap_context=roadmap_context,
+        test_priorities=test_priorities
+    )
 
-        except json.JSONDecodeError as e:
-            st.error(f"Failed to parse AI response: {e}")
-            with st.expander("🔍 View Raw Response"):
-                st.code(tasks_json)
+    progress(0.2, "Generating detailed tasks...")
+    tasks_data = ai_service.generate_structured(
+        TASKS_SYSTEM_PROMPT, prompt, TaskBreakdown, content_type="tasks",
+        use_cache=job.params.get("use_cache", True)
+    ).model_dump()
+
+    progress(0.9, "Saving tasks...")
+
+    # Create tasks in one multi-row INSERT
+    bulk_insert(db, ImplementationTask, [
+        {
+            "roadmap_id": roadmap.id,
+            "task_title": task_item['title'],
+            "task_description": task_item['description'],
+            "priority": task_item['priority'],
+            "story_points": task_item.get('story_points'),
+            "estimated_hours": task_item.get('estimated_hours'),
+            "skills_required": task_item.get('skills_required', ''),
+            "acceptance_criteria": json.dumps(task_item.get('acceptance_criteria', [])),
+            "dependencies_json": task_item.get('dependencies', []),
+            "moscow_category": task_item.get('moscow_category', 'should'),
+            "order_index": idx
+        }
+        for idx, task_item in enumerate(tasks_data.get("tasks", []))
+    ])
+    return {"roadmap_id": roadmap.id, "task_count": len(tasks_data.get("tasks", []))}
 
 def display_task_list(tasks, roadmap, db):
     """Display tasks with expanders"""
@@ -947,15 +996,11 @@ def gather_project_context(project, db):
 
     context = f"Project: {project.name}\nGoal: {project.goal}\n\n"
 
-    # Get latest stage summaries
-    from database.models import StageSummary
-
+    # Get latest stage summaries (one query for all stages)
     stages = ["empathise", "define", "ideate", "prototype", "test"]
+    summaries = get_latest_stage_summaries(db, project.id, stages)
     for stage in stages:
-        summary = db.query(StageSummary).filter(
-            StageSummary.project_id == project.id,
-            StageSummary.stage == stage
-        ).order_by(StageSummary.version.desc()).first()
+        summary = summaries.get(stage)
 
         if summary:
             context += f"\n### {stage.title()} Stage Summary:\n{summary.summary_text}\n"
@@ -965,25 +1010,22 @@ def gather_project_context(project, db):
 def gather_test_priorities(project, db):
     """Gather priorities from test feedback"""
 
-    tests = db.query(UserTest).filter(
+    has_tests = db.query(UserTest.id).filter(
         UserTest.project_id == project.id
-    ).all()
+    ).first() is not None
 
-    if not tests:
+    if not has_tests:
         return "No test feedback available."
 
     priorities = "Test Feedback Priorities:\n\n"
 
-    for test in tests:
-        insights = db.query(TestInsight).filter(
-            TestInsight.user_test_id == test.id,
-            TestInsight.priority.in_(["critical", "high"])
-        ).all()
-
-        if insights:
-            priorities += f"## {test.test_name}\n"
-            for insight in insights:
-                priorities += f"- [{insight.priority.upper()}] {insight.insight_text[:200]}...\n"
+    # All critical/high insights in one query, grouped by test
+    current_test_id = None
+    for insight in list_insights_by_priority(db, project.id, ["critical", "high"]):
+        if insight.user_test_id != current_test_id:
+            current_test_id = insight.user_test_id
+            priorities += f"## {insight.user_test.test_name}\n"
+        priorities += f"- [{insight.priority.upper()}] {insight.insight_text[:200]}...\n"
 
     return priorities
 
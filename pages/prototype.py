@@ -29,6 +29,9 @@ def render_prototype_page(project):
         db.commit()
         prototype_pages = [default_page]
 
+    # Offer to generate code for several pages at once when they're all waiting for Step 3
+    batch_pending = render_batch_code_generation(prototype_pages, project, db)
+
     # Level 1: Page Tabs
     page_names = [page.page_name for page in prototype_pages] + ["➕ Add Page"]
 
@@ -44,7 +47,7 @@ def render_prototype_page(project):
     # Render each tab
     for idx, tab in enumerate(tabs[:-1]):  # Exclude the "Add Page" tab
         with tab:
-            render_page_content(prototype_pages[idx], project, db)
+            render_page_content(prototype_pages[idx], project, db, auto_generate_code=not batch_pending)
 
     # Handle "Add Page" tab
     with tabs[-1]:
@@ -52,8 +55,41 @@ def render_prototype_page(project):
 
     db.close()
 
-def render_page_content(prototype_page, project, db):
-    """Render the content for a specific prototype page"""
+def render_batch_code_generation(prototype_pages, project, db):
+    """
+    Offer a button that generates code concurrently for all pages waiting on Step 3.
+    While several pages are waiting, Step 3 does not generate on render, so
+    nothing is sent until the user asks for it.
+
+    Returns:
+        bool: True if several pages are waiting for code
+    """
+    pending_pages = [
+        page for page in prototype_pages
+        if page.mockup_finalized and not page.code_generated
+    ]
+    if len(pending_pages) < 2:
+        return False
+
+    if st.button(f"💻 Generate code for {len(pending_pages)} pages", type="primary", key="batch_generate_code"):
+        from pages.prototype_steps.step3_code import generate_code_for_pages
+
+        frameworks = {
+            page.id: st.session_state.get(f"code_framework_{page.id}", "Plain HTML/CSS")
+            for page in pending_pages
+        }
+        generated = generate_code_for_pages(pending_pages, project, frameworks, db)
+        if generated:
+            st.rerun()
+    return True
+
+def render_page_content(prototype_page, project, db, auto_generate_code=True):
+    """
+    Render the content for a specific prototype page
+
+    auto_generate_code=False makes Step 3 wait for a button instead of
+    generating code on render.
+    """
 
     # Get ideate summary
     ideate_summary = db.query(StageSummary).filter(
@@ -77,7 +113,7 @@ def render_page_content(prototype_page, project, db):
     # Step 3: HTML/CSS Generation (Visible only if mockup finalized)
     if prototype_page.mockup_finalized:
         st.markdown("---")
-        render_step_3_code(prototype_page, project, db)
+        render_step_3_code(prototype_page, project, db, auto_generate_code)
 
 def render_progress_indicator(prototype_page):
     """Render the progress indicator showing which steps are complete"""
@@ -126,10 +162,10 @@ def render_step_2_mockup(prototype_page, project, ideate_summary, db):
     from pages.prototype_steps.step2_mockup import render_mockup_step
     render_mockup_step(prototype_page, project, ideate_summary, db)
 
-def render_step_3_code(prototype_page, project, db):
+def render_step_3_code(prototype_page, project, db, auto_generate_code=True):
     """Render Step 3: HTML/CSS Generation"""
     from pages.prototype_steps.step3_code import render_code_step
-    render_code_step(prototype_page, project, db)
+    render_code_step(prototype_page, project, db, auto_generate_code)
 
 def render_add_page_tab(project, db):
     """Render the 'Add Page' tab content"""
@@ -2,31 +2,21 @@
 
 import streamlit as st
 from database.models import SketchIteration
+from database.crud.prototypes import list_sketch_iterations, create_iteration
 from services.ai_service import AIService
+from services.ai_errors import AIServiceError
 from utils.time_utils import format_local_time
 from prompts.prototype.sketch_analysis import ANALYZE_SKETCH_PROMPT, SUGGEST_IMPROVEMENTS_PROMPT
-import os
-from pathlib import Path
-from datetime import datetime, timezone
-import base64
-from io import BytesIO
+from services.image_variants import VARIANT_DISPLAY, VARIANT_THUMB, load_variant, schedule_variants
 
-# Create uploads directory if it doesn't exist
-UPLOAD_DIR = Path("uploads/sketches")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-def get_image_for_display(sketch):
+def get_image_for_display(sketch, variant=VARIANT_DISPLAY):
     """
-    Get image for display from Base64 data stored in database
+    Get image for display from the blob store (or legacy Base64 data)
+    variant: VARIANT_DISPLAY (current/final view) or VARIANT_THUMB (history);
+    the original is returned until the variant has been created
     Returns: image bytes suitable for st.image()
     """
-    if sketch.image_data:
-        try:
-            return base64.b64decode(sketch.image_data)
-        except Exception as e:
-            print(f"Error decoding Base64 image: {e}")
-            return None
-    return None
+    return load_variant(sketch, variant)
 
 def render_sketch_step(prototype_page, project, ideate_summary, db):
     """Render the sketch upload and analysis step"""
@@ -41,10 +31,8 @@ def render_sketch_step(prototype_page, project, ideate_summary, db):
 def render_sketch_upload(prototype_page, project, ideate_summary, db):
     """Render the sketch upload and iteration interface"""
 
-    # Get existing sketch iterations
-    sketches = db.query(SketchIteration).filter(
-        SketchIteration.prototype_page_id == prototype_page.id
-    ).order_by(SketchIteration.iteration_number).all()
+    # Get existing sketch iterations (metadata only, images are loaded per iteration)
+    sketches = list_sketch_iterations(db, prototype_page.id)
 
     # Layout: Upload | Iterations | Analysis
     col1, col2, col3 = st.columns([1, 1, 1])
@@ -66,15 +54,17 @@ def render_sketch_upload(prototype_page, project, ideate_summary, db):
 
         if st.button("🔍 Analyze Sketch", type="primary", use_container_width=True, disabled=not uploaded_file):
             if uploaded_file:
-                analyze_and_save_sketch(prototype_page, project, ideate_summary, uploaded_file, user_instructions, db)
-                st.rerun()
+                if analyze_and_save_sketch(prototype_page, project, ideate_summary, uploaded_file, user_instructions, db):
+                    st.rerun()
 
     with col2:
         st.markdown("### Iterations")
         if sketches:
             for sketch in sketches:
-                with st.expander(f"v{sketch.iteration_number} - {format_local_time(sketch.created_at)}", expanded=(sketch == sketches[-1])):
-                    image_data = get_image_for_display(sketch)
+                is_latest = sketch == sketches[-1]
+                with st.expander(f"v{sketch.iteration_number} - {format_local_time(sketch.created_at)}", expanded=is_latest):
+                    # Older versions are shown as thumbnails
+                    image_data = get_image_for_display(sketch, VARIANT_DISPLAY if is_latest else VARIANT_THUMB)
                     if image_data:
                         st.image(image_data, use_container_width=True)
                     else:
@@ -96,7 +86,7 @@ def render_sketch_upload(prototype_page, project, ideate_summary, db):
                     st.markdown("**💡 Suggestions:**")
                     st.markdown(latest_sketch.ai_suggestions)
             else:
-                st.info("Analyzing...")
+                st.info("No AI analysis for this sketch yet. Analyze it again to retry.")
         else:
             st.info("Upload a sketch to see AI analysis")
 
@@ -151,37 +141,28 @@ def render_finalized_sketch(prototype_page, db):
             st.rerun()
 
 def analyze_and_save_sketch(prototype_page, project, ideate_summary, uploaded_file, user_instructions, db):
-    """Analyze uploaded sketch with AI vision and save to database"""
+    """
+    Analyze uploaded sketch with AI vision and save to database
 
-    # Save uploaded file
-    iteration_number = db.query(SketchIteration).filter(
-        SketchIteration.prototype_page_id == prototype_page.id
-    ).count() + 1
+    The sketch is saved even if the AI calls fail; a failed analysis leaves
+    ai_analysis empty, a failed suggestions call keeps the analysis.
 
-    # Get file bytes and convert to Base64 for database storage
-    file_bytes = uploaded_file.getbuffer()
-    image_base64 = base64.b64encode(file_bytes).decode('utf-8')
+    Returns:
+        bool: True if the sketch was analyzed, False if the analysis failed
+    """
 
-    # Create iteration record with Base64 data
-    sketch = SketchIteration(
-        prototype_page_id=prototype_page.id,
-        iteration_number=iteration_number,
-        image_data=image_base64,
+    # Store the file bytes in the blob store and create the iteration record referencing them
+    file_bytes = uploaded_file.getbuffer()
+    sketch = create_iteration(
+        db, SketchIteration, prototype_page.id, file_bytes,
         image_filename=uploaded_file.name,
         user_instructions=user_instructions
     )
-    db.add(sketch)
-    db.commit()
-
-    # Save temp file for AI vision analysis (will be deleted after analysis)
-    filename = f"page_{prototype_page.id}_v{iteration_number}_{uploaded_file.name}"
-    temp_file_path = UPLOAD_DIR / filename
-    with open(temp_file_path, "wb") as f:
-        f.write(file_bytes)
+    schedule_variants(sketch.image_sha256)
 
     # Analyze with AI vision
     with st.spinner("🤖 Analyzing sketch with AI..."):
-        ai_service = AIService(model=project.preferred_model)
+        ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
         # Prepare prompts
         ideate_text = ideate_summary.summary_text if ideate_summary else "No ideate summary available"
@@ -194,11 +175,19 @@ def analyze_and_save_sketch(prototype_page, project, ideate_summary, uploaded_fi
             user_instructions=user_instructions or "No specific instructions"
         )
 
-        # Call vision API
-        analysis = ai_service.analyze_image_with_vision(
-            image_path=str(temp_file_path),
-            prompt=analysis_prompt
-        )
+        try:
+            # Call vision API with the uploaded bytes (no temp file)
+            analysis = ai_service.analyze_image_with_vision(
+                image=file_bytes,
+                prompt=analysis_prompt
+            )
+        except AIServiceError as e:
+            st.error(f"Error analyzing sketch: {str(e)}")
+            return False
+
+        # Save the analysis before asking for suggestions so it survives their failure
+        sketch.ai_analysis = analysis
+        db.commit()
 
         # Generate suggestions
         suggestions_prompt = SUGGEST_IMPROVEMENTS_PROMPT.format(
@@ -207,9 +196,13 @@ def analyze_and_save_sketch(prototype_page, project, ideate_summary, uploaded_fi
             ideate_summary=ideate_text
         )
 
-        suggestions = ai_service._call_openai("You are a UX expert providing constructive feedback.", suggestions_prompt)
+        try:
+            suggestions = ai_service._call_openai("You are a UX expert providing constructive feedback.", suggestions_prompt)
+        except AIServiceError as e:
+            # A toast survives the rerun that shows the saved analysis
+            st.toast(f"Sketch analyzed, but suggestions could not be generated: {str(e)}", icon="⚠️")
+            return True
 
-        # Update sketch with analysis
-        sketch.ai_analysis = analysis
         sketch.ai_suggestions = suggestions
         db.commit()
+        return True
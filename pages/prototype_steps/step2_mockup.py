@@ -1,32 +1,28 @@
 """Step 2: AI-Assisted Mockup Generation with DALL-E"""
 
 import streamlit as st
-from database.models import MockupIteration, SketchIteration
+from database.models import MockupIteration, SketchIteration, PrototypePage, Project
+from database.crud.prototypes import list_mockup_iterations, get_iteration_image, create_iteration
 from services.ai_service import AIService
+from services.job_runner import submit_job
+from components.job_status import display_job_status, watch_job
+from services.prompt_builder import PromptBuilder, DALLE_PROMPT_MAX_CHARS
 from utils.time_utils import format_local_time
 from prompts.prototype.mockup_generation import GENERATE_MOCKUP_PROMPT, REFINE_MOCKUP_PROMPT
-from pathlib import Path
+from services.blob_store import load_image
+from services.image_variants import VARIANT_DISPLAY, VARIANT_THUMB, load_variant, schedule_variants
 from datetime import datetime, timezone
-import base64
 import os
 
-# Create uploads directory for mockups
-MOCKUP_DIR = Path("uploads/mockups")
-MOCKUP_DIR.mkdir(parents=True, exist_ok=True)
-
-def get_image_for_display(item):
+def get_image_for_display(item, variant=VARIANT_DISPLAY):
     """
-    Get image for display from Base64 data stored in database
+    Get image for display from the blob store (or legacy Base64 data)
+    variant: VARIANT_DISPLAY (current/final view) or VARIANT_THUMB (history);
+    the original is returned until the variant has been created
     Returns: image bytes suitable for st.image()
     Works for both SketchIteration and MockupIteration
     """
-    if hasattr(item, 'image_data') and item.image_data:
-        try:
-            return base64.b64decode(item.image_data)
-        except Exception as e:
-            print(f"Error decoding Base64 image: {e}")
-            return None
-    return None
+    return load_variant(item, variant)
 
 def render_mockup_step(prototype_page, project, ideate_summary, db):
     """Render the AI mockup generation step"""
@@ -41,15 +37,14 @@ def render_mockup_step(prototype_page, project, ideate_summary, db):
 def render_mockup_generation(prototype_page, project, ideate_summary, db):
     """Render the mockup generation and iteration interface"""
 
-    # Get final sketch
-    final_sketch = db.query(SketchIteration).filter(
-        SketchIteration.id == prototype_page.final_sketch_id
-    ).first()
+    # Get existing mockup iterations (metadata only, images are loaded per iteration)
+    mockups = list_mockup_iterations(db, prototype_page.id)
 
-    # Get existing mockup iterations
-    mockups = db.query(MockupIteration).filter(
-        MockupIteration.prototype_page_id == prototype_page.id
-    ).order_by(MockupIteration.iteration_number).all()
+    # Progress of queued/running mockup generations for this page
+    display_job_status(
+        project.id, ["mockup", "mockup_refine"], f"mockup_{prototype_page.id}",
+        params={"prototype_page_id": prototype_page.id}
+    )
 
     # Layout: Generate | Mockup Versions | Refinement
     col1, col2, col3 = st.columns([1, 1, 1])
@@ -58,13 +53,14 @@ def render_mockup_generation(prototype_page, project, ideate_summary, db):
         st.markdown("### Generate Mockup")
 
         # Show final sketch
-        if final_sketch:
+        if prototype_page.final_sketch_id:
             with st.expander("📱 Based on your sketch"):
-                image_data = get_image_for_display(final_sketch)
-                if image_data:
-                    st.image(image_data, use_container_width=True)
-                else:
-                    st.error("Sketch image not available")
+                if st.toggle("Show sketch", key=f"show_final_sketch_{prototype_page.id}"):
+                    image_data = get_iteration_image(db, SketchIteration, prototype_page.final_sketch_id, VARIANT_DISPLAY)
+                    if image_data:
+                        st.image(image_data, use_container_width=True)
+                    else:
+                        st.error("Sketch image not available")
 
         # Style options
         style = st.selectbox(
@@ -87,15 +83,16 @@ def render_mockup_generation(prototype_page, project, ideate_summary, db):
         )
 
         if st.button("✨ Generate Mockup", type="primary", use_container_width=True):
-            generate_mockup(prototype_page, project, ideate_summary, final_sketch, style, color_scheme, additional_instructions, db)
-            st.rerun()
+            generate_mockup(prototype_page, project, style, color_scheme, additional_instructions)
 
     with col2:
         st.markdown("### Mockup Versions")
         if mockups:
             for mockup in mockups:
-                with st.expander(f"v{mockup.iteration_number} - {format_local_time(mockup.created_at)}", expanded=(mockup == mockups[-1])):
-                    image_data = get_image_for_display(mockup)
+                is_latest = mockup == mockups[-1]
+                with st.expander(f"v{mockup.iteration_number} - {format_local_time(mockup.created_at)}", expanded=is_latest):
+                    # Older versions are shown as thumbnails
+                    image_data = get_image_for_display(mockup, VARIANT_DISPLAY if is_latest else VARIANT_THUMB)
                     if image_data:
                         st.image(image_data, use_container_width=True)
                     else:
@@ -128,8 +125,7 @@ def render_mockup_generation(prototype_page, project, ideate_summary, db):
 
             if st.button("🔄 Regenerate with Changes", use_container_width=True):
                 if refinement_text.strip():
-                    refine_mockup(prototype_page, project, ideate_summary, final_sketch, latest_mockup, refinement_text, db)
-                    st.rerun()
+                    refine_mockup(prototype_page, project, latest_mockup, refinement_text)
                 else:
                     st.warning("Please describe the changes you want")
         else:
@@ -167,148 +163,175 @@ def render_finalized_mockup(prototype_page, db):
             db.commit()
             st.rerun()
 
-def generate_mockup(prototype_page, project, ideate_summary, final_sketch, style, color_scheme, additional_instructions, db):
-    """Generate initial mockup using DALL-E/GPT-4o"""
-
-    with st.spinner("🎨 Generating mockup with AI... This may take a moment."):
-        ai_service = AIService(model=project.preferred_model)
-
-        # Get sketch analysis for context
-        sketch_description = final_sketch.ai_analysis if final_sketch else "User sketch"
-
-        # Prepare generation prompt
-        ideate_text = ideate_summary.summary_text if ideate_summary else ""
-
-        # Extract key features from ideate summary (simplified)
-        key_features = "Based on user research insights"
-
-        prompt = GENERATE_MOCKUP_PROMPT.format(
-            style=style.lower(),
-            page_name=prototype_page.page_name,
-            project_name=project.name,
-            project_goal=project.goal,
-            sketch_description=sketch_description[:500],  # Limit length
-            key_features=key_features,
-            color_scheme=color_scheme or "modern and clean",
-            must_include_elements="navigation, main content area, interactive elements",
-            user_refinement=additional_instructions or "No additional requirements"
-        )
+def generate_mockup(prototype_page, project, style, color_scheme, additional_instructions):
+    """Queue initial mockup generation as a background job"""
+    job_id = submit_job(project.id, "mockup", {
+        "prototype_page_id": prototype_page.id,
+        "style": style,
+        "color_scheme": color_scheme,
+        "additional_instructions": additional_instructions
+    })
+    watch_job(f"mockup_{prototype_page.id}", job_id)
+
+def run_mockup_job(job, db, progress):
+    """
+    Generate initial mockup using DALL-E/GPT-4o (runs on the background job runner)
 
-        # Generate image using GPT-4o (returns tuple: image_path, error_message)
-        temp_image_path, error_message = ai_service.generate_image_with_gpt4o(
-            prompt=prompt,
-            reference_image_path=None  # No reference for initial generation
-        )
+    Args:
+        job: GenerationJob with prototype_page_id, style, color_scheme and
+            additional_instructions params
+        db: Database session
+        progress: Progress callback (fraction, message)
 
-        if temp_image_path:
-            # Read temp image and convert to Base64
-            try:
-                timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-                local_filename = f"mockup_{prototype_page.id}_{timestamp}.png"
-
-                # Read the temp image and convert to Base64
-                with open(temp_image_path, 'rb') as img_file:
-                    image_bytes = img_file.read()
-                    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-
-            except Exception as e:
-                st.error(f"Error saving image: {str(e)}")
-                return
-
-            # Save mockup iteration
-            iteration_number = db.query(MockupIteration).filter(
-                MockupIteration.prototype_page_id == prototype_page.id
-            ).count() + 1
-
-            mockup = MockupIteration(
-                prototype_page_id=prototype_page.id,
-                iteration_number=iteration_number,
-                image_data=image_base64,  # Save Base64 for persistence
-                image_filename=local_filename,
-                generation_prompt=prompt,
-                style_params={
-                    "style": style,
-                    "color_scheme": color_scheme,
-                    "additional_instructions": additional_instructions
-                },
-                user_refinement=additional_instructions
-            )
-            db.add(mockup)
-            db.commit()
+    Returns:
+        dict: {"mockup_id": ...}
 
-            st.success("✅ Mockup generated successfully!")
-        else:
-            # Show detailed error message
-            if error_message:
-                st.error(f"❌ Failed to generate mockup:\n\n{error_message}")
-            else:
-                st.error("Failed to generate mockup. Please try again.")
-
-def refine_mockup(prototype_page, project, ideate_summary, final_sketch, previous_mockup, refinement_text, db):
-    """Refine existing mockup based on user feedback"""
-
-    with st.spinner("🔄 Generating refined mockup..."):
-        ai_service = AIService(model=project.preferred_model)
-
-        # Get previous style params
-        prev_style = previous_mockup.style_params or {}
-
-        # Get previous mockup image path (stored locally)
-        previous_image_path = None
-        if previous_mockup.image_path:
-            previous_image_path = Path(previous_mockup.image_path)
-            if not previous_image_path.exists():
-                st.warning(f"Previous mockup file not found: {previous_mockup.image_path}")
-
-        prompt = REFINE_MOCKUP_PROMPT.format(
-            previous_mockup_description=f"Previous mockup (v{previous_mockup.iteration_number}) - see image above",
-            user_refinement=refinement_text,
-            color_scheme=prev_style.get('color_scheme', 'modern'),
-            style=prev_style.get('style', 'modern'),
-            specific_improvements=refinement_text
-        )
+    Raises:
+        ValueError: If the page is missing or image generation fails
+    """
+    params = job.params
+    prototype_page = db.query(PrototypePage).filter(PrototypePage.id == params["prototype_page_id"]).first()
+    if not prototype_page:
+        raise ValueError("Prototype page not found")
+    project = db.query(Project).filter(Project.id == prototype_page.project_id).first()
+    final_sketch = db.query(SketchIteration).filter(
+        SketchIteration.id == prototype_page.final_sketch_id
+    ).first()
+    style = params["style"]
+    color_scheme = params.get("color_scheme")
+    additional_instructions = params.get("additional_instructions")
+
+    ai_service = AIService(model=project.preferred_model, project_id=project.id)
+
+    # Get sketch analysis for context
+    sketch_description = final_sketch.ai_analysis if final_sketch else "User sketch"
+
+    # Extract key features from ideate summary (simplified)
+    key_features = "Based on user research insights"
+
+    prompt_fields = {
+        "style": style.lower(),
+        "page_name": prototype_page.page_name,
+        "project_name": project.name,
+        "project_goal": project.goal,
+        "key_features": key_features,
+        "color_scheme": color_scheme or "modern and clean",
+        "must_include_elements": "navigation, main content area, interactive elements",
+    }
+
+    # The user's instructions take priority; the sketch description gets
+    # the rest of DALL-E's character limit
+    builder = PromptBuilder(
+        budget=DALLE_PROMPT_MAX_CHARS,
+        reserved=len(GENERATE_MOCKUP_PROMPT.format(sketch_description="", user_refinement="", **prompt_fields)),
+        unit="chars"
+    )
+    builder.add("user_refinement", additional_instructions or "No additional requirements", priority=1)
+    builder.add("sketch_description", sketch_description, priority=0)
+    sections = builder.fit()
+    builder.log_report("mockup.generate")
+
+    prompt = GENERATE_MOCKUP_PROMPT.format(**sections, **prompt_fields)
+
+    # Generate image using GPT-4o (returns tuple: image_bytes, error_message)
+    progress(0.1, "Generating mockup with AI... This may take a moment.")
+    image_bytes, error_message = ai_service.generate_image_with_gpt4o(
+        prompt=prompt,
+        reference_image=None  # No reference for initial generation
+    )
+    if not image_bytes:
+        raise ValueError(error_message or "Failed to generate mockup. Please try again.")
+
+    mockup = save_mockup_iteration(
+        db, prototype_page, image_bytes, prompt,
+        style_params={
+            "style": style,
+            "color_scheme": color_scheme,
+            "additional_instructions": additional_instructions
+        },
+        user_refinement=additional_instructions
+    )
+    return {"mockup_id": mockup.id}
+
+def refine_mockup(prototype_page, project, previous_mockup, refinement_text):
+    """Queue refinement of an existing mockup as a background job"""
+    job_id = submit_job(project.id, "mockup_refine", {
+        "prototype_page_id": prototype_page.id,
+        "previous_mockup_id": previous_mockup.id,
+        "refinement_text": refinement_text
+    })
+    watch_job(f"mockup_{prototype_page.id}", job_id)
+
+def run_refine_mockup_job(job, db, progress):
+    """
+    Refine existing mockup based on user feedback (runs on the background job runner)
 
-        # Generate refined image with GPT-4o, passing the previous mockup (returns tuple: image_path, error_message)
-        temp_image_path, error_message = ai_service.generate_image_with_gpt4o(
-            prompt=prompt,
-            reference_image_path=str(previous_image_path) if previous_image_path else None
-        )
+    Args:
+        job: GenerationJob with previous_mockup_id and refinement_text params
+        db: Database session
+        progress: Progress callback (fraction, message)
 
-        if temp_image_path:
-            # Read temp image and convert to Base64
-            try:
-                timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-                local_filename = f"mockup_{prototype_page.id}_{timestamp}.png"
-
-                # Read the temp image and convert to Base64
-                with open(temp_image_path, 'rb') as img_file:
-                    image_bytes = img_file.read()
-                    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-
-            except Exception as e:
-                st.error(f"Error saving refined image: {str(e)}")
-                return
-
-            iteration_number = db.query(MockupIteration).filter(
-                MockupIteration.prototype_page_id == prototype_page.id
-            ).count() + 1
-
-            mockup = MockupIteration(
-                prototype_page_id=prototype_page.id,
-                iteration_number=iteration_number,
-                image_data=image_base64,  # Save Base64 for persistence
-                image_filename=local_filename,
-                generation_prompt=prompt,
-                style_params=prev_style,
-                user_refinement=refinement_text
-            )
-            db.add(mockup)
-            db.commit()
+    Returns:
+        dict: {"mockup_id": ...}
 
-            st.success("✅ Refined mockup generated!")
-        else:
-            # Show detailed error message
-            if error_message:
-                st.error(f"❌ Failed to generate refined mockup:\n\n{error_message}")
-            else:
-                st.error("Failed to generate refined mockup. Please try again.")
+    Raises:
+        ValueError: If the previous mockup is missing or image generation fails
+    """
+    refinement_text = job.params["refinement_text"]
+    previous_mockup = db.query(MockupIteration).filter(
+        MockupIteration.id == job.params["previous_mockup_id"]
+    ).first()
+    if not previous_mockup:
+        raise ValueError("Previous mockup not found")
+    prototype_page = previous_mockup.prototype_page
+    project = db.query(Project).filter(Project.id == prototype_page.project_id).first()
+
+    ai_service = AIService(model=project.preferred_model, project_id=project.id)
+
+    # Get previous style params
+    prev_style = previous_mockup.style_params or {}
+
+    # The stored image is sent to the vision model as raw bytes
+    previous_image = load_image(previous_mockup)
+    if not previous_image:
+        print(f"Warning: previous mockup (v{previous_mockup.iteration_number}) has no image data")
+
+    prompt = REFINE_MOCKUP_PROMPT.format(
+        previous_mockup_description=f"Previous mockup (v{previous_mockup.iteration_number}) - see image above",
+        user_refinement=refinement_text,
+        color_scheme=prev_style.get('color_scheme', 'modern'),
+        style=prev_style.get('style', 'modern'),
+        specific_improvements=refinement_text
+    )
+
+    # Generate refined image with GPT-4o, passing the previous mockup (returns tuple: image_bytes, error_message)
+    progress(0.1, "Generating refined mockup...")
+    image_bytes, error_message = ai_service.generate_image_with_gpt4o(
+        prompt=prompt,
+        reference_image=previous_image or None
+    )
+    if not image_bytes:
+        raise ValueError(error_message or "Failed to generate refined mockup. Please try again.")
+
+    mockup = save_mockup_iteration(
+        db, prototype_page, image_bytes, prompt,
+        style_params=prev_style,
+        user_refinement=refinement_text
+    )
+    return {"mockup_id": mockup.id}
+
+def save_mockup_iteration(db, prototype_page, image_bytes, prompt, style_params, user_refinement):
+    """Store a generated mockup as the page's next iteration"""
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    local_filename = f"mockup_{prototype_page.id}_{timestamp}.png"
+
+    # Bytes go to the blob store, the row keeps the hash
+    mockup = create_iteration(
+        db, MockupIteration, prototype_page.id, image_bytes,
+        image_filename=local_filename,
+        generation_prompt=prompt,
+        style_params=style_params,
+        user_refinement=user_refinement
+    )
+    schedule_variants(mockup.image_sha256)
+    return mockup
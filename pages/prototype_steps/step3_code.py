@@ -3,10 +3,19 @@
 import streamlit as st
 from database.models import MockupIteration
 from services.ai_service import AIService
+from services.ai_errors import AIServiceError
+from pages.prototype_steps.step2_mockup import get_image_for_display
 from prompts.prototype.code_generation import GENERATE_HTML_CSS_PROMPT, GENERATE_TAILWIND_HTML_PROMPT
 
-def render_code_step(prototype_page, project, db):
-    """Render the HTML/CSS code generation step"""
+CODE_SYSTEM_PROMPT = "You are an expert frontend developer generating production-ready HTML/CSS code."
+
+def render_code_step(prototype_page, project, db, auto_generate=True):
+    """
+    Render the HTML/CSS code generation step
+
+    auto_generate=False shows a Generate Code button instead of generating
+    on render (used while several pages wait for a batch generation).
+    """
 
     st.markdown("## 💻 Step 3: HTML/CSS Wireframe")
 
@@ -32,10 +41,15 @@ def render_code_step(prototype_page, project, db):
             key=f"code_framework_{prototype_page.id}"
         )
 
-        # Generate code button
-        if not prototype_page.code_generated or st.button("🔄 Regenerate Code"):
-            generate_code(prototype_page, project, final_mockup, framework, db)
-            st.rerun()
+        # Generate code on first render (or on request), regenerate on request
+        regenerate = False
+        if prototype_page.code_generated:
+            regenerate = generate = st.button("🔄 Regenerate Code")
+        else:
+            generate = auto_generate or st.button("💻 Generate Code", key=f"generate_code_{prototype_page.id}")
+        if generate:
+            if generate_code(prototype_page, project, final_mockup, framework, db, use_cache=not regenerate):
+                st.rerun()
 
         # Display generated code
         if prototype_page.html_code:
@@ -70,7 +84,9 @@ def render_code_step(prototype_page, project, db):
 
         # Show final mockup reference
         with st.expander("🎨 Original Mockup"):
-            st.image(final_mockup.image_path, use_container_width=True)
+            image_data = get_image_for_display(final_mockup)
+            if image_data:
+                st.image(image_data, use_container_width=True)
 
         # Display live preview
         if prototype_page.html_code:
@@ -92,51 +108,121 @@ def render_code_step(prototype_page, project, db):
         with col_left:
             st.markdown("🎉 **Congratulations!** Your wireframe is ready for testing.")
 
-def generate_code(prototype_page, project, final_mockup, framework, db):
-    """Generate HTML/CSS code from mockup"""
+def generate_code(prototype_page, project, final_mockup, framework, db, use_cache=True):
+    """
+    Generate HTML/CSS code from mockup
+
+    Args:
+        use_cache: Set False to regenerate instead of replaying a cached response
+
+    Returns:
+        bool: True if successful, False if failed
+    """
 
     with st.spinner("💻 Generating code... This may take a moment."):
-        ai_service = AIService(model=project.preferred_model)
-
-        # Create mockup description (could use vision API to analyze the mockup image)
-        mockup_description = f"""
-        This is a mockup for the {prototype_page.page_name} page of {project.name}.
-        Style: {final_mockup.style_params.get('style', 'modern')} design
-        Color scheme: {final_mockup.style_params.get('color_scheme', 'clean and modern')}
-        """
-
-        # Choose appropriate prompt based on framework
-        if framework == "Tailwind CSS":
-            prompt = GENERATE_TAILWIND_HTML_PROMPT.format(
-                project_name=project.name,
-                page_name=prototype_page.page_name,
-                mockup_description=mockup_description
-            )
-        else:
-            prompt = GENERATE_HTML_CSS_PROMPT.format(
-                project_name=project.name,
-                page_name=prototype_page.page_name,
-                project_goal=project.goal,
-                mockup_description=mockup_description,
-                framework=framework
-            )
+        ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
-        # Generate code
-        code_output = ai_service._call_openai(
-            "You are an expert frontend developer generating production-ready HTML/CSS code.",
-            prompt
-        )
+        prompt = build_code_prompt(prototype_page, project, final_mockup, framework)
+
+        def save_code(code_output):
+            # Parse HTML and CSS from output and save once the stream completes
+            save_generated_code(prototype_page, code_output, framework, db)
 
-        # Parse HTML and CSS from output
-        html_code, css_code = parse_code_output(code_output, framework)
+        # Stream the code so it renders as it is generated
+        try:
+            code_output = st.write_stream(
+                ai_service.stream_text(CODE_SYSTEM_PROMPT, prompt, on_complete=save_code, use_cache=use_cache)
+            )
+        except Exception as e:
+            db.rollback()
+            st.error(f"Error generating code: {str(e)}")
+            return False
 
-        # Save to database
-        prototype_page.html_code = html_code
-        prototype_page.css_code = css_code
-        prototype_page.code_generated = True
-        db.commit()
+        if not code_output:
+            st.error("Failed to generate code. Please try again.")
+            return False
 
         st.success("✅ Code generated successfully!")
+        return True
+
+def build_code_prompt(prototype_page, project, final_mockup, framework):
+    """Build the code generation prompt for a page's finalized mockup"""
+
+    style_params = final_mockup.style_params or {}
+
+    # Create mockup description (could use vision API to analyze the mockup image)
+    mockup_description = f"""
+    This is a mockup for the {prototype_page.page_name} page of {project.name}.
+    Style: {style_params.get('style', 'modern')} design
+    Color scheme: {style_params.get('color_scheme', 'clean and modern')}
+    """
+
+    # Choose appropriate prompt based on framework
+    if framework == "Tailwind CSS":
+        return GENERATE_TAILWIND_HTML_PROMPT.format(
+            project_name=project.name,
+            page_name=prototype_page.page_name,
+            mockup_description=mockup_description
+        )
+
+    return GENERATE_HTML_CSS_PROMPT.format(
+        project_name=project.name,
+        page_name=prototype_page.page_name,
+        project_goal=project.goal,
+        mockup_description=mockup_description,
+        framework=framework
+    )
+
+def save_generated_code(prototype_page, code_output, framework, db):
+    """Parse AI output into HTML/CSS and save it on the page"""
+
+    html_code, css_code = parse_code_output(code_output, framework)
+    prototype_page.html_code = html_code
+    prototype_page.css_code = css_code
+    prototype_page.code_generated = True
+    db.commit()
+
+def generate_code_for_pages(prototype_pages, project, frameworks, db):
+    """
+    Generate code for several pages concurrently
+
+    Args:
+        prototype_pages: Pages with a finalized mockup
+        project: Project the pages belong to
+        frameworks: Dict of page ID -> target framework
+        db: Database session
+
+    Returns:
+        int: Number of pages whose code was generated
+    """
+    final_mockups = {
+        mockup.id: mockup
+        for mockup in db.query(MockupIteration).filter(
+            MockupIteration.id.in_([page.final_mockup_id for page in prototype_pages])
+        ).all()
+    }
+    ready_pages = [page for page in prototype_pages if page.final_mockup_id in final_mockups]
+    if not ready_pages:
+        return 0
+
+    ai_service = AIService(model=project.preferred_model, project_id=project.id)
+    prompts = [
+        (CODE_SYSTEM_PROMPT, build_code_prompt(page, project, final_mockups[page.final_mockup_id], frameworks[page.id]))
+        for page in ready_pages
+    ]
+
+    generated = 0
+    progress = st.progress(0.0, text=f"💻 Generating code for {len(ready_pages)} pages...")
+    for done, (idx, code_output) in enumerate(ai_service.iter_generate_many(prompts, return_exceptions=True), 1):
+        page = ready_pages[idx]
+        if code_output and not isinstance(code_output, AIServiceError):
+            save_generated_code(page, code_output, frameworks[page.id], db)
+            generated += 1
+        else:
+            st.error(f"Failed to generate code for '{page.page_name}': {code_output}")
+        progress.progress(done / len(ready_pages), text=f"✅ {page.page_name} ({done}/{len(ready_pages)})")
+
+    return generated
 
 def parse_code_output(code_output, framework):
     """Parse HTML and CSS from AI output"""
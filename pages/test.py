@@ -3,8 +3,12 @@
 import streamlit as st
 from database.models import UserTest, TestFeedback, TestInsight, PrototypePage, StageSummary
 from services.ai_service import AIService
+from services.ai_errors import AIServiceError
 from utils.time_utils import format_local_time
 from config.database import get_db
+from database.crud.user_tests import list_user_tests
+from database.crud.sequences import next_summary_version
+from database.crud.bulk import bulk_insert
 
 def render_test_page(project):
     """Main render function for Test stage"""
@@ -54,9 +58,8 @@ def render_test_page(project):
     st.markdown("---")
     st.markdown("### Test Results")
 
-    existing_tests = db.query(UserTest).filter(
-        UserTest.project_id == project.id
-    ).order_by(UserTest.created_at.desc()).all()
+    # Pages, feedback and insights of all tests are loaded in batched queries
+    existing_tests = list_user_tests(db, project.id)
 
     if existing_tests:
         for test in existing_tests:
@@ -193,24 +196,26 @@ def save_and_analyze_feedback(project, test_name, selected_page, feedback_data,
             participant_count=len([f for f in feedback_data if f['feedback'].strip()])
         )
         db.add(user_test)
-        db.commit()
-        db.refresh(user_test)
-
-        # Save individual feedback items
-        for feedback_item in feedback_data:
-            if feedback_item['feedback'].strip():
-                test_feedback = TestFeedback(
-                    user_test_id=user_test.id,
-                    participant_name=feedback_item['participant'],
-                    feedback_text=feedback_item['feedback'],
-                    rating=feedback_item['rating']
-                )
-                db.add(test_feedback)
-
-        db.commit()
+        db.flush()  # Assigns user_test.id
+
+        # Save individual feedback items in one multi-row INSERT, committed with the test
+        bulk_insert(db, TestFeedback, [
+            {
+                "user_test_id": user_test.id,
+                "participant_name": feedback_item['participant'],
+                "feedback_text": feedback_item['feedback'],
+                "rating": feedback_item['rating']
+            }
+            for feedback_item in feedback_data
+            if feedback_item['feedback'].strip()
+        ])
 
         # Run AI analysis
-        analyze_test_feedback(user_test, project, selected_page, db)
+        try:
+            analyze_test_feedback(user_test, project, selected_page, db)
+        except AIServiceError as e:
+            st.warning(f"Feedback saved, but AI analysis failed: {str(e)}")
+            return
 
         st.success("✅ Feedback saved and analyzed successfully!")
 
@@ -232,7 +237,7 @@ def analyze_test_feedback(user_test, project, page_name, db):
         feedback_data += f"{item.feedback_text}\n"
 
     # Call AI service
-    ai_service = AIService(model=project.preferred_model)
+    ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
     from prompts.test.feedback_analysis import ANALYZE_FEEDBACK_PROMPT
 
@@ -259,15 +264,15 @@ def analyze_test_feedback(user_test, project, page_name, db):
     db.commit()
 
     # Generate stage summary (silently in background)
-    generate_test_stage_summary(project, db)
+    try:
+        generate_test_stage_summary(project, db)
+    except AIServiceError as e:
+        print(f"Error generating test stage summary: {str(e)}")
 
 def render_view_results_tab(project, db):
     """Tab for viewing existing test results"""
 
-    tests = db.query(UserTest).filter(
-        UserTest.project_id == project.id,
-        UserTest.test_type == "feedback"
-    ).order_by(UserTest.created_at.desc()).all()
+    tests = list_user_tests(db, project.id, test_type="feedback")
 
     if not tests:
         st.info("No tests yet. Use the 'Setup Test' tab to create your first test.")
@@ -276,15 +281,11 @@ def render_view_results_tab(project, db):
     for test in tests:
         with st.expander(f"📊 {test.test_name} - {format_local_time(test.created_at)}", expanded=(test == tests[0])):
             st.markdown(f"**Participants:** {test.participant_count}")
-            if test.prototype_page_id:
-                page = db.query(PrototypePage).filter(PrototypePage.id == test.prototype_page_id).first()
-                if page:
-                    st.markdown(f"**Page:** {page.page_name}")
+            if test.prototype_page:
+                st.markdown(f"**Page:** {test.prototype_page.page_name}")
 
             # Show feedback
-            feedback_items = db.query(TestFeedback).filter(
-                TestFeedback.user_test_id == test.id
-            ).all()
+            feedback_items = test.feedback_items
 
             if feedback_items:
                 st.markdown("#### Feedback")
@@ -294,9 +295,7 @@ def render_view_results_tab(project, db):
                     st.markdown("")
 
             # Show AI analysis
-            insights = db.query(TestInsight).filter(
-                TestInsight.user_test_id == test.id
-            ).all()
+            insights = test.insights
 
             if insights:
                 st.markdown("---")
@@ -314,25 +313,19 @@ def render_test_result_card(test, db):
             st.markdown(f"**Type:** {test.test_type.replace('_', ' ').title()}")
             st.markdown(f"**Participants:** {test.participant_count}")
 
-            if test.prototype_page_id:
-                page = db.query(PrototypePage).filter(PrototypePage.id == test.prototype_page_id).first()
-                if page:
-                    st.markdown(f"**Page:** {page.page_name}")
+            if test.prototype_page:
+                st.markdown(f"**Page:** {test.prototype_page.page_name}")
 
         with col2:
             # Calculate average rating
-            feedback_items = db.query(TestFeedback).filter(
-                TestFeedback.user_test_id == test.id
-            ).all()
+            feedback_items = test.feedback_items
 
             if feedback_items:
                 avg_rating = sum(f.rating for f in feedback_items if f.rating) / len(feedback_items)
                 st.metric("Avg Rating", f"{avg_rating:.1f}/5")
 
         # Show AI insights
-        insights = db.query(TestInsight).filter(
-            TestInsight.user_test_id == test.id
-        ).all()
+        insights = test.insights
 
         if insights:
             st.markdown("---")
@@ -343,10 +336,8 @@ def render_test_result_card(test, db):
 def generate_test_stage_summary(project, db):
     """Generate overall summary for the test stage (background)"""
 
-    # Get all tests
-    tests = db.query(UserTest).filter(
-        UserTest.project_id == project.id
-    ).all()
+    # Get all tests with their insights
+    tests = list_user_tests(db, project.id, newest_first=False)
 
     if not tests:
         return
@@ -357,16 +348,11 @@ def generate_test_stage_summary(project, db):
         all_test_results += f"\n## {test.test_name} ({test.test_type})\n"
         all_test_results += f"Participants: {test.participant_count}\n\n"
 
-        # Get insights
-        insights = db.query(TestInsight).filter(
-            TestInsight.user_test_id == test.id
-        ).all()
-
-        for insight in insights:
+        for insight in test.insights:
             all_test_results += f"{insight.insight_text}\n\n"
 
     # Call AI to generate summary
-    ai_service = AIService(model=project.preferred_model)
+    ai_service = AIService(model=project.preferred_model, project_id=project.id)
 
     from prompts.test.feedback_analysis import GENERATE_TEST_SUMMARY_PROMPT
 
@@ -381,18 +367,12 @@ def generate_test_stage_summary(project, db):
         prompt
     )
 
-    # Get current version
-    current_version = db.query(StageSummary).filter(
-        StageSummary.project_id == project.id,
-        StageSummary.stage == "test"
-    ).count()
-
-    # Save summary
+    # Save summary under the next version number
     summary = StageSummary(
         project_id=project.id,
         stage="test",
         summary_text=summary_text,
-        version=current_version + 1
+        version=next_summary_version(db, project.id, "test")
     )
     db.add(summary)
     db.commit()
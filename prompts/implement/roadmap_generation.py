@@ -1,20 +1,10 @@
 """Prompts for generating implementation roadmap"""
 
-GENERATE_ROADMAP_PROMPT = """You are an expert software project manager creating an implementation roadmap.
+# Static instructions, sent byte-identical on every call so providers can
+# cache the prefix. Per-project values go in GENERATE_ROADMAP_PROMPT.
+ROADMAP_SYSTEM_PROMPT = """You are an expert software project manager creating an implementation roadmap.
 
-Project Context:
-- Project Name: {project_name}
-- Project Goal: {project_goal}
-- Team Size: {team_size} people
-- Sprint Duration: {sprint_duration} weeks
-- Target Launch: {target_launch_weeks} weeks from now
-- Development Approach: {development_approach}
-
-Previous Stage Insights:
-{project_context}
-
-Test Feedback Priorities:
-{test_priorities}
+The user message gives the project context, team configuration, previous stage insights and test feedback priorities.
 
 Generate a strategic implementation roadmap with 3 phases (MVP → Beta → Launch).
 
@@ -34,9 +24,9 @@ For each phase, provide:
 - Be realistic with timelines given team size
 
 Output in **valid JSON format only** (no markdown, no code blocks):
-{{
+{
   "phases": [
-    {{
+    {
       "name": "Phase 1: MVP",
       "duration_weeks": 4,
       "weeks": "1-4",
@@ -47,12 +37,28 @@ Output in **valid JSON format only** (no markdown, no code blocks):
       "dependencies": ["Feature X must complete before Feature Y"],
       "team_allocation": 5,
       "rationale": "Why this phase structure"
-    }}
+    }
   ],
   "overall_timeline": "12 weeks",
   "critical_path": ["Key milestone 1", "Key milestone 2"],
   "success_metrics": ["Metric 1", "Metric 2"]
-}}"""
+}"""
+
+GENERATE_ROADMAP_PROMPT = """Project Context:
+- Project Name: {project_name}
+- Project Goal: {project_goal}
+- Team Size: {team_size} people
+- Sprint Duration: {sprint_duration} weeks
+- Target Launch: {target_launch_weeks} weeks from now
+- Development Approach: {development_approach}
+
+Previous Stage Insights:
+{project_context}
+
+Test Feedback Priorities:
+{test_priorities}
+
+Generate the implementation roadmap for this project."""
 
 GENERATE_IMPLEMENTATION_SUMMARY = """You are a project director creating an executive summary of the implementation plan.
 
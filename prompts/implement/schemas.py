@@ -0,0 +1,50 @@
+"""Output schemas for roadmap and task generation (see AIService.generate_structured)"""
+
+from typing import List, Literal, Optional, Union
+
+from pydantic import BaseModel, Field
+
+
+class RoadmapPhase(BaseModel):
+    """One phase of the implementation roadmap"""
+
+    name: str = Field(description='Phase name, e.g. "Phase 1: MVP"')
+    duration_weeks: int
+    weeks: str = Field(default="", description='Week range, e.g. "1-4"')
+    must_have: List[str] = Field(default_factory=list)
+    should_have: List[str] = Field(default_factory=list)
+    could_have: List[str] = Field(default_factory=list)
+    wont_have: List[str] = Field(default_factory=list)
+    dependencies: List[str] = Field(default_factory=list)
+    team_allocation: Optional[int] = Field(default=None, description="People needed for this phase")
+    rationale: str = ""
+
+
+class Roadmap(BaseModel):
+    """Implementation roadmap"""
+
+    phases: List[RoadmapPhase]
+    overall_timeline: str = ""
+    critical_path: List[str] = Field(default_factory=list)
+    success_metrics: List[str] = Field(default_factory=list)
+
+
+class TaskItem(BaseModel):
+    """One development task"""
+
+    title: str = Field(description="Brief task name (max 100 chars)")
+    description: str
+    priority: Literal["highest", "high", "medium", "low"]
+    story_points: Optional[int] = Field(default=None, description="1, 2, 3, 5, 8 or 13")
+    estimated_hours: Optional[float] = None
+    skills_required: str = Field(default="", description="Comma-separated: frontend, backend, design, qa, devops")
+    acceptance_criteria: List[str] = Field(default_factory=list)
+    dependencies: List[Union[int, str]] = Field(default_factory=list)
+    moscow_category: Literal["must", "should", "could", "wont"] = "should"
+    rationale: str = ""
+
+
+class TaskBreakdown(BaseModel):
+    """Implementation tasks for a roadmap"""
+
+    tasks: List[TaskItem]
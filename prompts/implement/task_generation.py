@@ -1,15 +1,10 @@
 """Prompts for generating implementation tasks"""
 
-GENERATE_TASKS_PROMPT = """You are an expert software developer and project planner creating detailed implementation tasks.
+# Static instructions, sent byte-identical on every call so providers can
+# cache the prefix. Per-project values go in GENERATE_TASKS_PROMPT.
+TASKS_SYSTEM_PROMPT = """You are an expert software developer and project planner creating detailed implementation tasks.
 
-Project: {project_name}
-Goal: {project_goal}
-
-Roadmap Context:
-{roadmap_context}
-
-Test Feedback Priorities:
-{test_priorities}
+The user message gives the project, its roadmap and test feedback priorities.
 
 Generate a comprehensive list of granular, actionable development tasks.
 
@@ -36,9 +31,9 @@ For each task, provide:
 - Prioritize critical issues from test feedback as "must" + "highest"
 
 Output in **valid JSON format only** (no markdown, no code blocks):
-{{
+{
   "tasks": [
-    {{
+    {
       "title": "Setup authentication system",
       "description": "Implement JWT-based authentication with user registration, login, and password reset flows",
       "priority": "highest",
@@ -53,6 +48,18 @@ Output in **valid JSON format only** (no markdown, no code blocks):
       "dependencies": [],
       "moscow_category": "must",
       "rationale": "Complex feature requiring security best practices and email integration"
-    }}
+    }
   ]
-}}"""
+}"""
+
+GENERATE_TASKS_PROMPT = """Project: {project_name}
+Goal: {project_goal}
+
+Roadmap Context:
+{roadmap_context}
+
+Test Feedback Priorities:
+{test_priorities}
+
+Generate the implementation tasks for this project."""
+
@@ -1,20 +1,19 @@
-"""Stage summary generation prompts"""
+"""
+Stage summary generation prompts
+
+The *_PROMPT system prompts are static so they are byte-identical on every
+call and can be served from the provider's prompt cache. Project fields and
+stage data are formatted into the matching *_INPUT user message instead.
+"""
 
 DEFINE_STAGE_SUMMARY_PROMPT = """
 You are an expert in design thinking, specializing in synthesizing research insights into clear problem statements.
 
 Your task is to analyze the Define stage analyses and create a concise problem statement summary that will guide the Ideate stage.
-
-**Project Context:**
-- Project: {project_name}
-- Area: {project_area}
-- Goal: {project_goal}
-
-**Define Stage Analyses:**
-{define_analyses}
+The user message contains the project context and the Define stage analyses.
 
 **Your Task:**
-Synthesize the above analyses into a comprehensive problem statement summary (200-300 words) that includes:
+Synthesize the analyses into a comprehensive problem statement summary (200-300 words) that includes:
 
 1. **Core User Problem**: What is the fundamental problem users are facing?
 2. **Key Pain Points**: Top 3-5 pain points identified across analyses
@@ -35,18 +34,23 @@ Avoid repeating verbatim from analyses - synthesize and distill.
 - Inspiring for ideation
 """
 
-EMPATHISE_STAGE_SUMMARY_PROMPT = """
-You are an expert in design thinking, specializing in user research synthesis.
-
-Synthesize the empathise stage research data into a summary that captures key user insights.
-
+DEFINE_STAGE_SUMMARY_INPUT = """
 **Project Context:**
 - Project: {project_name}
 - Area: {project_area}
 - Goal: {project_goal}
 
-**Research Data:**
-{research_data}
+**Define Stage Analyses:**
+{define_analyses}
+
+Synthesize these analyses into a problem statement summary.
+"""
+
+EMPATHISE_STAGE_SUMMARY_PROMPT = """
+You are an expert in design thinking, specializing in user research synthesis.
+
+Synthesize the empathise stage research data into a summary that captures key user insights.
+The user message contains the project context and the research data.
 
 **Your Task:**
 Create a research summary (150-200 words) highlighting:
@@ -58,18 +62,21 @@ Create a research summary (150-200 words) highlighting:
 Format as clear, scannable bullet points.
 """
 
-IDEATE_STAGE_SUMMARY_PROMPT = """
-You are an expert in design thinking, specializing in idea synthesis.
-
-Summarize the ideation session outcomes to guide prototyping.
-
+EMPATHISE_STAGE_SUMMARY_INPUT = """
 **Project Context:**
 - Project: {project_name}
 - Area: {project_area}
 - Goal: {project_goal}
 
-**Ideation Results:**
-{ideation_data}
+**Research Data:**
+{research_data}
+"""
+
+IDEATE_STAGE_SUMMARY_PROMPT = """
+You are an expert in design thinking, specializing in idea synthesis.
+
+Summarize the ideation session outcomes to guide prototyping.
+The user message contains the project context and the ideation results.
 
 **Your Task:**
 Create a summary (150-200 words) including:
@@ -80,3 +87,15 @@ Create a summary (150-200 words) including:
 
 Format as actionable insights for prototype development.
 """
+
+IDEATE_STAGE_SUMMARY_INPUT = """
+**Project Context:**
+- Project: {project_name}
+- Area: {project_area}
+- Goal: {project_goal}
+
+**Ideation Results:**
+{ideation_data}
+
+Synthesize the ideation results into a concise summary.
+"""
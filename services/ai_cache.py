@@ -0,0 +1,297 @@
+"""
+AI Response Cache
+Two-tier cache for AI completions: an in-process LRU in front of a
+database-backed store, with TTL, size-bounded eviction and per-project
+invalidation
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from config.settings import Settings
+
+
+class ResponseCache:
+    """LRU memory cache backed by the ai_response_cache table"""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: int = 86400,
+        max_rows: int = 5000,
+        session_factory: Optional[Callable] = None
+    ):
+        """
+        Initialize the response cache
+
+        Args:
+            max_entries: Maximum number of responses kept in process memory
+            ttl_seconds: Time-to-live for cached responses (both tiers)
+            max_rows: Maximum number of rows kept in the database tier
+            session_factory: Callable returning a SQLAlchemy session (a factory
+                returning None disables the persistent tier). Defaults to
+                config.database.SessionLocal.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+
+        if session_factory is None:
+            from config.database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+
+        # key -> (response_text, expires_at_monotonic, project_id)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(
+        model: str,
+        temperature: Any,
+        max_tokens: Any,
+        system_prompt: str,
+        user_prompt: str
+    ) -> str:
+        """
+        Build a cache key from everything that determines a completion
+
+        Returns:
+            SHA-256 hex digest of the request parameters
+        """
+        payload = json.dumps(
+            [model, temperature, max_tokens, system_prompt, user_prompt],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response, checking memory first and then the database
+
+        Args:
+            key: Cache key from make_key()
+
+        Returns:
+            Cached response text, or None on a miss
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        value, project_id = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._memory_set(key, value, project_id)
+        return value
+
+    def set(self, key: str, value: str, project_id: Optional[int] = None, model: Optional[str] = None):
+        """
+        Store a response in both tiers
+
+        Args:
+            key: Cache key from make_key()
+            value: Response text
+            project_id: Optional project the response belongs to
+            model: Optional model name (informational)
+        """
+        with self._lock:
+            self._memory_set(key, value, project_id)
+            self._stats["writes"] += 1
+        self._disk_set(key, value, project_id, model)
+
+    def invalidate_project(self, project_id: int, db=None) -> int:
+        """
+        Drop all cached responses for a project
+
+        Args:
+            project_id: Project ID
+            db: Optional existing session to run the delete on (committed, not closed)
+
+        Returns:
+            Number of database rows removed
+        """
+        with self._lock:
+            stale = [k for k, (_, _, pid) in self._memory.items() if pid == project_id]
+            for k in stale:
+                del self._memory[k]
+
+        from database.models import AIResponseCache
+        owns_session = db is None
+        if owns_session:
+            db = self._session_factory()
+        if db is None:
+            return 0
+        try:
+            removed = db.query(AIResponseCache).filter(
+                AIResponseCache.project_id == project_id
+            ).delete(synchronize_session=False)
+            db.commit()
+            return removed
+        except Exception as e:
+            db.rollback()
+            print(f"Warning: could not invalidate AI cache for project {project_id}: {str(e)}")
+            return 0
+        finally:
+            if owns_session:
+                db.close()
+
+    def clear(self):
+        """Remove every cached response from both tiers"""
+        with self._lock:
+            self._memory.clear()
+
+        from database.models import AIResponseCache
+        db = self._session_factory()
+        if db is None:
+            return
+        try:
+            db.query(AIResponseCache).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Warning: could not clear AI cache: {str(e)}")
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters
+
+        Returns:
+            Dictionary of counters plus hit rate and current memory size
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _memory_set(self, key: str, value: str, project_id: Optional[int]):
+        """Insert into the LRU tier (caller holds the lock)"""
+        self._memory[key] = (value, time.monotonic() + self.ttl_seconds, project_id)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_get(self, key: str) -> tuple:
+        """Read from the database tier, returning (value, project_id)"""
+        from database.models import AIResponseCache
+        db = self._session_factory()
+        if db is None:
+            return None, None
+        try:
+            row = db.query(AIResponseCache).filter(AIResponseCache.cache_key == key).first()
+            if row is None:
+                return None, None
+
+            now = datetime.utcnow()
+            if row.expires_at <= now:
+                db.delete(row)
+                db.commit()
+                return None, None
+
+            row.hit_count = (row.hit_count or 0) + 1
+            row.last_accessed_at = now
+            db.commit()
+            return row.response_text, row.project_id
+        except Exception as e:
+            db.rollback()
+            print(f"Warning: AI cache read failed: {str(e)}")
+            return None, None
+        finally:
+            db.close()
+
+    def _disk_set(self, key: str, value: str, project_id: Optional[int], model: Optional[str]):
+        """Write to the database tier and evict expired / least recently used rows"""
+        from database.models import AIResponseCache
+        db = self._session_factory()
+        if db is None:
+            return
+        try:
+            now = datetime.utcnow()
+            row = db.query(AIResponseCache).filter(AIResponseCache.cache_key == key).first()
+            if row is None:
+                row = AIResponseCache(cache_key=key)
+                db.add(row)
+            row.project_id = project_id
+            row.model = model
+            row.response_text = value
+            row.created_at = now
+            row.last_accessed_at = now
+            row.expires_at = now + timedelta(seconds=self.ttl_seconds)
+            db.flush()
+
+            # Drop expired rows, then trim the oldest-accessed rows over the limit
+            db.query(AIResponseCache).filter(
+                AIResponseCache.expires_at <= now
+            ).delete(synchronize_session=False)
+
+            overflow = db.query(AIResponseCache).count() - self.max_rows
+            if overflow > 0:
+                oldest_keys = [
+                    k for (k,) in db.query(AIResponseCache.cache_key)
+                    .order_by(AIResponseCache.last_accessed_at)
+                    .limit(overflow)
+                ]
+                db.query(AIResponseCache).filter(
+                    AIResponseCache.cache_key.in_(oldest_keys)
+                ).delete(synchronize_session=False)
+                with self._lock:
+                    self._stats["evictions"] += len(oldest_keys)
+
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Warning: AI cache write failed: {str(e)}")
+        finally:
+            db.close()
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the process-wide response cache
+
+    Returns:
+        Shared ResponseCache configured from Settings
+    """
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    max_entries=Settings.AI_CACHE_MEMORY_ENTRIES,
+                    ttl_seconds=Settings.AI_CACHE_TTL_SECONDS,
+                    max_rows=Settings.AI_CACHE_MAX_ROWS
+                )
+    return _response_cache
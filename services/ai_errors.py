@@ -0,0 +1,33 @@
+"""
+AI Service Errors
+Typed exceptions raised by AIService instead of returning error strings
+"""
+
+from typing import Optional
+
+
+class AIServiceError(Exception):
+    """Base class for AI generation failures"""
+
+    def __init__(self, message: str, provider: Optional[str] = None, model: Optional[str] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.model = model
+
+
+class AIRateLimitError(AIServiceError):
+    """Provider kept rejecting the request with 429 / overloaded after all retries"""
+
+    def __init__(self, message: str, provider: Optional[str] = None, model: Optional[str] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message, provider, model)
+        self.retry_after = retry_after
+
+
+class AIProviderError(AIServiceError):
+    """Provider or network error (bad request, auth, server error, timeout)"""
+
+    def __init__(self, message: str, provider: Optional[str] = None, model: Optional[str] = None,
+                 status_code: Optional[int] = None):
+        super().__init__(message, provider, model)
+        self.status_code = status_code
@@ -1,92 +1,164 @@
 """
 AI Service - Multi-Provider AI Integration
 Wrapper for all AI-powered generation tasks using LangChain
-Supports: OpenAI (GPT, o1), Anthropic (Claude), xAI (Grok)
+Supports: OpenAI (GPT, o1), Anthropic (Claude), xAI (Grok), plus an offline
+fake provider and record/replay cassettes for tests and benchmarks
 """
 
 from openai import OpenAI
 from config.settings import Settings
-from typing import Dict, Any, Optional, Union
-from datetime import datetime
+from services.ai_cache import ResponseCache, get_response_cache
+from services.llm_registry import get_llm_registry, resolve_provider
+from services.async_loop import submit_async, run_async
+from services.ai_errors import AIServiceError
+from services.rate_limiter import (
+    call_with_retry, acall_with_retry, estimate_tokens, get_rate_limiter, to_ai_error
+)
+from services.telemetry import record_llm_call
+from services.single_flight import get_single_flight
+from services.hedging import get_hedge_delay, get_latency_tracker, hedged_race
+from services.image_processor import prepare_for_vision
+from services.fake_llm import FakeOpenAIClient
+from services.cassette import wrap_chat_model
+from services.structured_output import (
+    JSON_REPAIR_PROMPT, JSON_REPAIR_SYSTEM_PROMPT, StructuredOutputError, parse_structured, raw_output_text
+)
+from services.prompt_builder import PromptBuilder, DALLE_PROMPT_MAX_CHARS, truncate_to_chars
+from typing import Dict, Any, Optional, Union, Callable, Iterator, List, Tuple, Type, TypeVar
+import concurrent.futures
+import asyncio
+import sys
+import time
 import json
 import base64
 
 # LangChain imports
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage, BaseMessage
+from langchain_core.messages.ai import add_usage
 from langchain_core.language_models.chat_models import BaseChatModel
+from pydantic import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+# Leading bytes of the image formats accepted by the vision API
+IMAGE_SIGNATURES = (
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),
+)
+
+def _total_tokens(response) -> Optional[int]:
+    """Total tokens reported by a LangChain response, if available"""
+    usage = getattr(response, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+def _iter_async_stream(stream) -> Iterator:
+    """Pull chunks from an async stream on the background loop, one at a time"""
+    try:
+        while True:
+            try:
+                yield run_async(stream.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_async(stream.aclose())
+
+def _image_data_url(image: Union[bytes, memoryview, str]) -> str:
+    """Data URL for raw image bytes or an already base64-encoded image"""
+    if isinstance(image, str):
+        encoded = image
+        header = base64.b64decode(image[:16])
+    else:
+        encoded = base64.b64encode(image).decode('ascii')
+        header = bytes(image[:16])
+
+    mime_type = "image/jpeg"
+    for signature, candidate in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            mime_type = candidate
+            break
+    return f"data:{mime_type};base64,{encoded}"
+
+def _vision_image(image: Union[bytes, memoryview, str]) -> Tuple[str, str, int]:
+    """Data URL, detail level and estimated tokens for a vision image"""
+    if Settings.AI_VISION_PREPROCESS:
+        try:
+            data, mime_type, detail, tokens = prepare_for_vision(image)
+            return f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}", detail, tokens
+        except Exception as e:
+            print(f"Warning: could not preprocess image, sending original: {str(e)}")
+    # High-detail images cost roughly 1000 tokens
+    return _image_data_url(image), "high", 1000
+
+def _caller_name(frame) -> str:
+    """Telemetry label for a stack frame (e.g. define.generate_analysis)"""
+    module = frame.f_globals.get("__name__", "").rsplit(".", 1)[-1]
+    return f"{module}.{frame.f_code.co_name}"
 
 class AIService:
     """AI service for generating content using multiple AI providers via LangChain"""
 
-    def __init__(self, model: Optional[str] = None):
+    def __init__(self, model: Optional[str] = None, project_id: Optional[int] = None, caller: Optional[str] = None):
         """
         Initialize AI service with LangChain multi-provider support
 
         Args:
             model: Optional model override. If not provided, uses Settings.OPENAI_MODEL
+            project_id: Optional project the calls belong to (used for cache invalidation)
+            caller: Optional telemetry label. Defaults to the function creating the service
         """
         self.model = model if model else Settings.OPENAI_MODEL
         self.temperature = Settings.OPENAI_TEMPERATURE
         self.max_tokens = Settings.OPENAI_MAX_TOKENS
+        self.project_id = project_id
+        self.caller = caller or _caller_name(sys._getframe(1))
+
+        # Model that produced the most recent result (differs from self.model
+        # when a hedged request was answered by AI_HEDGE_MODEL)
+        self.last_model_used = self.model
 
-        # Initialize the appropriate LangChain chat model based on model name
+        # Shared response cache (None when disabled)
+        self.cache = get_response_cache() if Settings.AI_CACHE_ENABLED else None
+
+        # Clients come from the process-wide registry, so constructing an
+        # AIService per action is cheap and reuses pooled connections.
+        # Cassette replays never reach a provider, so they need no API key.
+        if Settings.AI_CASSETTE_MODE == "replay":
+            self.provider = "fake"
+        else:
+            self.provider, _, _ = resolve_provider(self.model)
         self.llm = self._initialize_llm()
 
         # Keep OpenAI client for image generation (DALL-E)
-        self.client = OpenAI(api_key=Settings.OPENAI_API_KEY)
+        if self.provider == "fake":
+            self.client = FakeOpenAIClient(self.model)
+        else:
+            self.client = get_llm_registry().get_openai_client()
 
     def _initialize_llm(self) -> BaseChatModel:
         """
-        Initialize the appropriate LangChain chat model based on model name
+        Get the shared LangChain chat model for this service's model name
+
+        OpenAI models (GPT, o1) and the default go to OpenAI, Claude models to
+        Anthropic, Grok models to xAI's OpenAI-compatible API, and "fake"
+        models to the offline fake provider. With AI_CASSETTE_MODE set, the
+        model is wrapped to record to (or replay from) a cassette.
 
         Returns:
             LangChain chat model instance
         """
-        # OpenAI models (GPT-4, GPT-5, o1, etc.)
-        if self.model.startswith(('gpt', 'o1')):
-            return ChatOpenAI(
-                model=self.model,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                api_key=Settings.OPENAI_API_KEY
-            )
+        if Settings.AI_CASSETTE_MODE == "replay":
+            return wrap_chat_model(self.model, None)
+        return wrap_chat_model(self.model, get_llm_registry().get_chat_model(self.model))
 
-        # Anthropic models (Claude)
-        elif self.model.startswith('claude'):
-            if not Settings.ANTHROPIC_API_KEY:
-                raise ValueError("ANTHROPIC_API_KEY not set in environment variables")
-            return ChatAnthropic(
-                model=self.model,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                api_key=Settings.ANTHROPIC_API_KEY
-            )
-
-        # xAI models (Grok) - Using OpenAI-compatible API
-        elif self.model.startswith('grok'):
-            if not Settings.XAI_API_KEY:
-                raise ValueError("XAI_API_KEY not set in environment variables")
-            # xAI uses OpenAI-compatible API
-            return ChatOpenAI(
-                model=self.model,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                api_key=Settings.XAI_API_KEY,
-                base_url="https://api.x.ai/v1"  # xAI API endpoint
-            )
-
-        else:
-            # Default to OpenAI
-            return ChatOpenAI(
-                model=self.model,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                api_key=Settings.OPENAI_API_KEY
-            )
-
-    def _call_openai(self, system_prompt: str, user_prompt: str) -> str:
+    def _call_openai(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        use_cache: bool = True,
+        content_type: Optional[str] = None
+    ) -> str:
         """
         Make a call to AI provider via LangChain
 
@@ -95,82 +167,765 @@ class AIService:
         - Provider-specific API formats
         - System message compatibility
 
+        Identical requests are served from the response cache when enabled.
+        Requests go through the provider's rate limiter and transient failures
+        (429, overloaded, 5xx, connection errors) are retried with backoff.
+        With hedging enabled and enough latency history, a slow or failing
+        request is also sent to AI_HEDGE_MODEL and the first good response
+        wins (see last_model_used).
+        An identical request already in flight in any process is waited for
+        instead of sent again (see services/single_flight.py).
+        Every call is logged to llm_call_logs (see services/telemetry.py).
+
         Args:
             system_prompt: System instruction
             user_prompt: User message
+            use_cache: Set False to force a fresh completion
+            content_type: Optional content type recorded with the call telemetry
 
         Returns:
             Generated text response
+
+        Raises:
+            AIRateLimitError: Provider still rate limiting after all retries
+            AIProviderError: Provider or network failure
         """
-        try:
-            # Create messages using LangChain message types
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_prompt)
-            ]
+        started = time.perf_counter()
+        self.last_model_used = self.model
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = self._cache_key(system_prompt, user_prompt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._record_call("text", started, content_type, cache_hit=True)
+                return cached
+
+        def generate() -> str:
+            if self._hedge_target() is not None:
+                # Hedged requests race on the background loop
+                text, _ = run_async(self._acall_with_model(system_prompt, user_prompt, use_cache=False,
+                                                           content_type=content_type, cache_key=cache_key,
+                                                           single_flight=False))
+                return text
 
             # LangChain automatically handles model-specific requirements:
             # - o1 models: converts system messages, uses max_completion_tokens
             # - Claude: uses Anthropic API format
             # - Grok: uses xAI API format
-            response = self.llm.invoke(messages)
+            messages = self._build_messages(system_prompt, user_prompt)
+            try:
+                response = call_with_retry(
+                    lambda: self.llm.invoke(messages),
+                    self.provider,
+                    self.model,
+                    estimate_tokens(system_prompt, user_prompt),
+                    usage_tokens=_total_tokens
+                )
+            except AIServiceError as e:
+                self._record_call("text", started, content_type, error=e)
+                raise
+            self._record_call("text", started, content_type, usage=response.usage_metadata)
+
+            if cache_key and response.content:
+                self.cache.set(cache_key, response.content, project_id=self.project_id, model=self.model)
 
             return response.content
 
+        return self._single_flight(
+            cache_key or self._cache_key(system_prompt, user_prompt), generate, started, "text", content_type, use_cache
+        )
+
+    async def _acall_openai(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        use_cache: bool = True,
+        content_type: Optional[str] = None,
+        cache_key: Optional[str] = None
+    ) -> str:
+        """
+        Async version of _call_openai
+
+        Runs under the provider's process-wide concurrency limit and rate
+        limiter. Must run on the background loop (see services/async_loop.py) -
+        use generate_many or run_async from synchronous code.
+
+        Args:
+            system_prompt: System instruction
+            user_prompt: User message
+            use_cache: Set False to force a fresh completion
+            content_type: Optional content type recorded with the call telemetry
+            cache_key: Key to store the response under when the lookup was already done
+
+        Returns:
+            Generated text response
+
+        Raises:
+            AIRateLimitError: Provider still rate limiting after all retries
+            AIProviderError: Provider or network failure
+        """
+        text, _ = await self._acall_with_model(system_prompt, user_prompt, use_cache, content_type, cache_key)
+        return text
+
+    async def _acall_with_model(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        use_cache: bool = True,
+        content_type: Optional[str] = None,
+        cache_key: Optional[str] = None,
+        single_flight: bool = True
+    ) -> Tuple[str, str]:
+        """
+        Run _acall_openai and also return the model that produced the text
+
+        single_flight=False skips request deduplication, for callers that
+        already hold the single-flight lease for this request.
+        """
+        started = time.perf_counter()
+        if self.cache is not None and use_cache:
+            cache_key = self._cache_key(system_prompt, user_prompt)
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                self._record_call("text", started, content_type, cache_hit=True)
+                return cached, self.model
+
+        async def generate() -> Tuple[str, str]:
+            estimated_tokens = estimate_tokens(system_prompt, user_prompt)
+
+            async def invoke(model: str, provider: str, llm: BaseChatModel):
+                messages = self._build_messages(system_prompt, user_prompt, provider)
+                call_started = time.perf_counter()
+                try:
+                    async with get_llm_registry().semaphore(provider):
+                        response = await acall_with_retry(
+                            lambda: llm.ainvoke(messages),
+                            provider,
+                            model,
+                            estimated_tokens,
+                            usage_tokens=_total_tokens
+                        )
+                except AIServiceError as e:
+                    self._record_call("text", call_started, content_type, error=e, model=model, provider=provider)
+                    raise
+                self._record_call("text", call_started, content_type, usage=response.usage_metadata,
+                                  model=model, provider=provider)
+                return response
+
+            hedge = self._hedge_target()
+            delay = get_hedge_delay(self.model, "latency") if hedge else None
+            if delay is None:
+                hedge = None  # Not enough latency history yet
+            response, index = await hedged_race(
+                lambda: invoke(self.model, self.provider, self.llm),
+                (lambda: invoke(*hedge)) if hedge else None,
+                delay or 0
+            )
+            model_used = hedge[0] if index else self.model
+            self.last_model_used = model_used
+
+            if cache_key and response.content:
+                await asyncio.to_thread(
+                    self.cache.set, cache_key, response.content, project_id=self.project_id, model=model_used
+                )
+
+            return response.content, model_used
+
+        if not (single_flight and Settings.AI_SINGLE_FLIGHT_ENABLED):
+            return await generate()
+
+        model_used = self.model
+
+        async def generate_text() -> str:
+            nonlocal model_used
+            text, model_used = await generate()
+            return text
+
+        text, joined = await get_single_flight().arun(
+            cache_key or self._cache_key(system_prompt, user_prompt), generate_text,
+            project_id=self.project_id, accept_done=use_cache
+        )
+        if joined:
+            self._record_call("text", started, content_type, cache_hit=True)
+        return text, model_used
+
+    def generate_structured(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        schema: Type[T],
+        use_cache: bool = True,
+        content_type: Optional[str] = None
+    ) -> T:
+        """
+        Generate output validated against a Pydantic schema
+
+        Uses the provider's schema-constrained mode (OpenAI / xAI JSON schema,
+        Anthropic tool use) when the chat model supports it, and plain JSON
+        text otherwise. Output that still fails to parse is fixed without
+        regenerating: fenced or truncated JSON locally, anything else with a
+        short repair call (on AI_REPAIR_MODEL when set) that only sees the
+        broken JSON and the validation error. Identical requests in flight
+        are deduplicated like _call_openai.
+
+        Args:
+            system_prompt: System instruction
+            user_prompt: User message
+            schema: Pydantic model class the output must match
+            use_cache: Set False to force a fresh completion
+            content_type: Optional content type recorded with the call telemetry
+
+        Returns:
+            Validated schema instance
+
+        Raises:
+            StructuredOutputError: Output could not be repaired to match the schema
+            AIRateLimitError: Provider still rate limiting after all retries
+            AIProviderError: Provider or network failure
+        """
+        started = time.perf_counter()
+        self.last_model_used = self.model
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = self._cache_key(system_prompt, f"{schema.__name__}\n{user_prompt}")
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                try:
+                    result = schema.model_validate_json(cached)
+                    self._record_call("text", started, content_type, cache_hit=True)
+                    return result
+                except ValueError:
+                    pass  # Schema changed since the entry was written
+
+        def generate() -> str:
+            try:
+                structured_llm = self.llm.with_structured_output(schema, include_raw=True)
+            except NotImplementedError:
+                structured_llm = None  # e.g. fake and cassette models
+
+            messages = self._build_messages(system_prompt, user_prompt)
+            try:
+                if structured_llm is not None:
+                    response = call_with_retry(
+                        lambda: structured_llm.invoke(messages),
+                        self.provider,
+                        self.model,
+                        estimate_tokens(system_prompt, user_prompt),
+                        usage_tokens=lambda response: _total_tokens(response["raw"])
+                    )
+                    raw, result = response["raw"], response["parsed"]
+                else:
+                    raw = call_with_retry(
+                        lambda: self.llm.invoke(messages),
+                        self.provider,
+                        self.model,
+                        estimate_tokens(system_prompt, user_prompt),
+                        usage_tokens=_total_tokens
+                    )
+                    result = None
+            except AIServiceError as e:
+                self._record_call("text", started, content_type, error=e)
+                raise
+            self._record_call("text", started, content_type, usage=raw.usage_metadata)
+
+            if result is None:
+                result = self._repair_structured(raw_output_text(raw), schema, content_type)
+
+            if cache_key:
+                self.cache.set(cache_key, result.model_dump_json(), project_id=self.project_id, model=self.model)
+            return result.model_dump_json()
+
+        flight_key = cache_key or self._cache_key(system_prompt, f"{schema.__name__}\n{user_prompt}")
+        return schema.model_validate_json(
+            self._single_flight(flight_key, generate, started, "text", content_type, use_cache)
+        )
+
+    def _single_flight(
+        self,
+        key: str,
+        generate: Callable[[], str],
+        started: float,
+        call_type: str,
+        content_type: Optional[str] = None,
+        use_cache: bool = True
+    ) -> str:
+        """
+        Run generate() unless an identical request is in flight elsewhere
+
+        Args:
+            key: Request fingerprint
+            generate: Makes the call and returns the response text
+            started: time.perf_counter() value taken before the call
+            call_type: Telemetry call type
+            content_type: Optional content type recorded with the call telemetry
+            use_cache: Whether a result finished just before this call may be reused
+
+        Returns:
+            Response text, generated here or by the caller holding the lease
+        """
+        if not Settings.AI_SINGLE_FLIGHT_ENABLED:
+            return generate()
+        text, joined = get_single_flight().run(key, generate, project_id=self.project_id, accept_done=use_cache)
+        if joined:
+            self._record_call(call_type, started, content_type, cache_hit=True)
+        return text
+
+    def _repair_structured(self, text: str, schema: Type[T], content_type: Optional[str] = None) -> T:
+        """
+        Turn output that failed validation into a schema instance
+
+        Args:
+            text: Raw model output
+            schema: Pydantic model class
+            content_type: Content type of the original call
+
+        Returns:
+            Validated schema instance
+
+        Raises:
+            StructuredOutputError: If the repair call's output is still invalid
+        """
+        try:
+            return parse_structured(text, schema)
+        except StructuredOutputError as e:
+            error = e
+
+        print(f"Warning: {schema.__name__} output failed validation, running repair pass: {str(error)[:200]}")
+        repairer = self
+        if Settings.AI_REPAIR_MODEL and Settings.AI_REPAIR_MODEL != self.model:
+            repairer = AIService(model=Settings.AI_REPAIR_MODEL, project_id=self.project_id, caller=self.caller)
+        prompt = JSON_REPAIR_PROMPT.format(
+            schema=json.dumps(schema.model_json_schema()),
+            error=str(error)[:2000],
+            output=text
+        )
+        repaired = repairer._call_openai(
+            JSON_REPAIR_SYSTEM_PROMPT, prompt, use_cache=False,
+            content_type=f"{content_type}_repair" if content_type else "repair"
+        )
+        return parse_structured(repaired, schema)
+
+    def iter_generate_many(
+        self,
+        prompts: List[Tuple[str, str]],
+        return_exceptions: bool = False,
+        content_types: Optional[List[str]] = None
+    ) -> Iterator[Tuple[int, Union[str, AIServiceError]]]:
+        """
+        Run several completions concurrently, yielding each as it finishes
+
+        Requests run on the background loop under the provider's concurrency
+        cap, so wall-clock time is close to the slowest call rather than the
+        sum. Results are yielded in the calling thread, so callers can save
+        rows and update the UI as each one lands. last_model_used is set to
+        the model behind each result just before it is yielded.
+
+        Args:
+            prompts: List of (system_prompt, user_prompt) pairs
+            return_exceptions: Yield AIServiceError instances for failed prompts
+                instead of raising on the first failure
+            content_types: Optional content type per prompt, for telemetry
+
+        Yields:
+            Tuples of (index into prompts, generated text or error) in completion order
+        """
+        content_types = content_types or [None] * len(prompts)
+        futures = {
+            submit_async(self._acall_with_model(system_prompt, user_prompt, content_type=content_types[idx])): idx
+            for idx, (system_prompt, user_prompt) in enumerate(prompts)
+        }
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    text, self.last_model_used = future.result()
+                    yield futures[future], text
+                except AIServiceError as e:
+                    if not return_exceptions:
+                        raise
+                    yield futures[future], e
+        finally:
+            # Caller stopped early (e.g. Streamlit rerun) - don't leave work running
+            for future in futures:
+                future.cancel()
+
+    def generate_many(
+        self,
+        prompts: List[Tuple[str, str]],
+        return_exceptions: bool = False,
+        content_types: Optional[List[str]] = None
+    ) -> List[Union[str, AIServiceError]]:
+        """
+        Run several completions concurrently and wait for all of them
+
+        Args:
+            prompts: List of (system_prompt, user_prompt) pairs
+            return_exceptions: Return AIServiceError instances for failed prompts
+                instead of raising on the first failure
+            content_types: Optional content type per prompt, for telemetry
+
+        Returns:
+            Generated texts (or errors) in the same order as prompts
+        """
+        results: List[Optional[str]] = [None] * len(prompts)
+        for idx, text in self.iter_generate_many(prompts, return_exceptions, content_types):
+            results[idx] = text
+        return results
+
+    def stream_text(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        use_cache: bool = True,
+        on_complete: Optional[Callable[[str], None]] = None,
+        content_type: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Stream a completion as text chunks
+
+        Chunks are yielded as soon as the provider sends them, so callers can
+        render progressively (e.g. with st.write_stream). The full text is
+        accumulated, written to the response cache and handed to on_complete
+        once the stream finishes; a stream abandoned part-way (e.g. by a
+        Streamlit rerun) is neither cached nor passed to on_complete.
+
+        Opening the stream is rate limited and retried like _call_openai; a
+        failure after the first chunk is raised without retrying. With
+        hedging enabled, the stream from whichever model sends its first
+        token first is used (last_model_used is set before on_complete runs).
+        A caller that finds an identical stream in flight waits for it and
+        receives its full text as a single chunk.
+
+        Args:
+            system_prompt: System instruction
+            user_prompt: User message
+            use_cache: Set False to force a fresh completion
+            on_complete: Optional callback receiving the final text, used to persist it
+            content_type: Optional content type recorded with the call telemetry
+
+        Yields:
+            Text chunks
+
+        Raises:
+            AIRateLimitError: Provider still rate limiting after all retries
+            AIProviderError: Provider or network failure
+        """
+        started = time.perf_counter()
+        self.last_model_used = self.model
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = self._cache_key(system_prompt, user_prompt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._record_call("stream", started, content_type, cache_hit=True)
+                yield cached
+                if on_complete:
+                    on_complete(cached)
+                return
+
+        # Wait for an identical stream already in flight instead of starting another
+        flight, flight_key, token = None, None, None
+        if Settings.AI_SINGLE_FLIGHT_ENABLED:
+            flight = get_single_flight()
+            flight_key = cache_key or self._cache_key(system_prompt, user_prompt)
+            token, joined_text = flight.claim(flight_key, self.project_id, accept_done=use_cache)
+            if joined_text is not None:
+                self._record_call("stream", started, content_type, cache_hit=True)
+                yield joined_text
+                if on_complete:
+                    on_complete(joined_text)
+                return
+
+        estimated_tokens = estimate_tokens(system_prompt, user_prompt)
+        model, provider = self.model, self.provider
+        hedge = self._hedge_target()
+
+        try:
+            if hedge is None:
+                messages = self._build_messages(system_prompt, user_prompt)
+
+                def open_stream():
+                    # The request is only sent when the first chunk is pulled
+                    chunks = iter(self.llm.stream(messages))
+                    return next(chunks, None), chunks
+
+                first_chunk, chunks = call_with_retry(open_stream, provider, model, estimated_tokens)
+            else:
+                first_chunk, chunks, model, provider = run_async(
+                    self._aopen_stream_hedged(system_prompt, user_prompt, estimated_tokens, hedge)
+                )
+        except AIServiceError as e:
+            self._record_call("stream", started, content_type, error=e)
+            if flight:
+                flight.release(flight_key, token)
+            raise
+        ttft_ms = (time.perf_counter() - started) * 1000
+        self.last_model_used = model
+
+        parts = []
+        usage = None
+        error = None
+        finished = False
+        try:
+            chunk = first_chunk
+            while chunk is not None:
+                if chunk.usage_metadata:
+                    usage = add_usage(usage, chunk.usage_metadata)
+                text = chunk.text
+                if text:
+                    parts.append(text)
+                    yield text
+                chunk = next(chunks, None)
+            finished = True
+        except GeneratorExit:
+            raise
         except Exception as e:
-            return f"Error generating content: {str(e)}"
+            error = to_ai_error(e, provider, model)
+            raise error from e
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            get_rate_limiter(provider).settle(estimated_tokens, usage["total_tokens"] if usage else None)
+            self._record_call("stream", started, content_type, usage=usage, ttft_ms=ttft_ms, error=error,
+                              model=model, provider=provider)
+            if flight and not finished:
+                flight.release(flight_key, token)
 
-    def analyze_image_with_vision(self, image_path: str, prompt: str, system_context: Optional[str] = None) -> str:
+        full_text = "".join(parts)
+        if flight:
+            flight.complete(flight_key, token, full_text)
+        if cache_key and full_text:
+            self.cache.set(cache_key, full_text, project_id=self.project_id, model=model)
+        if on_complete and full_text:
+            on_complete(full_text)
+
+    async def _aopen_stream_hedged(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        estimated_tokens: int,
+        hedge: Tuple[str, str, BaseChatModel]
+    ) -> Tuple[Any, Iterator, str, str]:
+        """
+        Race the primary and hedge models to their first streamed chunk
+
+        Returns:
+            Tuple of (first chunk, iterator over the remaining chunks, model, provider)
+        """
+        async def open_stream(model: str, provider: str, llm: BaseChatModel):
+            messages = self._build_messages(system_prompt, user_prompt, provider)
+
+            async def first_chunk():
+                stream = llm.astream(messages)
+                try:
+                    return await stream.__anext__(), stream
+                except StopAsyncIteration:
+                    return None, stream
+                except BaseException:
+                    await stream.aclose()
+                    raise
+
+            chunk, stream = await acall_with_retry(first_chunk, provider, model, estimated_tokens)
+            return chunk, stream, model, provider
+
+        async def discard(result):
+            await result[1].aclose()
+
+        (chunk, stream, model, provider), _ = await hedged_race(
+            lambda: open_stream(self.model, self.provider, self.llm),
+            lambda: open_stream(*hedge),
+            get_hedge_delay(self.model, "ttft"),
+            discard=discard
+        )
+        return chunk, _iter_async_stream(stream), model, provider
+
+    def _hedge_target(self) -> Optional[Tuple[str, str, BaseChatModel]]:
+        """
+        Secondary model for hedged requests
+
+        Returns:
+            Tuple of (model, provider, chat model), or None when hedging is
+            off, not configured, or the secondary's API key is missing
+        """
+        if not Settings.AI_HEDGING_ENABLED or not Settings.AI_HEDGE_MODEL or Settings.AI_HEDGE_MODEL == self.model:
+            return None
+        try:
+            provider, _, _ = resolve_provider(Settings.AI_HEDGE_MODEL)
+            llm = wrap_chat_model(Settings.AI_HEDGE_MODEL, get_llm_registry().get_chat_model(Settings.AI_HEDGE_MODEL))
+            return Settings.AI_HEDGE_MODEL, provider, llm
+        except ValueError as e:
+            print(f"Warning: hedging disabled for {Settings.AI_HEDGE_MODEL}: {str(e)}")
+            return None
+
+    def _build_messages(self, system_prompt: str, user_prompt: str, provider: Optional[str] = None) -> List[BaseMessage]:
+        """
+        Create LangChain messages for a system + user prompt pair
+
+        The system prompt always comes first so repeated calls share a
+        byte-identical prefix: OpenAI and xAI cache it automatically, and for
+        Anthropic it is marked with a cache_control breakpoint. Keep per-call
+        values (project fields, research data) in the user prompt.
+
+        Args:
+            system_prompt: System instruction
+            user_prompt: User message
+            provider: Provider the messages are for, defaults to this service's provider
+
+        Returns:
+            List of LangChain messages
+        """
+        system_message = SystemMessage(content=system_prompt)
+        if (provider or self.provider) == "anthropic" and Settings.AI_PROMPT_CACHING_ENABLED:
+            system_message = SystemMessage(content=[{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"}
+            }])
+        return [
+            system_message,
+            HumanMessage(content=user_prompt)
+        ]
+
+    def _record_call(
+        self,
+        call_type: str,
+        started: float,
+        content_type: Optional[str] = None,
+        usage: Optional[Dict[str, Any]] = None,
+        ttft_ms: Optional[float] = None,
+        cache_hit: bool = False,
+        error: Optional[Exception] = None,
+        model: Optional[str] = None,
+        provider: Optional[str] = None,
+        images: int = 0
+    ):
+        """
+        Queue a telemetry record for a call
+
+        Args:
+            call_type: text, stream, vision or image
+            started: time.perf_counter() value taken before the call
+            content_type: Optional content type being generated
+            usage: LangChain-style usage dict (input_tokens, output_tokens, input_token_details)
+            ttft_ms: Time to first token for streamed calls
+            cache_hit: Whether the response came from the cache
+            error: Exception raised by the call, if it failed
+            model: Model actually called, defaults to this service's model
+            provider: Provider actually called, defaults to this service's provider
+            images: Number of images generated
+        """
+        latency_ms = (time.perf_counter() - started) * 1000
+        model = model or self.model
+        details = (usage or {}).get("input_token_details") or {}
+
+        if Settings.AI_HEDGING_ENABLED and not cache_hit and error is None and call_type in ("text", "stream"):
+            # Feeds the p95 thresholds used to decide when to hedge
+            if call_type == "stream":
+                get_latency_tracker().observe(model, "ttft", ttft_ms)
+            else:
+                get_latency_tracker().observe(model, "latency", latency_ms)
+
+        record_llm_call(
+            provider=provider or self.provider,
+            model=model,
+            call_type=call_type,
+            latency_ms=latency_ms,
+            project_id=self.project_id,
+            caller=self.caller,
+            content_type=content_type,
+            prompt_tokens=usage.get("input_tokens") if usage else None,
+            completion_tokens=usage.get("output_tokens") if usage else None,
+            cache_read_tokens=details.get("cache_read"),
+            cache_write_tokens=details.get("cache_creation"),
+            ttft_ms=ttft_ms,
+            cache_hit=cache_hit,
+            images=images,
+            error=error
+        )
+
+    def _cache_key(self, system_prompt: str, user_prompt: str) -> str:
+        """Build the response cache key for a text completion"""
+        return ResponseCache.make_key(self.model, self.temperature, self.max_tokens, system_prompt, user_prompt)
+
+    def analyze_image_with_vision(
+        self,
+        image: Union[bytes, memoryview, str],
+        prompt: str,
+        system_context: Optional[str] = None
+    ) -> str:
         """
         Analyze an image using GPT-4o vision model
 
+        The image is sent inline as a data URL, so nothing is written to disk.
+        With AI_VISION_PREPROCESS on, it is first downscaled, re-encoded and
+        given a detail level by services/image_processor.py.
+
         Args:
-            image_path: Path to the image file
+            image: Raw image bytes, or an already base64-encoded string (e.g. the
+                image_data column), which is sent without re-encoding
             prompt: Analysis prompt/question about the image
             system_context: Optional system context for the analysis
 
         Returns:
             AI analysis of the image
+
+        Raises:
+            AIRateLimitError: Provider still rate limiting after all retries
+            AIProviderError: Provider or network failure
         """
-        try:
-            # Read and encode image to base64
-            with open(image_path, 'rb') as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-
-            # Prepare messages
-            messages = []
-
-            # Add system context if provided
-            if system_context:
-                messages.append({"role": "system", "content": system_context})
-
-            # Add user message with image
-            messages.append({
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}",
-                            "detail": "high"
-                        }
+        image_url, detail, image_tokens = _vision_image(image)
+
+        # Prepare messages
+        messages = []
+
+        # Add system context if provided
+        if system_context:
+            messages.append({"role": "system", "content": system_context})
+
+        # Add user message with image
+        messages.append({
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_url,
+                        "detail": detail
                     }
-                ]
-            })
-
-            # Call vision model
-            response = self.client.chat.completions.create(
-                model="gpt-4.1",
-                messages=messages,
-                max_tokens=2000,
-                temperature=0.7
+                }
+            ]
+        })
+
+        # Call vision model
+        started = time.perf_counter()
+        try:
+            response = call_with_retry(
+                lambda: self.client.chat.completions.create(
+                    model="gpt-4.1",
+                    messages=messages,
+                    max_tokens=2000,
+                    temperature=0.7
+                ),
+                "openai",
+                "gpt-4.1",
+                estimate_tokens(system_context or "", prompt) + image_tokens,
+                usage_tokens=lambda r: r.usage.total_tokens if r.usage else None
             )
+        except AIServiceError as e:
+            self._record_call("vision", started, error=e, model="gpt-4.1", provider="openai")
+            raise
 
-            return response.choices[0].message.content
+        usage = None
+        if response.usage:
+            cached = getattr(response.usage.prompt_tokens_details, "cached_tokens", None)
+            usage = {
+                "input_tokens": response.usage.prompt_tokens,
+                "output_tokens": response.usage.completion_tokens,
+                "input_token_details": {"cache_read": cached}
+            }
+        self._record_call("vision", started, usage=usage, model="gpt-4.1", provider="openai")
 
-        except Exception as e:
-            return f"Error analyzing image: {str(e)}"
+        return response.choices[0].message.content
 
     def generate_image_with_dalle(self, prompt: str, size: str = "1024x1024", quality: str = "standard") -> Optional[str]:
         """
@@ -184,40 +939,50 @@ class AIService:
         Returns:
             URL of the generated image, or None if error
         """
+        started = time.perf_counter()
         try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size=size,
-                quality=quality,
-                n=1
+            response = call_with_retry(
+                lambda: self.client.images.generate(
+                    model="dall-e-3",
+                    prompt=prompt,
+                    size=size,
+                    quality=quality,
+                    n=1
+                ),
+                "openai",
+                "dall-e-3",
+                estimate_tokens(prompt)
             )
+            self._record_call("image", started, model="dall-e-3", provider="openai", images=1)
 
             return response.data[0].url
 
         except Exception as e:
+            self._record_call("image", started, model="dall-e-3", provider="openai", error=e)
             print(f"Error generating image: {str(e)}")
             return None
 
-    def generate_image_with_gpt4o(self, prompt: str, reference_image_path: Optional[str] = None) -> tuple[Optional[str], Optional[str]]:
+    def generate_image_with_gpt4o(
+        self,
+        prompt: str,
+        reference_image: Optional[Union[bytes, memoryview, str]] = None
+    ) -> Tuple[Optional[bytes], Optional[str]]:
         """
         Generate an image using GPT-4o image generation (gpt-image-1) with DALL-E 3 fallback
         For refinements, analyzes the reference image first to enhance prompt
 
         Args:
             prompt: Description of the image to generate or refinement instructions
-            reference_image_path: Optional path to reference image for refinement
+            reference_image: Optional reference image for refinement, as raw bytes
+                or a base64 string (see analyze_image_with_vision)
 
         Returns:
-            Tuple of (image_path, error_message). If successful, error_message is None.
-            If failed, image_path is None and error_message contains the error.
+            Tuple of (PNG image bytes, error_message). If successful, error_message is None.
+            If failed, the image bytes are None and error_message contains the error.
         """
-        from pathlib import Path
-        import requests
-
         # If there's a reference image, use GPT-4o vision to analyze it first
         enhanced_prompt = prompt
-        if reference_image_path:
+        if reference_image is not None:
             try:
                 # Use vision to understand the previous mockup
                 analysis_prompt = f"""Analyze this mockup image in detail. Describe the layout, visual style, colors, typography, and key UI elements.
@@ -228,44 +993,52 @@ Based on your analysis, suggest how to generate a refined version with these cha
 Maintain all other aspects of the design including layout structure, visual style, and elements not mentioned in the changes."""
 
                 analysis = self.analyze_image_with_vision(
-                    image_path=reference_image_path,
+                    image=reference_image,
                     prompt=analysis_prompt
                 )
 
-                # Use the analysis to create a more detailed generation prompt
-                enhanced_prompt = f"{prompt}\n\nPrevious design context: {analysis[:1500]}"
+                # Use the analysis to create a more detailed generation prompt. The
+                # instructions take priority; the context gets what's left of
+                # DALL-E's character limit.
+                context_label = "\n\nPrevious design context: "
+                builder = PromptBuilder(budget=DALLE_PROMPT_MAX_CHARS, reserved=len(context_label), unit="chars")
+                builder.add("instructions", prompt, priority=1)
+                builder.add("previous_design", analysis, priority=0)
+                sections = builder.fit()
+                builder.log_report("image.refine")
+                enhanced_prompt = f"{sections['instructions']}{context_label}{sections['previous_design']}"
             except Exception as e:
                 print(f"Warning: Could not analyze reference image: {str(e)}")
                 # Continue with original prompt if analysis fails
 
         # Use DALL-E 3 for image generation with base64 response (avoids network download issues)
+        started = time.perf_counter()
         try:
             print("Generating image with DALL-E 3...")
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=enhanced_prompt[:4000],  # DALL-E 3 has a 4000 char limit
-                size="1024x1024",
-                quality="standard",
-                n=1,
-                response_format="b64_json"  # Get base64 directly instead of URL
+            response = call_with_retry(
+                lambda: self.client.images.generate(
+                    model="dall-e-3",
+                    prompt=truncate_to_chars(enhanced_prompt, DALLE_PROMPT_MAX_CHARS),
+                    size="1024x1024",
+                    quality="standard",
+                    n=1,
+                    response_format="b64_json"  # Get base64 directly instead of URL
+                ),
+                "openai",
+                "dall-e-3",
+                estimate_tokens(enhanced_prompt)
             )
+            self._record_call("image", started, model="dall-e-3", provider="openai", images=1)
 
             # Get base64 image data directly (no network download needed)
-            image_b64 = response.data[0].b64_json
-            image_bytes = base64.b64decode(image_b64)
-
-            # Save to temporary file
-            temp_dir = Path("uploads/mockups/temp")
-            temp_dir.mkdir(parents=True, exist_ok=True)
-
-            temp_file = temp_dir / f"temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            with open(temp_file, 'wb') as f:
-                f.write(image_bytes)
+            image_bytes = base64.b64decode(response.data[0].b64_json)
 
             print(f"✅ Successfully generated image (received as base64)")
-            return str(temp_file), None
+            return image_bytes, None
 
         except Exception as dalle_error:
+            if isinstance(dalle_error, AIServiceError):
+                self._record_call("image", started, model="dall-e-3", provider="openai", error=dalle_error)
             dalle_error_msg = str(dalle_error)
             print(f"❌ DALL-E 3 failed: {dalle_error_msg}")
             import traceback
@@ -0,0 +1,59 @@
+"""
+Background Event Loop
+One long-lived asyncio loop on a daemon thread. Async AI clients are bound to
+the loop they first run on, so running every coroutine here lets them keep
+their connection pools (and concurrency limits) across Streamlit reruns.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Coroutine, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the shared background event loop, starting it on first use
+
+    Returns:
+        Running asyncio event loop
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="ai-event-loop", daemon=True)
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def submit_async(coro: Coroutine) -> concurrent.futures.Future:
+    """
+    Schedule a coroutine on the background loop without waiting for it
+
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        concurrent.futures.Future resolving to the coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run_async(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the background loop and block until it finishes
+
+    Args:
+        coro: Coroutine to run
+        timeout: Optional timeout in seconds
+
+    Returns:
+        The coroutine's result
+    """
+    return submit_async(coro).result(timeout=timeout)
@@ -0,0 +1,300 @@
+"""
+Blob Store
+Content-addressed storage for sketch and mockup images. Each blob is keyed by
+the SHA-256 of its bytes, so identical uploads are stored once and rows only
+keep the hash plus metadata (image_sha256, image_size, image_mime_type,
+image_width, image_height). Blobs live in a directory sharded by hash
+(BLOB_STORE=filesystem, read through mmap) or in the image_blobs table
+(BLOB_STORE=database). Derived copies of a blob (see services/image_variants.py)
+are stored next to it under the original's hash and a variant name.
+"""
+
+import base64
+import hashlib
+import mmap
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+from sqlalchemy.exc import IntegrityError
+
+from config.settings import Settings
+from database.models import ImageBlob, ImageBlobVariant
+from services.image_processor import image_metadata
+
+
+class BlobStore(ABC):
+    """Interface for content-addressed, immutable blob storage"""
+
+    @abstractmethod
+    def put(self, data: Union[bytes, memoryview]) -> str:
+        """
+        Store bytes (a no-op when the same content is already stored)
+
+        Args:
+            data: Blob content
+
+        Returns:
+            SHA-256 hex digest identifying the blob
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, digest: str) -> Optional[bytes]:
+        """
+        Read a blob
+
+        Args:
+            digest: SHA-256 hex digest returned by put
+
+        Returns:
+            Blob content, or None if it is not stored
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        """Whether a blob is stored"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_variant(self, digest: str, variant: str, data: Union[bytes, memoryview]):
+        """
+        Store a derived copy of a blob, replacing any previous one
+
+        Args:
+            digest: SHA-256 hex digest of the original blob
+            variant: Variant name (e.g. "thumb")
+            data: Variant content
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_variant(self, digest: str, variant: str) -> Optional[bytes]:
+        """
+        Read a derived copy of a blob
+
+        Args:
+            digest: SHA-256 hex digest of the original blob
+            variant: Variant name
+
+        Returns:
+            Variant content, or None if it has not been created
+        """
+        raise NotImplementedError
+
+
+class FileBlobStore(BlobStore):
+    """Blobs as files under root/ab/cd/<digest>"""
+
+    def __init__(self, root: Union[str, Path]):
+        """
+        Initialize the store
+
+        Args:
+            root: Directory holding the blobs
+        """
+        self.root = Path(root)
+
+    def path(self, digest: str) -> Path:
+        """File holding a blob (two levels of 256-way sharding)"""
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def variant_path(self, digest: str, variant: str) -> Path:
+        """File holding a derived copy, next to the original"""
+        return self.path(digest).with_name(f"{digest}.{variant}")
+
+    def put(self, data: Union[bytes, memoryview]) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            self._write(path, data)
+        return digest
+
+    def view(self, digest: str) -> Optional[memoryview]:
+        """
+        Memory-mapped, read-only view of a blob
+
+        Pages are loaded lazily from the OS page cache instead of being
+        copied into the process.
+
+        Args:
+            digest: SHA-256 hex digest
+
+        Returns:
+            memoryview over the mapped file, or None if it is not stored
+        """
+        try:
+            with open(self.path(digest), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return memoryview(b"")
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            return None
+
+    def get(self, digest: str) -> Optional[bytes]:
+        view = self.view(digest)
+        return bytes(view) if view is not None else None
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def put_variant(self, digest: str, variant: str, data: Union[bytes, memoryview]):
+        self._write(self.variant_path(digest, variant), data)
+
+    def get_variant(self, digest: str, variant: str) -> Optional[bytes]:
+        try:
+            return self.variant_path(digest, variant).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: Path, data: Union[bytes, memoryview]):
+        """Write to a temporary name and rename, so readers never see a partial file"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+
+class DatabaseBlobStore(BlobStore):
+    """Blobs as rows of the image_blobs table"""
+
+    def __init__(self, session_factory: Optional[Callable] = None):
+        """
+        Initialize the store
+
+        Args:
+            session_factory: Callable returning a SQLAlchemy session. Defaults
+                to config.database.SessionLocal.
+        """
+        if session_factory is None:
+            from config.database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+
+    def put(self, data: Union[bytes, memoryview]) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        db = self._session_factory()
+        try:
+            if db.get(ImageBlob, digest) is None:
+                db.add(ImageBlob(sha256=digest, data=bytes(data), size=len(data)))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()  # Stored concurrently by another caller
+        finally:
+            db.close()
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        db = self._session_factory()
+        try:
+            data = db.query(ImageBlob.data).filter(ImageBlob.sha256 == digest).scalar()
+            return bytes(data) if data is not None else None
+        finally:
+            db.close()
+
+    def exists(self, digest: str) -> bool:
+        db = self._session_factory()
+        try:
+            return db.query(ImageBlob.sha256).filter(ImageBlob.sha256 == digest).first() is not None
+        finally:
+            db.close()
+
+    def put_variant(self, digest: str, variant: str, data: Union[bytes, memoryview]):
+        db = self._session_factory()
+        try:
+            db.merge(ImageBlobVariant(sha256=digest, variant=variant, data=bytes(data), size=len(data)))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # Created concurrently by another caller
+        finally:
+            db.close()
+
+    def get_variant(self, digest: str, variant: str) -> Optional[bytes]:
+        db = self._session_factory()
+        try:
+            data = db.query(ImageBlobVariant.data).filter(
+                ImageBlobVariant.sha256 == digest,
+                ImageBlobVariant.variant == variant
+            ).scalar()
+            return bytes(data) if data is not None else None
+        finally:
+            db.close()
+
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """
+    Get the process-wide blob store selected by Settings.BLOB_STORE
+
+    Returns:
+        Shared BlobStore
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if Settings.BLOB_STORE == "database":
+                    _store = DatabaseBlobStore()
+                else:
+                    _store = FileBlobStore(Settings.BLOB_DIR)
+    return _store
+
+
+def store_image(data: Union[bytes, memoryview], store: Optional[BlobStore] = None) -> Dict[str, Union[str, int, None]]:
+    """
+    Put an image in the blob store
+
+    Args:
+        data: Raw image bytes
+        store: Blob store, defaults to get_blob_store()
+
+    Returns:
+        Column values for a SketchIteration / MockupIteration row (image_sha256,
+        image_size, image_mime_type, image_width, image_height)
+    """
+    store = store or get_blob_store()
+    mime_type, width, height = image_metadata(data)
+    return {
+        "image_sha256": store.put(data),
+        "image_size": len(data),
+        "image_mime_type": mime_type,
+        "image_width": width,
+        "image_height": height,
+    }
+
+
+def load_image(item, store: Optional[BlobStore] = None) -> Optional[bytes]:
+    """
+    Image bytes of a SketchIteration / MockupIteration
+
+    Rows not yet moved to the blob store are decoded from their legacy
+    Base64 image_data column.
+
+    Args:
+        item: Row with image_sha256 / image_data columns
+        store: Blob store, defaults to get_blob_store()
+
+    Returns:
+        Image bytes, or None if the row has no (readable) image
+    """
+    if item.image_sha256:
+        data = (store or get_blob_store()).get(item.image_sha256)
+        if data is not None:
+            return data
+        print(f"Warning: image blob {item.image_sha256[:12]} is missing from the blob store")
+    if item.image_data:
+        try:
+            return base64.b64decode(item.image_data)
+        except Exception as e:
+            print(f"Error decoding Base64 image: {e}")
+    return None
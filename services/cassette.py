@@ -0,0 +1,326 @@
+"""
+Record/Replay Cassettes
+Records chat completions to a JSONL file and serves them back later, keyed by
+a hash of the prompt. Replays can reproduce the recorded time to first token
+and latency, so a performance regression seen with real providers can be
+re-run exactly on a machine with no network or API keys.
+
+AI_CASSETTE_MODE=record wraps the real chat model; AI_CASSETTE_MODE=replay
+serves every chat call from AI_CASSETTE_PATH.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from config.settings import Settings
+from services.fake_llm import prompt_text, split_tokens
+
+
+class CassetteMiss(LookupError):
+    """Replay mode found no recording for a prompt"""
+
+
+def prompt_key(messages: List[BaseMessage]) -> str:
+    """
+    Cassette key for a list of messages
+
+    Only message roles and text are hashed, so provider-specific wrapping
+    (e.g. Anthropic cache_control blocks) does not change the key.
+
+    Args:
+        messages: LangChain messages
+
+    Returns:
+        SHA-256 hex digest
+    """
+    payload = json.dumps([[message.type, prompt_text([message])] for message in messages], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    A JSONL file of recorded request -> response pairs
+
+    Each line holds key, model, response, usage, ttft_ms and latency_ms.
+    When a prompt was recorded several times, replays return the
+    recordings in order and then repeat the last one.
+    """
+
+    def __init__(self, path: str):
+        """
+        Load a cassette (a missing file is an empty cassette)
+
+        Args:
+            path: Path to the JSONL file
+        """
+        self.path = Path(path)
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def record(self, key: str, model: str, response: str, usage: Optional[Dict[str, Any]],
+               ttft_ms: Optional[float], latency_ms: float):
+        """
+        Append a recording
+
+        Args:
+            key: prompt_key of the request
+            model: Model that produced the response
+            response: Response text
+            usage: LangChain usage metadata
+            ttft_ms: Time to first token, for streamed calls
+            latency_ms: Total call time
+        """
+        entry = {
+            "key": key,
+            "model": model,
+            "response": response,
+            "usage": dict(usage) if usage else None,
+            "ttft_ms": ttft_ms,
+            "latency_ms": latency_ms
+        }
+        with self._lock:
+            self._entries.setdefault(key, []).append(entry)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def lookup(self, key: str) -> Dict[str, Any]:
+        """
+        Next recording for a key
+
+        Args:
+            key: prompt_key of the request
+
+        Returns:
+            Recorded entry
+
+        Raises:
+            CassetteMiss: If the prompt was never recorded
+        """
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recording for prompt {key[:12]} in {self.path}")
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+            return entries[min(index, len(entries) - 1)]
+
+
+class RecordingChatModel(BaseChatModel):
+    """Chat model wrapper that records every completion to a cassette"""
+
+    inner: BaseChatModel
+    cassette: Any
+    model_name: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-record"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        started = time.perf_counter()
+        message = self.inner.invoke(messages, stop=stop, **kwargs)
+        self.cassette.record(prompt_key(messages), self.model_name, message.content, message.usage_metadata,
+                             None, (time.perf_counter() - started) * 1000)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        started = time.perf_counter()
+        message = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+        self.cassette.record(prompt_key(messages), self.model_name, message.content, message.usage_metadata,
+                             None, (time.perf_counter() - started) * 1000)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        started = time.perf_counter()
+        ttft_ms = None
+        full = None
+        for chunk in self.inner.stream(messages, stop=stop, **kwargs):
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            full = chunk if full is None else full + chunk
+            yield ChatGenerationChunk(message=chunk)
+        if full is not None:
+            self.cassette.record(prompt_key(messages), self.model_name, full.text, full.usage_metadata,
+                                 ttft_ms, (time.perf_counter() - started) * 1000)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        started = time.perf_counter()
+        ttft_ms = None
+        full = None
+        async for chunk in self.inner.astream(messages, stop=stop, **kwargs):
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            full = chunk if full is None else full + chunk
+            yield ChatGenerationChunk(message=chunk)
+        if full is not None:
+            self.cassette.record(prompt_key(messages), self.model_name, full.text, full.usage_metadata,
+                                 ttft_ms, (time.perf_counter() - started) * 1000)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that answers from a cassette, optionally with the recorded timing"""
+
+    cassette: Any
+    model_name: str
+    replay_timing: bool = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-replay"
+
+    def _delays(self, entry: Dict[str, Any], chunks: int):
+        """(first-token delay, per-chunk delay) in seconds for an entry"""
+        if not self.replay_timing:
+            return 0.0, 0.0
+        latency = (entry.get("latency_ms") or 0) / 1000.0
+        ttft = (entry.get("ttft_ms") if entry.get("ttft_ms") is not None else entry.get("latency_ms") or 0) / 1000.0
+        return ttft, max(0.0, latency - ttft) / max(1, chunks - 1)
+
+    def _message(self, entry: Dict[str, Any]) -> AIMessage:
+        return AIMessage(content=entry["response"], usage_metadata=entry.get("usage"),
+                         response_metadata={"model_name": entry.get("model"), "replayed": True})
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        entry = self.cassette.lookup(prompt_key(messages))
+        if self.replay_timing:
+            time.sleep((entry.get("latency_ms") or 0) / 1000.0)
+        return ChatResult(generations=[ChatGeneration(message=self._message(entry))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        entry = self.cassette.lookup(prompt_key(messages))
+        if self.replay_timing:
+            await asyncio.sleep((entry.get("latency_ms") or 0) / 1000.0)
+        return ChatResult(generations=[ChatGeneration(message=self._message(entry))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        entry = self.cassette.lookup(prompt_key(messages))
+        chunks = split_tokens(entry["response"])
+        first_delay, chunk_delay = self._delays(entry, len(chunks))
+        time.sleep(first_delay)
+        for index, token in enumerate(chunks):
+            if index:
+                time.sleep(chunk_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=entry.get("usage")))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        entry = self.cassette.lookup(prompt_key(messages))
+        chunks = split_tokens(entry["response"])
+        first_delay, chunk_delay = self._delays(entry, len(chunks))
+        await asyncio.sleep(first_delay)
+        for index, token in enumerate(chunks):
+            if index:
+                await asyncio.sleep(chunk_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=entry.get("usage")))
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: Optional[str] = None) -> Cassette:
+    """
+    Get the shared cassette for a path
+
+    Args:
+        path: JSONL path, defaults to Settings.AI_CASSETTE_PATH
+
+    Returns:
+        Shared Cassette
+    """
+    path = path or Settings.AI_CASSETTE_PATH
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = Cassette(path)
+            _cassettes[path] = cassette
+        return cassette
+
+
+def wrap_chat_model(model: str, llm: Optional[BaseChatModel]) -> Optional[BaseChatModel]:
+    """
+    Apply Settings.AI_CASSETTE_MODE to a chat model
+
+    Args:
+        model: Model name
+        llm: Real chat model (unused in replay mode, may be None there)
+
+    Returns:
+        Recording wrapper, replay model, or llm unchanged when cassettes are off
+    """
+    if Settings.AI_CASSETTE_MODE == "replay":
+        return ReplayChatModel(cassette=get_cassette(), model_name=model,
+                               replay_timing=Settings.AI_CASSETTE_REPLAY_TIMING)
+    if Settings.AI_CASSETTE_MODE == "record":
+        return RecordingChatModel(inner=llm, cassette=get_cassette(), model_name=model)
+    return llm
@@ -0,0 +1,302 @@
+"""
+Fake LLM Provider
+Deterministic offline stand-in for the real providers, selected with a "fake"
+model name (e.g. "fake", "fake-fast", "fake-slow"). Responses are canned for
+JSON-producing prompts (roadmap, tasks) and otherwise synthesized from a hash
+of the prompt, so the same prompt always gives the same text. Latency follows
+a profile (time to first token + token rate) so benchmarks and load tests
+behave like a real provider without network access or API keys.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from config.settings import Settings
+
+# Latency profiles by model name: time to first token, output rate and response length
+FAKE_PROFILES = {
+    "fake": {"ttft_ms": 400, "tokens_per_second": 60, "response_tokens": 300},
+    "fake-fast": {"ttft_ms": 0, "tokens_per_second": 0, "response_tokens": 120},  # 0 = no delay
+    "fake-slow": {"ttft_ms": 2500, "tokens_per_second": 25, "response_tokens": 600},
+}
+
+CANNED_ROADMAP = {
+    "phases": [
+        {
+            "name": "Phase 1: Foundation",
+            "duration_weeks": 4,
+            "team_allocation": 3,
+            "must_have": ["User accounts", "Core workflow"],
+            "should_have": ["Onboarding"],
+            "could_have": ["Dark mode"],
+            "wont_have": ["Offline sync"],
+            "dependencies": []
+        },
+        {
+            "name": "Phase 2: Polish",
+            "duration_weeks": 4,
+            "team_allocation": 3,
+            "must_have": ["Usability fixes from testing"],
+            "should_have": ["Notifications"],
+            "could_have": [],
+            "wont_have": [],
+            "dependencies": ["Phase 1: Foundation"]
+        }
+    ]
+}
+
+CANNED_TASKS = {
+    "tasks": [
+        {
+            "title": "Set up project skeleton",
+            "description": "Create the repository, CI pipeline and base application.",
+            "priority": "high",
+            "story_points": 3,
+            "estimated_hours": 8,
+            "skills_required": "DevOps",
+            "acceptance_criteria": ["CI runs on every push"],
+            "dependencies": [],
+            "moscow_category": "must"
+        },
+        {
+            "title": "Implement core workflow",
+            "description": "Build the main user journey end to end.",
+            "priority": "high",
+            "story_points": 8,
+            "estimated_hours": 24,
+            "skills_required": "Frontend, Backend",
+            "acceptance_criteria": ["A user can complete the journey"],
+            "dependencies": ["Set up project skeleton"],
+            "moscow_category": "must"
+        }
+    ]
+}
+
+WORDS = (
+    "users need clear feedback when they complete key tasks insight pain point goal journey "
+    "persona motivation frustration opportunity design prototype test iterate evidence research "
+    "interview theme pattern behaviour context stakeholder value simple fast trust"
+).split()
+
+
+def get_profile(model: str) -> Dict[str, float]:
+    """
+    Latency profile for a fake model name
+
+    Unknown "fake-*" names use the "fake" profile.
+
+    Args:
+        model: Model name
+
+    Returns:
+        Dictionary with ttft_ms, tokens_per_second and response_tokens
+    """
+    return dict(FAKE_PROFILES.get(model, FAKE_PROFILES["fake"]))
+
+
+def prompt_text(messages: List[BaseMessage]) -> str:
+    """Concatenate message texts (including list-style content blocks)"""
+    parts = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, list):
+            content = "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def fake_response(prompt: str, response_tokens: int) -> str:
+    """
+    Deterministic response for a prompt
+
+    Args:
+        prompt: Full prompt text
+        response_tokens: Approximate length of synthesized text in words
+
+    Returns:
+        Canned JSON for roadmap / task prompts, otherwise synthesized markdown
+    """
+    # Task prompts embed the roadmap JSON, so check for them first
+    if '"tasks"' in prompt and "JSON" in prompt:
+        return json.dumps(CANNED_TASKS, indent=2)
+    if '"phases"' in prompt and "JSON" in prompt:
+        return json.dumps(CANNED_ROADMAP, indent=2)
+
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    lines = ["## Summary", ""]
+    words_left = response_tokens
+    while words_left > 0:
+        length = min(words_left, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        lines.append(f"- {sentence.capitalize()}.")
+        words_left -= length
+    return "\n".join(lines)
+
+
+def split_tokens(text: str) -> List[str]:
+    """Split text into word-sized stream chunks that join back to the original"""
+    chunks = []
+    start = 0
+    for index, char in enumerate(text):
+        if char in " \n" and index > start:
+            chunks.append(text[start:index])
+            start = index
+    chunks.append(text[start:])
+    return [chunk for chunk in chunks if chunk]
+
+
+class FakeChatModel(BaseChatModel):
+    """LangChain chat model returning deterministic responses with simulated latency"""
+
+    model_name: str = "fake"
+    ttft_ms: float = 400
+    tokens_per_second: float = 60
+    response_tokens: int = 300
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _respond(self, messages: List[BaseMessage]):
+        """Response text, its stream chunks and usage"""
+        prompt = prompt_text(messages)
+        text = fake_response(prompt, self.response_tokens)
+        chunks = split_tokens(text)
+        usage = {
+            "input_tokens": len(prompt) // 4 + 1,
+            "output_tokens": len(chunks),
+            "total_tokens": len(prompt) // 4 + 1 + len(chunks)
+        }
+        return text, chunks, usage
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        text, chunks, usage = self._respond(messages)
+        time.sleep(self.ttft_ms / 1000.0 + self._token_delay() * len(chunks))
+        message = AIMessage(content=text, usage_metadata=usage, response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        text, chunks, usage = self._respond(messages)
+        await asyncio.sleep(self.ttft_ms / 1000.0 + self._token_delay() * len(chunks))
+        message = AIMessage(content=text, usage_metadata=usage, response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        _, chunks, usage = self._respond(messages)
+        time.sleep(self.ttft_ms / 1000.0)
+        for index, token in enumerate(chunks):
+            if index:
+                time.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        _, chunks, usage = self._respond(messages)
+        await asyncio.sleep(self.ttft_ms / 1000.0)
+        for index, token in enumerate(chunks):
+            if index:
+                await asyncio.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+
+def build_fake_chat_model(model: str) -> FakeChatModel:
+    """
+    Create a fake chat model for a "fake*" model name
+
+    Settings.AI_FAKE_TTFT_MS / AI_FAKE_TOKENS_PER_SECOND override the profile
+    when set.
+
+    Args:
+        model: Model name
+
+    Returns:
+        FakeChatModel
+    """
+    profile = get_profile(model)
+    if Settings.AI_FAKE_TTFT_MS is not None:
+        profile["ttft_ms"] = Settings.AI_FAKE_TTFT_MS
+    if Settings.AI_FAKE_TOKENS_PER_SECOND is not None:
+        profile["tokens_per_second"] = Settings.AI_FAKE_TOKENS_PER_SECOND
+    return FakeChatModel(model_name=model, **profile)
+
+
+class FakeOpenAIClient:
+    """
+    Minimal stand-in for the OpenAI SDK client used for vision and images
+
+    Supports chat.completions.create and images.generate with the same
+    response shapes AIService reads.
+    """
+
+    def __init__(self, model: str = "fake"):
+        self.profile = get_profile(model)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+        self.images = SimpleNamespace(generate=self._generate_image)
+
+    def _create_completion(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> SimpleNamespace:
+        prompt = json.dumps(messages, sort_keys=True, default=str)
+        text = fake_response(prompt, self.profile["response_tokens"])
+        time.sleep(self.profile["ttft_ms"] / 1000.0)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=SimpleNamespace(
+                prompt_tokens=len(prompt) // 4 + 1,
+                completion_tokens=len(text.split()),
+                total_tokens=len(prompt) // 4 + 1 + len(text.split()),
+                prompt_tokens_details=SimpleNamespace(cached_tokens=0)
+            )
+        )
+
+    def _generate_image(self, prompt: str, size: str = "1024x1024", **kwargs) -> SimpleNamespace:
+        from PIL import Image
+
+        width, height = (int(value) for value in size.split("x"))
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        buffer = BytesIO()
+        Image.new("RGB", (width, height), tuple(digest[:3])).save(buffer, format="PNG")
+        time.sleep(self.profile["ttft_ms"] / 1000.0)
+        return SimpleNamespace(data=[SimpleNamespace(
+            b64_json=base64.b64encode(buffer.getvalue()).decode("ascii"),
+            url=None
+        )])
@@ -0,0 +1,202 @@
+"""
+Request Hedging
+Tracks recent first-token latency per model and races a slow primary request
+against a secondary model. The secondary is only started once the primary has
+been waiting longer than its recent p95 (or has failed), so in the common
+case only one request is sent. Non-streamed calls are only hedged once
+enough full-response latencies are known.
+"""
+
+import asyncio
+import math
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from config.settings import Settings
+
+
+class LatencyTracker:
+    """Rolling window of first-token latencies per (model, kind)"""
+
+    def __init__(self, window: int = 200, session_factory: Optional[Callable] = None):
+        """
+        Initialize tracker
+
+        Args:
+            window: Samples kept per (model, kind)
+            session_factory: Callable returning a SQLAlchemy session, used to
+                seed the window from llm_call_logs. Defaults to config.database.SessionLocal.
+        """
+        self.window = window
+        if session_factory is None:
+            from config.database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, kind: str, milliseconds: float):
+        """
+        Add a sample
+
+        Args:
+            model: Model name
+            kind: "ttft" for streamed calls, "latency" for whole responses
+            milliseconds: Time until the first token (or full response)
+        """
+        with self._lock:
+            samples = self._samples.get((model, kind))
+            if samples is None:
+                samples = self._load(model, kind)
+            samples.append(milliseconds)
+
+    def percentile(self, model: str, kind: str, pct: float) -> Tuple[Optional[float], int]:
+        """
+        Nearest-rank percentile of recent samples
+
+        Returns:
+            Tuple of (percentile in ms or None, number of samples)
+        """
+        with self._lock:
+            samples = self._samples.get((model, kind))
+            if samples is None:
+                samples = self._load(model, kind)
+            ordered = sorted(samples)
+        if not ordered:
+            return None, 0
+        rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+        return ordered[rank], len(ordered)
+
+    def _load(self, model: str, kind: str) -> Deque[float]:
+        """Create the window for a key, seeded from recent llm_call_logs rows (caller holds the lock)"""
+        samples: Deque[float] = deque(maxlen=self.window)
+        self._samples[(model, kind)] = samples
+
+        from database.models import LLMCallLog
+        db = self._session_factory()
+        if db is None:
+            return samples
+        try:
+            column = LLMCallLog.ttft_ms if kind == "ttft" else LLMCallLog.latency_ms
+            rows = db.query(column).filter(
+                LLMCallLog.model == model,
+                LLMCallLog.call_type == ("stream" if kind == "ttft" else "text"),
+                LLMCallLog.cache_hit == False,  # noqa: E712
+                LLMCallLog.error_type.is_(None),
+                column.isnot(None)
+            ).order_by(LLMCallLog.created_at.desc()).limit(self.window).all()
+            samples.extend(value for (value,) in reversed(rows))
+        except Exception as e:
+            print(f"Warning: could not load latency history for {model}: {str(e)}")
+        finally:
+            db.close()
+        return samples
+
+
+_tracker: Optional[LatencyTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """
+    Get the process-wide latency tracker
+
+    Returns:
+        Shared LatencyTracker
+    """
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = LatencyTracker()
+    return _tracker
+
+
+def get_hedge_delay(model: str, kind: str) -> Optional[float]:
+    """
+    Seconds to wait for the primary before starting the secondary
+
+    For "ttft" the model's recent p95 (AI_HEDGE_PERCENTILE) clamped to
+    [AI_HEDGE_MIN_DELAY_SECONDS, AI_HEDGE_MAX_DELAY_SECONDS], or
+    AI_HEDGE_MAX_DELAY_SECONDS until AI_HEDGE_MIN_SAMPLES samples exist.
+
+    Full responses take far longer than a first token, so for "latency" the
+    p95 is not capped (only raised to AI_HEDGE_MIN_DELAY_SECONDS) and there
+    is no default: the call is not hedged until enough samples exist.
+
+    Args:
+        model: Primary model name
+        kind: "ttft" or "latency"
+
+    Returns:
+        Delay in seconds, or None to not hedge
+    """
+    p95_ms, samples = get_latency_tracker().percentile(model, kind, Settings.AI_HEDGE_PERCENTILE)
+    if p95_ms is None or samples < Settings.AI_HEDGE_MIN_SAMPLES:
+        return Settings.AI_HEDGE_MAX_DELAY_SECONDS if kind == "ttft" else None
+    delay = max(Settings.AI_HEDGE_MIN_DELAY_SECONDS, p95_ms / 1000.0)
+    if kind == "ttft":
+        delay = min(Settings.AI_HEDGE_MAX_DELAY_SECONDS, delay)
+    return delay
+
+
+async def hedged_race(
+    primary: Callable[[], Awaitable[Any]],
+    secondary: Optional[Callable[[], Awaitable[Any]]],
+    delay: float,
+    discard: Optional[Callable[[Any], Awaitable[None]]] = None
+) -> Tuple[Any, int]:
+    """
+    Run primary, starting secondary if primary is slower than delay or fails
+
+    The first successful result wins and the other request is cancelled.
+
+    Args:
+        primary: Factory for the primary coroutine
+        secondary: Factory for the secondary coroutine (None disables hedging)
+        delay: Seconds to wait for primary before starting secondary
+        discard: Optional cleanup for a result that finished but lost the race
+            (e.g. closing an open stream)
+
+    Returns:
+        Tuple of (result, 0 for primary / 1 for secondary)
+
+    Raises:
+        The primary's exception if both fail
+    """
+    primary_task = asyncio.ensure_future(primary())
+    if secondary is None:
+        return await primary_task, 0
+
+    tasks = {primary_task: 0}
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done and primary_task.exception() is None:
+            return primary_task.result(), 0
+
+        # Primary is slow or failed: send the request to the secondary as well
+        tasks[asyncio.ensure_future(secondary())] = 1
+        errors: Dict[int, BaseException] = {}
+        pending = {task for task in tasks if not task.done()}
+        if primary_task.done():
+            errors[0] = primary_task.exception()
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = None
+            for task in done:
+                if task.exception() is not None:
+                    errors[tasks[task]] = task.exception()
+                elif winner is None:
+                    winner = task
+                elif discard is not None:
+                    await discard(task.result())
+            if winner is not None:
+                return winner.result(), tasks[winner]
+
+        raise errors.get(0) or errors[1]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
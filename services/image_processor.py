@@ -0,0 +1,195 @@
+"""
+Image Processor
+Prepares images for vision calls. Uploads are downscaled to the resolution the
+vision model actually uses, re-encoded as compact JPEG/WebP without metadata,
+and sent with a detail level matched to their size.
+"""
+
+import base64
+import math
+from io import BytesIO
+from typing import Optional, Tuple, Union
+
+from PIL import Image, ImageOps
+
+from config.settings import Settings
+
+# OpenAI high-detail vision: the image is fit within 2048x2048, then scaled so
+# the short side is at most 768, and billed per 512px tile
+VISION_MAX_SIDE = 2048
+VISION_SHORT_SIDE = 768
+VISION_TILE_SIZE = 512
+VISION_BASE_TOKENS = 85
+VISION_TILE_TOKENS = 170
+
+# Low detail always sees a 512x512 image for a flat VISION_BASE_TOKENS
+VISION_LOW_DETAIL_SIDE = 512
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+
+
+def vision_dimensions(width: int, height: int, detail: str = "high") -> Tuple[int, int]:
+    """
+    Size the vision model scales an image to (never larger than the original)
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        detail: "high" or "low"
+
+    Returns:
+        Tuple of (width, height)
+    """
+    if detail == "low":
+        scale = min(1.0, VISION_LOW_DETAIL_SIDE / max(width, height))
+    else:
+        scale = min(1.0, VISION_MAX_SIDE / max(width, height))
+        short_side = min(width, height) * scale
+        if short_side > VISION_SHORT_SIDE:
+            scale *= VISION_SHORT_SIDE / short_side
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def estimate_vision_tokens(width: int, height: int, detail: str = "high") -> int:
+    """
+    Estimate the prompt tokens an image costs
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        detail: "high" or "low"
+
+    Returns:
+        Estimated tokens
+    """
+    if detail == "low":
+        return VISION_BASE_TOKENS
+    scaled_width, scaled_height = vision_dimensions(width, height, detail)
+    tiles = math.ceil(scaled_width / VISION_TILE_SIZE) * math.ceil(scaled_height / VISION_TILE_SIZE)
+    return VISION_BASE_TOKENS + VISION_TILE_TOKENS * tiles
+
+
+def choose_detail(width: int, height: int) -> str:
+    """
+    Pick the vision detail level for an image
+
+    Settings.AI_VISION_DETAIL forces "low" or "high"; with "auto", images that
+    already fit the low-detail resolution use it, since high detail would add
+    tile tokens without adding information.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        "low" or "high"
+    """
+    if Settings.AI_VISION_DETAIL in ("low", "high"):
+        return Settings.AI_VISION_DETAIL
+    return "low" if max(width, height) <= VISION_LOW_DETAIL_SIDE else "high"
+
+
+def prepare_for_vision(image: Union[bytes, memoryview, str]) -> Tuple[bytes, str, str, int]:
+    """
+    Downscale and re-encode an image for a vision call
+
+    Applies the EXIF orientation (phone photos), resizes to the size the model
+    would scale to anyway, flattens transparency and re-encodes as
+    Settings.AI_VISION_FORMAT without EXIF or other metadata.
+
+    Args:
+        image: Raw image bytes, or a base64-encoded string
+
+    Returns:
+        Tuple of (encoded bytes, MIME type, detail level, estimated tokens)
+
+    Raises:
+        PIL.UnidentifiedImageError: If the data is not a readable image
+    """
+    data = base64.b64decode(image) if isinstance(image, str) else bytes(image)
+
+    with Image.open(BytesIO(data)) as original:
+        original_size = original.size
+        picture = ImageOps.exif_transpose(original)
+
+        detail = choose_detail(*picture.size)
+        target = vision_dimensions(*picture.size, detail=detail)
+        if target != picture.size:
+            picture = picture.resize(target, Image.LANCZOS)
+
+        if picture.mode in ("RGBA", "LA") or (picture.mode == "P" and "transparency" in picture.info):
+            # JPEG has no alpha; sketches on transparent canvases should stay legible
+            rgba = picture.convert("RGBA")
+            picture = Image.new("RGB", rgba.size, (255, 255, 255))
+            picture.paste(rgba, mask=rgba.split()[-1])
+        elif picture.mode != "RGB":
+            picture = picture.convert("RGB")
+
+        image_format = Settings.AI_VISION_FORMAT.upper()
+        output = BytesIO()
+        picture.save(output, format=image_format, quality=Settings.AI_VISION_QUALITY, optimize=True)
+        encoded = output.getvalue()
+
+    tokens = estimate_vision_tokens(*target, detail=detail)
+    original_tokens = estimate_vision_tokens(*original_size)
+    print(
+        f"Vision image: {original_size[0]}x{original_size[1]} {len(data) / 1024:.0f}KB -> "
+        f"{target[0]}x{target[1]} {len(encoded) / 1024:.0f}KB {image_format}, detail={detail}, "
+        f"~{tokens} tokens (saved {len(data) - len(encoded)} bytes, {original_tokens - tokens} tokens)"
+    )
+    return encoded, MIME_TYPES.get(image_format, "image/jpeg"), detail, tokens
+
+
+def image_metadata(data: Union[bytes, memoryview]) -> Tuple[str, Optional[int], Optional[int]]:
+    """
+    MIME type and dimensions of an image, without decoding its pixels
+
+    Args:
+        data: Raw image bytes
+
+    Returns:
+        Tuple of (MIME type, width, height); width and height are None and the
+        type is application/octet-stream when the data is not a readable image
+    """
+    try:
+        with Image.open(BytesIO(bytes(data))) as picture:
+            return MIME_TYPES.get(picture.format, "application/octet-stream"), picture.width, picture.height
+    except Exception:
+        return "application/octet-stream", None, None
+
+
+def make_webp_variant(data: Union[bytes, memoryview], max_side: int, quality: int = 80) -> bytes:
+    """
+    Downscaled WebP copy of an image for display
+
+    Applies the EXIF orientation, fits the image within max_side x max_side
+    (never upscaling) and keeps transparency.
+
+    Args:
+        data: Raw image bytes
+        max_side: Longest side of the result in pixels
+        quality: WebP quality (0-100)
+
+    Returns:
+        WebP bytes
+
+    Raises:
+        PIL.UnidentifiedImageError: If the data is not a readable image
+    """
+    with Image.open(BytesIO(bytes(data))) as original:
+        picture = ImageOps.exif_transpose(original)
+        picture.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        if picture.mode in ("RGBA", "LA") or (picture.mode == "P" and "transparency" in picture.info):
+            picture = picture.convert("RGBA")
+        elif picture.mode != "RGB":
+            picture = picture.convert("RGB")
+
+        output = BytesIO()
+        picture.save(output, format="WEBP", quality=quality, method=4)
+        return output.getvalue()
@@ -0,0 +1,126 @@
+"""
+Image Variants
+Precomputed WebP copies of sketch and mockup images. After an image is
+stored, a background worker derives a small thumbnail for the history strips
+and a display-size copy for the current/final view and stores them next to
+the original in the blob store. Pages read a variant and fall back to the
+original (queueing the missing variants) until it exists.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+from config.settings import Settings
+from services.blob_store import BlobStore, get_blob_store, load_image
+from services.image_processor import make_webp_variant
+
+VARIANT_THUMB = "thumb"
+VARIANT_DISPLAY = "display"
+
+
+def variant_sizes() -> Dict[str, int]:
+    """Variant name -> longest side in pixels"""
+    return {
+        VARIANT_THUMB: Settings.IMAGE_THUMBNAIL_SIZE,
+        VARIANT_DISPLAY: Settings.IMAGE_DISPLAY_SIZE,
+    }
+
+
+def create_variants(digest: str, store: Optional[BlobStore] = None, force: bool = False) -> List[str]:
+    """
+    Derive and store the variants of one image
+
+    Args:
+        digest: SHA-256 hex digest of the original image
+        store: Blob store, defaults to get_blob_store()
+        force: Recreate variants that already exist (e.g. after a size change)
+
+    Returns:
+        Names of the variants created
+
+    Raises:
+        PIL.UnidentifiedImageError: If the original is not a readable image
+    """
+    store = store or get_blob_store()
+    missing = [
+        (variant, size) for variant, size in variant_sizes().items()
+        if force or store.get_variant(digest, variant) is None
+    ]
+    if not missing:
+        return []
+
+    original = store.get(digest)
+    if original is None:
+        print(f"Warning: cannot create variants, image blob {digest[:12]} is missing")
+        return []
+
+    for variant, size in missing:
+        store.put_variant(digest, variant, make_webp_variant(original, size, Settings.IMAGE_VARIANT_QUALITY))
+    return [variant for variant, _ in missing]
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending: Set[str] = set()
+_failed: Set[str] = set()  # Not retried in this process (e.g. unreadable originals)
+_lock = threading.Lock()
+
+
+def schedule_variants(digest: Optional[str]) -> Optional[Future]:
+    """
+    Create an image's variants on the background worker pool
+
+    Args:
+        digest: SHA-256 hex digest of the original image (None is ignored)
+
+    Returns:
+        Future of the work, or None if it is already queued or failed before
+    """
+    global _executor
+    if not digest:
+        return None
+    with _lock:
+        if digest in _pending or digest in _failed:
+            return None
+        _pending.add(digest)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Settings.IMAGE_VARIANT_WORKERS, thread_name_prefix="image-variants"
+            )
+    return _executor.submit(_create_in_background, digest)
+
+
+def _create_in_background(digest: str):
+    """Worker entry point; errors are logged, the original keeps being served"""
+    try:
+        create_variants(digest)
+    except Exception as e:
+        print(f"Warning: could not create variants of image {digest[:12]}: {str(e)}")
+        with _lock:
+            _failed.add(digest)
+    finally:
+        with _lock:
+            _pending.discard(digest)
+
+
+def load_variant(item, variant: str, store: Optional[BlobStore] = None) -> Optional[bytes]:
+    """
+    Image bytes of a SketchIteration / MockupIteration in a display variant
+
+    Falls back to the original image (and queues the variants) when they have
+    not been created yet, and for legacy rows not moved to the blob store.
+
+    Args:
+        item: Row with image_sha256 / image_data columns
+        variant: VARIANT_THUMB or VARIANT_DISPLAY
+        store: Blob store, defaults to get_blob_store()
+
+    Returns:
+        Image bytes, or None if the row has no (readable) image
+    """
+    if item.image_sha256:
+        data = (store or get_blob_store()).get_variant(item.image_sha256, variant)
+        if data is not None:
+            return data
+        schedule_variants(item.image_sha256)
+    return load_image(item, store)
@@ -0,0 +1,246 @@
+"""
+Background Job Runner
+Runs long AI generations on a process-wide worker pool instead of inside the
+Streamlit script, so reruns and page reloads never interrupt them. Jobs are
+persisted in generation_jobs: pages queue a job, poll its status and
+progress, and read the rows the handler created once it succeeds. Jobs left
+running by a stopped process are re-queued on startup.
+"""
+
+import atexit
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set, Union
+
+from config.settings import Settings
+from database.crud.jobs import claim_job, create_job, requeue_stale_jobs, update_job
+from database.models import GenerationJob
+
+# job_type -> "module:function". Handlers are imported on first use so a
+# restarted process can resume jobs before any page has been loaded.
+# Signature: handler(job, db, progress) -> Optional[dict], where progress(fraction, message)
+JOB_HANDLERS = {
+    "roadmap": "pages.implement:run_roadmap_job",
+    "tasks": "pages.implement:run_tasks_job",
+    "define_analyses": "pages.define:run_define_analyses_job",
+    "mockup": "pages.prototype_steps.step2_mockup:run_mockup_job",
+    "mockup_refine": "pages.prototype_steps.step2_mockup:run_refine_mockup_job",
+}
+
+
+class JobRunner:
+    """Thread pool that executes queued GenerationJob rows"""
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        session_factory: Optional[Callable] = None,
+        handlers: Optional[Dict[str, Union[str, Callable]]] = None
+    ):
+        """
+        Initialize runner
+
+        Args:
+            max_workers: Jobs that can run at the same time
+            session_factory: Callable returning a SQLAlchemy session. Defaults
+                to config.database.SessionLocal.
+            handlers: job_type -> handler or "module:function", defaults to JOB_HANDLERS
+        """
+        if session_factory is None:
+            from config.database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self._handlers = dict(handlers if handlers is not None else JOB_HANDLERS)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation-job")
+        self._pending: Set[int] = set()  # Handed to the pool and not finished
+        self._running: Set[int] = set()
+        self._lock = threading.Lock()
+        self._maintenance: Optional[threading.Thread] = None
+
+    def submit(self, project_id: int, job_type: str, params: Optional[dict] = None) -> int:
+        """
+        Queue a job and hand it to the pool
+
+        Args:
+            project_id: Project ID
+            job_type: Key of the handler to run
+            params: Handler inputs (JSON-serializable)
+
+        Returns:
+            Job ID
+
+        Raises:
+            ValueError: If job_type has no handler
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        db = self._session_factory()
+        try:
+            job_id = create_job(db, project_id, job_type, params).id
+        finally:
+            db.close()
+        self._dispatch(job_id)
+        return job_id
+
+    def recover(self, stale_after_seconds: Optional[float] = None) -> int:
+        """
+        Re-queue jobs orphaned by a stopped process and resume queued ones
+
+        Args:
+            stale_after_seconds: Heartbeat age that marks a running job as dead,
+                defaults to Settings.JOB_STALE_SECONDS
+
+        Returns:
+            Number of jobs handed to the pool
+        """
+        if stale_after_seconds is None:
+            stale_after_seconds = Settings.JOB_STALE_SECONDS
+        db = self._session_factory()
+        try:
+            job_ids = requeue_stale_jobs(db, stale_after_seconds, Settings.JOB_MAX_ATTEMPTS)
+        except Exception as e:
+            print(f"Warning: could not recover generation jobs: {str(e)}")
+            return 0
+        finally:
+            db.close()
+        with self._lock:
+            job_ids = [job_id for job_id in job_ids if job_id not in self._pending]
+        for job_id in job_ids:
+            self._dispatch(job_id)
+        if job_ids:
+            print(f"Resuming {len(job_ids)} queued generation job(s)")
+        return len(job_ids)
+
+    def start_maintenance(self):
+        """
+        Start the thread that heartbeats running jobs and periodically
+        re-queues jobs orphaned by other (stopped) processes
+        """
+        if self._maintenance is not None:
+            return
+        with self._lock:
+            if self._maintenance is None:
+                self._maintenance = threading.Thread(target=self._maintain, name="generation-job-heartbeat", daemon=True)
+                self._maintenance.start()
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and optionally wait for running ones"""
+        self._executor.shutdown(wait=wait)
+
+    def _dispatch(self, job_id: int):
+        """Hand a job to the pool"""
+        with self._lock:
+            self._pending.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def _resolve(self, job_type: str) -> Callable:
+        """Import a handler given as "module:function" """
+        handler = self._handlers[job_type]
+        if isinstance(handler, str):
+            module_name, function_name = handler.split(":")
+            handler = getattr(importlib.import_module(module_name), function_name)
+            self._handlers[job_type] = handler
+        return handler
+
+    def _run(self, job_id: int):
+        """Claim and execute one job, recording its outcome"""
+        db = self._session_factory()
+        try:
+            if not claim_job(db, job_id):
+                return  # Already taken by another worker or process
+            with self._lock:
+                self._running.add(job_id)
+
+            job = db.get(GenerationJob, job_id)
+
+            def progress(fraction: float, message: Optional[str] = None):
+                status_db = self._session_factory()
+                try:
+                    update_job(status_db, job_id, progress=max(0.0, min(1.0, fraction)), progress_message=message)
+                finally:
+                    status_db.close()
+
+            try:
+                result = self._resolve(job.job_type)(job, db, progress)
+            except Exception as e:
+                db.rollback()
+                print(f"Generation job {job_id} ({job.job_type}) failed: {str(e)}")
+                update_job(db, job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+                return
+
+            update_job(
+                db, job_id,
+                status="succeeded",
+                result=result or {},
+                progress=1.0,
+                finished_at=datetime.utcnow()
+            )
+        except Exception as e:
+            print(f"Warning: generation job {job_id} could not be run: {str(e)}")
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+                self._pending.discard(job_id)
+            db.close()
+
+    def _maintain(self):
+        """Refresh heartbeat_at for jobs running here and recover stale ones elsewhere"""
+        last_recovery = time.monotonic()
+        while True:
+            time.sleep(Settings.JOB_HEARTBEAT_SECONDS)
+            with self._lock:
+                running = list(self._running)
+            if running:
+                db = self._session_factory()
+                try:
+                    for job_id in running:
+                        update_job(db, job_id)
+                except Exception as e:
+                    print(f"Warning: could not refresh job heartbeat: {str(e)}")
+                finally:
+                    db.close()
+
+            if time.monotonic() - last_recovery >= Settings.JOB_STALE_SECONDS:
+                last_recovery = time.monotonic()
+                self.recover()
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """
+    Get the process-wide job runner, resuming any unfinished jobs on first use
+
+    Returns:
+        Shared JobRunner
+    """
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                runner = JobRunner(max_workers=Settings.JOB_WORKERS)
+                runner.recover()
+                runner.start_maintenance()
+                atexit.register(runner.shutdown, wait=False)
+                _runner = runner
+    return _runner
+
+
+def submit_job(project_id: int, job_type: str, params: Optional[dict] = None) -> int:
+    """
+    Queue a generation job on the shared runner
+
+    Args:
+        project_id: Project ID
+        job_type: Key in JOB_HANDLERS
+        params: Handler inputs (JSON-serializable)
+
+    Returns:
+        Job ID
+    """
+    return get_job_runner().submit(project_id, job_type, params)
@@ -0,0 +1,282 @@
+"""
+LLM Client Registry
+Process-wide pool of LangChain chat models and OpenAI SDK clients, keyed by
+(provider, model, base_url) and sharing one keep-alive HTTP connection pool
+"""
+
+import asyncio
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import httpx
+from openai import OpenAI
+from langchain_openai import ChatOpenAI
+from langchain_anthropic import ChatAnthropic
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from config.settings import Settings
+from services.fake_llm import build_fake_chat_model
+
+XAI_BASE_URL = "https://api.x.ai/v1"  # xAI API endpoint (OpenAI-compatible)
+
+
+def resolve_provider(model: str) -> Tuple[str, str, Optional[str]]:
+    """
+    Work out which provider serves a model
+
+    Args:
+        model: Model name (e.g. "gpt-4.1", "claude-sonnet-4-5-20250929", "grok-4", "fake")
+
+    Returns:
+        Tuple of (provider, api_key, base_url)
+
+    Raises:
+        ValueError: If the provider's API key is not configured
+    """
+    # Offline fake models (see services/fake_llm.py) - no key needed
+    if model.startswith('fake'):
+        return "fake", "", None
+
+    # Anthropic models (Claude)
+    if model.startswith('claude'):
+        if not Settings.ANTHROPIC_API_KEY:
+            raise ValueError("ANTHROPIC_API_KEY not set in environment variables")
+        return "anthropic", Settings.ANTHROPIC_API_KEY, None
+
+    # xAI models (Grok) - Using OpenAI-compatible API
+    if model.startswith('grok'):
+        if not Settings.XAI_API_KEY:
+            raise ValueError("XAI_API_KEY not set in environment variables")
+        return "xai", Settings.XAI_API_KEY, XAI_BASE_URL
+
+    # OpenAI models (GPT-4, GPT-5, o1, etc.) and default
+    return "openai", Settings.OPENAI_API_KEY, None
+
+
+class LLMClientRegistry:
+    """Thread-safe registry handing out shared, pooled LLM clients"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._chat_models: Dict[Tuple[str, str, Optional[str]], BaseChatModel] = {}
+        self._openai_clients: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._warmed: set = set()
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """Shared keep-alive HTTP client used by all OpenAI-compatible clients"""
+        if self._http_client is None:
+            with self._lock:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=Settings.AI_HTTP_MAX_CONNECTIONS,
+                            max_keepalive_connections=Settings.AI_HTTP_MAX_KEEPALIVE,
+                            keepalive_expiry=Settings.AI_HTTP_KEEPALIVE_EXPIRY
+                        ),
+                        timeout=httpx.Timeout(Settings.AI_REQUEST_TIMEOUT, connect=10.0)
+                    )
+        return self._http_client
+
+    @property
+    def http_async_client(self) -> httpx.AsyncClient:
+        """
+        Shared async HTTP client for OpenAI-compatible chat models
+
+        Only used from the background loop in services/async_loop.py.
+        """
+        if self._http_async_client is None:
+            with self._lock:
+                if self._http_async_client is None:
+                    self._http_async_client = httpx.AsyncClient(
+                        limits=httpx.Limits(
+                            max_connections=Settings.AI_HTTP_MAX_CONNECTIONS,
+                            max_keepalive_connections=Settings.AI_HTTP_MAX_KEEPALIVE,
+                            keepalive_expiry=Settings.AI_HTTP_KEEPALIVE_EXPIRY
+                        ),
+                        timeout=httpx.Timeout(Settings.AI_REQUEST_TIMEOUT, connect=10.0)
+                    )
+        return self._http_async_client
+
+    def semaphore(self, provider: str) -> asyncio.Semaphore:
+        """
+        Get the process-wide concurrency limiter for a provider
+
+        Args:
+            provider: Provider name (openai, anthropic, xai)
+
+        Returns:
+            asyncio.Semaphore sized from Settings.AI_MAX_CONCURRENCY
+        """
+        with self._lock:
+            sem = self._semaphores.get(provider)
+            if sem is None:
+                limit = Settings.AI_MAX_CONCURRENCY.get(provider, Settings.AI_MAX_CONCURRENCY['openai'])
+                sem = asyncio.Semaphore(limit)
+                self._semaphores[provider] = sem
+            return sem
+
+    def get_chat_model(self, model: str) -> BaseChatModel:
+        """
+        Get the shared LangChain chat model for a model name
+
+        Args:
+            model: Model name
+
+        Returns:
+            Shared chat model instance
+
+        Raises:
+            ValueError: If the provider's API key is not configured
+        """
+        provider, api_key, base_url = resolve_provider(model)
+        key = (provider, model, base_url)
+
+        llm = self._chat_models.get(key)
+        if llm is not None:
+            return llm
+
+        with self._lock:
+            llm = self._chat_models.get(key)
+            if llm is None:
+                llm = self._build_chat_model(provider, model, api_key, base_url)
+                self._chat_models[key] = llm
+        return llm
+
+    def get_openai_client(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> OpenAI:
+        """
+        Get a shared OpenAI SDK client (used for vision and image generation)
+
+        Args:
+            api_key: Optional API key, defaults to Settings.OPENAI_API_KEY
+            base_url: Optional OpenAI-compatible endpoint
+
+        Returns:
+            Shared OpenAI client
+        """
+        api_key = api_key or Settings.OPENAI_API_KEY
+        key = (api_key, base_url)
+
+        client = self._openai_clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._openai_clients.get(key)
+            if client is None:
+                client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=self.http_client)
+                self._openai_clients[key] = client
+        return client
+
+    def warm_up(self, models: Iterable[str]):
+        """
+        Build clients and open connections ahead of the first real request
+
+        Failures are logged and ignored - warm-up is best effort.
+
+        Args:
+            models: Model names to warm up
+        """
+        for model in models:
+            if model in self._warmed:
+                continue
+            try:
+                provider, api_key, base_url = resolve_provider(model)
+                llm = self.get_chat_model(model)
+                if provider == "fake":
+                    self._warmed.add(model)
+                    continue
+
+                # Listing models is free and completes the TLS handshake,
+                # leaving a keep-alive connection in the pool
+                if provider == "anthropic":
+                    anthropic_client = getattr(llm, "_client", None)
+                    if anthropic_client is not None:
+                        anthropic_client.models.list(limit=1)
+                else:
+                    self.get_openai_client(api_key, base_url).models.list()
+
+                self._warmed.add(model)
+            except Exception as e:
+                print(f"Warning: could not warm up client for {model}: {str(e)}")
+
+        stats = self.stats()
+        print(f"LLM client pool: {stats['chat_models']} chat model(s), "
+              f"{stats['openai_clients']} OpenAI client(s), warmed {stats['warmed']}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report pool size and configuration
+
+        Returns:
+            Dictionary with client counts, keys and HTTP pool limits
+        """
+        with self._lock:
+            return {
+                "chat_models": len(self._chat_models),
+                "openai_clients": len(self._openai_clients),
+                "keys": [f"{p}:{m}" + (f"@{u}" if u else "") for p, m, u in self._chat_models],
+                "warmed": sorted(self._warmed),
+                "max_connections": Settings.AI_HTTP_MAX_CONNECTIONS,
+                "max_keepalive_connections": Settings.AI_HTTP_MAX_KEEPALIVE,
+                "max_concurrency": dict(Settings.AI_MAX_CONCURRENCY),
+            }
+
+    def close(self):
+        """Drop all clients and close the shared HTTP pool"""
+        with self._lock:
+            self._chat_models.clear()
+            self._openai_clients.clear()
+            self._warmed.clear()
+            self._semaphores.clear()
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+
+    def _build_chat_model(self, provider: str, model: str, api_key: str, base_url: Optional[str]) -> BaseChatModel:
+        """Create a chat model for a provider (caller holds the lock)"""
+        if provider == "fake":
+            return build_fake_chat_model(model)
+
+        if provider == "anthropic":
+            return ChatAnthropic(
+                model=model,
+                temperature=Settings.OPENAI_TEMPERATURE,
+                max_tokens=Settings.OPENAI_MAX_TOKENS,
+                api_key=api_key,
+                max_retries=0  # Retries are handled by services/rate_limiter.py
+            )
+
+        return ChatOpenAI(
+            model=model,
+            temperature=Settings.OPENAI_TEMPERATURE,
+            max_tokens=Settings.OPENAI_MAX_TOKENS,
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,  # Retries are handled by services/rate_limiter.py
+            stream_usage=True,  # Report token usage on streamed responses
+            http_client=self.http_client,
+            http_async_client=self.http_async_client
+        )
+
+
+_registry: Optional[LLMClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_llm_registry() -> LLMClientRegistry:
+    """
+    Get the process-wide client registry
+
+    Returns:
+        Shared LLMClientRegistry
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = LLMClientRegistry()
+    return _registry
@@ -0,0 +1,274 @@
+"""
+Prompt Builder
+Token-budgeted prompt assembly. Sections are measured with a local tokenizer
+(tiktoken, falling back to a character estimate when it isn't available) and
+trimmed by priority so prompts use the model's context window without
+overflowing it.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from config.settings import Settings
+
+# Context window sizes in tokens, matched by longest model-name prefix
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-5": 400000,
+    "o1": 200000,
+    "claude": 200000,
+    "grok-4": 256000,
+    "grok-3": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 128000
+
+# DALL-E 3 rejects prompts longer than this many characters
+DALLE_PROMPT_MAX_CHARS = 4000
+
+TRUNCATION_MARKER = "\n[...truncated]"
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once, or None if tiktoken / its data is unavailable"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    print(f"Warning: tiktoken unavailable, estimating tokens from characters: {str(e)[:200]}")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in text
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Token count (exact with tiktoken, otherwise ~4 characters per token)
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = TRUNCATION_MARKER) -> str:
+    """
+    Trim text to at most max_tokens tokens, marking the cut
+
+    Args:
+        text: Text to trim
+        max_tokens: Token limit (including the marker)
+        marker: Appended when text is cut
+
+    Returns:
+        Original text if it fits, otherwise the trimmed text plus marker
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens - count_tokens(marker))
+    if keep == 0:
+        return ""
+
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:keep * 4].rstrip() + marker
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:keep]).rstrip() + marker
+
+
+def truncate_to_chars(text: str, max_chars: int, marker: str = TRUNCATION_MARKER) -> str:
+    """
+    Trim text to at most max_chars characters, preferring a word boundary
+
+    Args:
+        text: Text to trim
+        max_chars: Character limit (including the marker)
+        marker: Appended when text is cut
+
+    Returns:
+        Original text if it fits, otherwise the trimmed text plus marker
+    """
+    if len(text) <= max_chars:
+        return text
+    keep = max_chars - len(marker)
+    if keep <= 0:
+        return ""
+    cut = text[:keep]
+    space = cut.rfind(" ")
+    if space > keep * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + marker
+
+
+def get_context_window(model: str) -> int:
+    """
+    Look up a model's context window
+
+    Args:
+        model: Model name
+
+    Returns:
+        Context window in tokens
+    """
+    matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def get_input_budget(model: str, max_output_tokens: Optional[int] = None) -> int:
+    """
+    Tokens available for the prompt
+
+    The context window minus the completion allowance, capped by
+    Settings.AI_PROMPT_MAX_INPUT_TOKENS to keep cost predictable on
+    very large windows.
+
+    Args:
+        model: Model name
+        max_output_tokens: Completion allowance, defaults to Settings.OPENAI_MAX_TOKENS
+
+    Returns:
+        Input token budget
+    """
+    if max_output_tokens is None:
+        max_output_tokens = Settings.OPENAI_MAX_TOKENS
+    available = get_context_window(model) - max_output_tokens
+    return max(0, min(available, Settings.AI_PROMPT_MAX_INPUT_TOKENS))
+
+
+class PromptBuilder:
+    """
+    Fits named prompt sections into a shared budget
+
+    Higher-priority sections are filled first; sections with the same
+    priority share what is left evenly, and small sections are never cut
+    to make room for siblings that are too big anyway.
+
+    Usage:
+        builder = PromptBuilder(budget=get_input_budget(model), reserved=count_tokens(system_prompt))
+        builder.add("goal", project.goal, priority=10)
+        builder.add("research_1", text, priority=1)
+        sections = builder.fit()
+    """
+
+    def __init__(self, budget: int, reserved: int = 0, unit: str = "tokens"):
+        """
+        Initialize builder
+
+        Args:
+            budget: Total budget for the prompt
+            reserved: Part of the budget already used by fixed text (system prompt, template)
+            unit: "tokens" or "chars" (for character-limited APIs like DALL-E)
+        """
+        if unit not in ("tokens", "chars"):
+            raise ValueError(f"Unknown budget unit: {unit}")
+        self.budget = budget
+        self.reserved = reserved
+        self.unit = unit
+        self._sections: List[Dict] = []
+        self._report: Dict[str, Dict] = {}
+
+    def measure(self, text: str) -> int:
+        """Size of text in this builder's unit"""
+        return count_tokens(text) if self.unit == "tokens" else len(text or "")
+
+    def add(self, name: str, text: str, priority: int = 0, max_size: Optional[int] = None) -> "PromptBuilder":
+        """
+        Add a section
+
+        Args:
+            name: Unique section name
+            text: Section text
+            priority: Higher priorities are kept first
+            max_size: Optional cap for this section regardless of free budget
+
+        Returns:
+            self, for chaining
+        """
+        self._sections.append({
+            "name": name,
+            "text": text or "",
+            "priority": priority,
+            "max_size": max_size,
+        })
+        return self
+
+    def fit(self) -> Dict[str, str]:
+        """
+        Trim sections to the budget
+
+        Returns:
+            Dictionary of section name -> fitted text, in insertion order
+        """
+        remaining = max(0, self.budget - self.reserved)
+        sizes = {section["name"]: self.measure(section["text"]) for section in self._sections}
+        allowed: Dict[str, int] = {}
+
+        for priority in sorted({section["priority"] for section in self._sections}, reverse=True):
+            group = [section for section in self._sections if section["priority"] == priority]
+            wanted = {
+                section["name"]: min(sizes[section["name"]], section["max_size"])
+                if section["max_size"] is not None else sizes[section["name"]]
+                for section in group
+            }
+
+            # Water-fill: sections smaller than an even share keep everything,
+            # and what they don't use is split among the rest
+            pending = sorted(wanted, key=wanted.get)
+            while pending:
+                share = remaining // len(pending)
+                name = pending.pop(0)
+                allowed[name] = min(wanted[name], share)
+                remaining -= allowed[name]
+
+        fitted = {}
+        self._report = {}
+        for section in self._sections:
+            name = section["name"]
+            text = section["text"]
+            if allowed[name] < sizes[name]:
+                if self.unit == "tokens":
+                    text = truncate_to_tokens(text, allowed[name])
+                else:
+                    text = truncate_to_chars(text, allowed[name])
+            fitted[name] = text
+            self._report[name] = {
+                "original": sizes[name],
+                "used": self.measure(text),
+                "truncated": text != section["text"],
+            }
+        return fitted
+
+    def report(self) -> Dict[str, Dict]:
+        """
+        Per-section usage from the last fit()
+
+        Returns:
+            Dictionary of section name -> {original, used, truncated} in the builder's unit
+        """
+        return dict(self._report)
+
+    def log_report(self, label: str):
+        """Print a one-line usage summary from the last fit()"""
+        used = sum(item["used"] for item in self._report.values())
+        truncated = [name for name, item in self._report.items() if item["truncated"]]
+        message = f"Prompt {label}: {used + self.reserved}/{self.budget} {self.unit}"
+        if truncated:
+            message += f", truncated {', '.join(truncated)}"
+        print(message)
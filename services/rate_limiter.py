@@ -0,0 +1,281 @@
+"""
+Rate Limiter
+Per-provider token buckets (requests/min and tokens/min) and retry with
+jittered exponential backoff that honors Retry-After
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config.settings import Settings
+from services.ai_errors import AIProviderError, AIRateLimitError
+
+# HTTP statuses worth retrying: timeout, conflict, rate limit, server errors, Anthropic overloaded
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+RATE_LIMIT_STATUS_CODES = {429, 529}
+
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out reservations instead of blocking"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        Initialize bucket
+
+        Args:
+            capacity: Maximum burst size
+            refill_per_second: Refill rate
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take tokens from the bucket, going into debt if needed
+
+        Args:
+            amount: Tokens to take (clamped to capacity)
+
+        Returns:
+            Seconds the caller must wait before proceeding
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.refill_per_second)
+            self._updated_at = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.refill_per_second
+
+    def adjust(self, amount: float):
+        """Give back (negative) or charge (positive) tokens after the fact"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class ProviderRateLimiter:
+    """Request and token budgets for one provider, shared by every session in the process"""
+
+    def __init__(self, provider: str, requests_per_minute: int, tokens_per_minute: int):
+        self.provider = provider
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """
+        Reserve one request and an estimated token count
+
+        Returns:
+            Seconds to wait before sending
+        """
+        delay = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        with self._lock:
+            pause = self._blocked_until - time.monotonic()
+        return max(delay, pause, 0.0)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real usage is known"""
+        if actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for this provider (after a 429 / Retry-After)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def acquire(self, estimated_tokens: int):
+        """Block until a request may be sent"""
+        delay = self.reserve(estimated_tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, estimated_tokens: int):
+        """Async version of acquire"""
+        delay = self.reserve(estimated_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_limiters: Dict[str, ProviderRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> ProviderRateLimiter:
+    """
+    Get the process-wide limiter for a provider
+
+    Args:
+        provider: Provider name (openai, anthropic, xai)
+
+    Returns:
+        ProviderRateLimiter configured from Settings.AI_RATE_LIMITS
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limits = Settings.AI_RATE_LIMITS.get(provider, Settings.AI_RATE_LIMITS['openai'])
+            limiter = ProviderRateLimiter(provider, limits['rpm'], limits['tpm'])
+            _limiters[provider] = limiter
+        return limiter
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token estimate (about 4 characters per token)"""
+    return sum(len(text or "") for text in texts) // 4 + 1
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Get the HTTP status code from an OpenAI / Anthropic SDK error, if any"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    Read Retry-After (seconds or milliseconds header) from an SDK error
+
+    Returns:
+        Seconds to wait, or None if the provider didn't say
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            return None  # HTTP-date form - fall back to backoff
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is transient (rate limit, overload, timeout, connection, 5xx)"""
+    status = get_status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    # Connection / timeout errors carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError",
+                                    "ReadTimeout", "ConnectTimeout", "RemoteProtocolError")
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Jittered exponential backoff, never shorter than Retry-After
+
+    Args:
+        attempt: Zero-based retry attempt
+        retry_after: Provider-requested wait in seconds
+
+    Returns:
+        Seconds to wait
+    """
+    ceiling = min(Settings.AI_BACKOFF_MAX_SECONDS, Settings.AI_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    delay = random.uniform(ceiling / 2, ceiling)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def to_ai_error(error: Exception, provider: str, model: str):
+    """Wrap an SDK exception in the matching AIServiceError subclass"""
+    status = get_status_code(error)
+    if status in RATE_LIMIT_STATUS_CODES:
+        return AIRateLimitError(
+            f"{provider} rate limit exceeded: {str(error)}", provider, model, retry_after=get_retry_after(error)
+        )
+    return AIProviderError(f"{provider} request failed: {str(error)}", provider, model, status_code=status)
+
+
+def call_with_retry(
+    fn: Callable[[], Any],
+    provider: str,
+    model: str,
+    estimated_tokens: int,
+    usage_tokens: Optional[Callable[[Any], Optional[int]]] = None
+) -> Any:
+    """
+    Call a provider under its rate limiter, retrying transient failures
+
+    Args:
+        fn: Zero-argument callable performing the request
+        provider: Provider name
+        model: Model name (for error messages)
+        estimated_tokens: Token reservation for the request
+        usage_tokens: Optional function extracting actual total tokens from the result
+
+    Returns:
+        Whatever fn returns
+
+    Raises:
+        AIRateLimitError: Still rate limited after all retries
+        AIProviderError: Non-retryable error, or retries exhausted
+    """
+    limiter = get_rate_limiter(provider)
+    for attempt in range(Settings.AI_MAX_RETRIES + 1):
+        limiter.acquire(estimated_tokens)
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_retryable(e) or attempt >= Settings.AI_MAX_RETRIES:
+                raise to_ai_error(e, provider, model) from e
+            delay = backoff_delay(attempt, get_retry_after(e))
+            if get_status_code(e) in RATE_LIMIT_STATUS_CODES:
+                limiter.pause(delay)
+            print(f"Retrying {provider} request in {delay:.1f}s after error: {str(e)[:200]}")
+            time.sleep(delay)
+            continue
+
+        limiter.settle(estimated_tokens, usage_tokens(result) if usage_tokens else None)
+        return result
+
+
+async def acall_with_retry(
+    fn: Callable[[], Awaitable[Any]],
+    provider: str,
+    model: str,
+    estimated_tokens: int,
+    usage_tokens: Optional[Callable[[Any], Optional[int]]] = None
+) -> Any:
+    """Async version of call_with_retry (fn returns an awaitable)"""
+    limiter = get_rate_limiter(provider)
+    for attempt in range(Settings.AI_MAX_RETRIES + 1):
+        await limiter.acquire_async(estimated_tokens)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not is_retryable(e) or attempt >= Settings.AI_MAX_RETRIES:
+                raise to_ai_error(e, provider, model) from e
+            delay = backoff_delay(attempt, get_retry_after(e))
+            if get_status_code(e) in RATE_LIMIT_STATUS_CODES:
+                limiter.pause(delay)
+            print(f"Retrying {provider} request in {delay:.1f}s after error: {str(e)[:200]}")
+            await asyncio.sleep(delay)
+            continue
+
+        limiter.settle(estimated_tokens, usage_tokens(result) if usage_tokens else None)
+        return result
@@ -0,0 +1,317 @@
+"""
+Single-Flight Generation
+Deduplicates identical AI requests across threads and processes. The first
+caller takes a lease in generation_leases keyed by the request fingerprint
+and generates; concurrent callers with the same fingerprint wait for its
+result instead of paying for their own call. Leases are renewed while the
+holder is working, so a crashed holder's lease lapses and a waiter takes over.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from config.settings import Settings
+from database.models import GenerationLease
+
+# Expired leases are purged every this many claims
+PURGE_EVERY = 100
+
+
+class SingleFlight:
+    """Lease-based deduplication of in-flight requests"""
+
+    def __init__(
+        self,
+        lease_seconds: float = 60,
+        result_seconds: float = 60,
+        poll_seconds: float = 0.5,
+        wait_seconds: float = 600,
+        session_factory: Optional[Callable] = None
+    ):
+        """
+        Initialize single-flight coordination
+
+        Args:
+            lease_seconds: Lease length; holders renew at a third of it
+            result_seconds: How long a finished result stays available to waiters
+            poll_seconds: Interval at which waiters check the lease
+            wait_seconds: Longest a waiter waits before generating on its own
+            session_factory: Callable returning a SQLAlchemy session. Defaults
+                to config.database.SessionLocal.
+        """
+        if session_factory is None:
+            from config.database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self.lease_seconds = lease_seconds
+        self.result_seconds = result_seconds
+        self.poll_seconds = poll_seconds
+        self.wait_seconds = wait_seconds
+
+        self._held: Dict[str, str] = {}  # token -> key, renewed by the renewal thread
+        self._lock = threading.Lock()
+        self._renewal: Optional[threading.Thread] = None
+        self._claims = 0
+
+    def claim(self, key: str, project_id: Optional[int] = None, accept_done: bool = True) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Take the lease for a request or wait for the caller holding it
+
+        Args:
+            key: Request fingerprint
+            project_id: Project the request belongs to
+            accept_done: Whether a result finished just before this call may
+                be reused (False for requests that bypass the cache). Results
+                of a call that was in flight when this caller arrived are
+                always accepted.
+
+        Returns:
+            (token, None) when this caller should generate - call complete()
+            or release() afterwards; token is None when coordination is
+            unavailable. (None, result) when another caller's result can be used.
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+        while True:
+            try:
+                token, result = self._try_claim(key, project_id, accept_done or waited)
+            except Exception as e:
+                print(f"Warning: single-flight lease unavailable, generating without it: {str(e)}")
+                return None, None
+            if token is not None or result is not None:
+                return token, result
+            if time.monotonic() >= deadline:
+                print(f"Warning: gave up waiting for in-flight request {key[:12]}, generating again")
+                return None, None
+            waited = True
+            time.sleep(self.poll_seconds)
+
+    async def aclaim(self, key: str, project_id: Optional[int] = None, accept_done: bool = True) -> Tuple[Optional[str], Optional[str]]:
+        """Async version of claim that waits without blocking the event loop"""
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+        while True:
+            try:
+                token, result = await asyncio.to_thread(self._try_claim, key, project_id, accept_done or waited)
+            except Exception as e:
+                print(f"Warning: single-flight lease unavailable, generating without it: {str(e)}")
+                return None, None
+            if token is not None or result is not None:
+                return token, result
+            if time.monotonic() >= deadline:
+                print(f"Warning: gave up waiting for in-flight request {key[:12]}, generating again")
+                return None, None
+            waited = True
+            await asyncio.sleep(self.poll_seconds)
+
+    def complete(self, key: str, token: Optional[str], result: str):
+        """
+        Publish the result for waiting callers and stop renewing the lease
+
+        Args:
+            key: Request fingerprint
+            token: Token returned by claim
+            result: Response text
+        """
+        if token is None:
+            return
+        self._forget(token)
+        self._update(key, token, {
+            GenerationLease.status: "done",
+            GenerationLease.result: result,
+            GenerationLease.expires_at: datetime.utcnow() + timedelta(seconds=self.result_seconds)
+        })
+
+    def release(self, key: str, token: Optional[str]):
+        """
+        Give up the lease after a failed call so a waiting caller can take over
+
+        Args:
+            key: Request fingerprint
+            token: Token returned by claim
+        """
+        if token is None:
+            return
+        self._forget(token)
+        db = self._session_factory()
+        try:
+            db.query(GenerationLease).filter(
+                GenerationLease.lease_key == key,
+                GenerationLease.holder == token
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            print(f"Warning: could not release single-flight lease: {str(e)}")
+        finally:
+            db.close()
+
+    def run(self, key: str, generate: Callable[[], str], project_id: Optional[int] = None,
+            accept_done: bool = True) -> Tuple[str, bool]:
+        """
+        Run generate() unless an identical request is already in flight
+
+        Args:
+            key: Request fingerprint
+            generate: Produces the response text
+            project_id: Project the request belongs to
+            accept_done: See claim()
+
+        Returns:
+            Tuple of (response text, whether it came from another caller)
+        """
+        token, result = self.claim(key, project_id, accept_done)
+        if result is not None:
+            return result, True
+        try:
+            result = generate()
+        except BaseException:
+            self.release(key, token)
+            raise
+        self.complete(key, token, result)
+        return result, False
+
+    async def arun(self, key: str, generate: Callable[[], Awaitable[str]], project_id: Optional[int] = None,
+                   accept_done: bool = True) -> Tuple[str, bool]:
+        """Async version of run"""
+        token, result = await self.aclaim(key, project_id, accept_done)
+        if result is not None:
+            return result, True
+        try:
+            result = await generate()
+        except BaseException:
+            await asyncio.to_thread(self.release, key, token)
+            raise
+        await asyncio.to_thread(self.complete, key, token, result)
+        return result, False
+
+    def _try_claim(self, key: str, project_id: Optional[int], accept_done: bool) -> Tuple[Optional[str], Optional[str]]:
+        """One attempt at claim; (None, None) means another caller holds the lease"""
+        self._claims += 1
+        if self._claims % PURGE_EVERY == 0:
+            self._purge()
+
+        now = datetime.utcnow()
+        token = str(uuid.uuid4())
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        db = self._session_factory()
+        try:
+            lease = db.get(GenerationLease, key)
+            if lease is None:
+                db.add(GenerationLease(lease_key=key, holder=token, status="running",
+                                       project_id=project_id, expires_at=expires_at))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    return None, None  # Another caller inserted it first
+                self._hold(token, key)
+                return token, None
+
+            if lease.expires_at >= now:
+                if lease.status == "running":
+                    return None, None
+                if accept_done:
+                    return None, lease.result
+
+            # The holder crashed, the result is stale, or the caller wants a
+            # fresh response: take over unless someone else just did
+            taken = db.query(GenerationLease).filter(
+                GenerationLease.lease_key == key,
+                GenerationLease.holder == lease.holder,
+                GenerationLease.status == lease.status
+            ).update({
+                GenerationLease.holder: token,
+                GenerationLease.status: "running",
+                GenerationLease.result: None,
+                GenerationLease.project_id: project_id,
+                GenerationLease.expires_at: expires_at
+            }, synchronize_session=False)
+            db.commit()
+            if not taken:
+                return None, None
+            self._hold(token, key)
+            return token, None
+        finally:
+            db.close()
+
+    def _update(self, key: str, token: str, values: dict) -> bool:
+        """Update the lease if this token still holds it"""
+        db = self._session_factory()
+        try:
+            updated = db.query(GenerationLease).filter(
+                GenerationLease.lease_key == key,
+                GenerationLease.holder == token
+            ).update(values, synchronize_session=False)
+            db.commit()
+            return updated == 1
+        except Exception as e:
+            print(f"Warning: could not update single-flight lease: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+    def _purge(self):
+        """Delete leases that expired more than a lease length ago"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        db = self._session_factory()
+        try:
+            db.query(GenerationLease).filter(GenerationLease.expires_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            print(f"Warning: could not purge single-flight leases: {str(e)}")
+        finally:
+            db.close()
+
+    def _hold(self, token: str, key: str):
+        """Start renewing a lease"""
+        with self._lock:
+            self._held[token] = key
+            if self._renewal is None:
+                self._renewal = threading.Thread(target=self._renew, name="single-flight-renewal", daemon=True)
+                self._renewal.start()
+
+    def _forget(self, token: str):
+        """Stop renewing a lease"""
+        with self._lock:
+            self._held.pop(token, None)
+
+    def _renew(self):
+        """Extend the leases held by this process"""
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._lock:
+                held = list(self._held.items())
+            for token, key in held:
+                expires_at = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+                if not self._update(key, token, {GenerationLease.expires_at: expires_at}):
+                    self._forget(token)  # Lost the lease (e.g. taken over after a long stall)
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Get the process-wide single-flight coordinator
+
+    Returns:
+        Shared SingleFlight
+    """
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight(
+                    lease_seconds=Settings.AI_SINGLE_FLIGHT_LEASE_SECONDS,
+                    result_seconds=Settings.AI_SINGLE_FLIGHT_RESULT_SECONDS,
+                    poll_seconds=Settings.AI_SINGLE_FLIGHT_POLL_SECONDS,
+                    wait_seconds=Settings.AI_SINGLE_FLIGHT_WAIT_SECONDS
+                )
+    return _single_flight
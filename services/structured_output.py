@@ -0,0 +1,179 @@
+"""
+Structured Output Parsing
+Turns model output into validated Pydantic objects. Handles markdown fences,
+prose around the JSON and output truncated by the token limit locally, so a
+long generation only needs an AI repair pass when it is structurally wrong
+(see AIService.generate_structured).
+"""
+
+import json
+from typing import Any, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T", bound=BaseModel)
+
+# How many cut points to try when closing truncated JSON
+MAX_TRUNCATION_CUTS = 200
+
+JSON_REPAIR_SYSTEM_PROMPT = """You fix malformed JSON so it matches a JSON schema.
+
+Return only the corrected JSON object: no markdown, no code blocks, no explanation.
+Keep every value from the input that fits the schema; do not invent new content
+except where a required field is missing."""
+
+JSON_REPAIR_PROMPT = """JSON schema:
+{schema}
+
+Validation error:
+{error}
+
+JSON to fix:
+{output}"""
+
+
+class StructuredOutputError(ValueError):
+    """Model output could not be turned into the requested schema"""
+
+
+def extract_json(text: str) -> str:
+    """
+    Cut the JSON value out of a model response
+
+    Removes markdown code fences and any prose before the first { or [.
+
+    Args:
+        text: Raw response text
+
+    Returns:
+        Text starting at the JSON value
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if "```" in text:
+            text = text[:text.rindex("```")]
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    return text[min(starts):].strip() if starts else text
+
+
+def _cut_points(text: str) -> List[Tuple[int, str]]:
+    """
+    Positions where truncated JSON can be cut and closed
+
+    Returns (index, closing brackets) for each comma outside a string, with
+    the brackets needed to close everything open at that point.
+    """
+    points = []
+    stack = []
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+        elif char == ",":
+            points.append((index, "".join(reversed(stack))))
+    return points
+
+
+def close_truncated_json(text: str) -> Optional[Any]:
+    """
+    Parse JSON that was cut off mid-generation
+
+    Drops the incomplete trailing item and closes the open objects and
+    arrays, so the complete part of a long response is kept.
+
+    Args:
+        text: JSON text missing its end
+
+    Returns:
+        Parsed value, or None if no cut point gives valid JSON
+    """
+    for index, closing in reversed(_cut_points(text)[-MAX_TRUNCATION_CUTS:]):
+        try:
+            return json.loads(text[:index] + closing)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def load_json(text: str) -> Any:
+    """
+    Parse JSON from a model response
+
+    Args:
+        text: Raw response text
+
+    Returns:
+        Parsed value
+
+    Raises:
+        StructuredOutputError: If no JSON can be recovered
+    """
+    candidate = extract_json(text)
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError as e:
+        data = close_truncated_json(candidate)
+        if data is None:
+            raise StructuredOutputError(f"Invalid JSON: {e}")
+        print(f"Warning: recovered truncated JSON response ({len(candidate)} chars)")
+        return data
+
+
+def parse_structured(text: str, schema: Type[T]) -> T:
+    """
+    Parse and validate a model response against a Pydantic schema
+
+    Args:
+        text: Raw response text
+        schema: Pydantic model class
+
+    Returns:
+        Validated schema instance
+
+    Raises:
+        StructuredOutputError: If the text is not valid JSON or does not match the schema
+    """
+    data = load_json(text)
+    try:
+        return schema.model_validate(data)
+    except ValidationError as e:
+        raise StructuredOutputError(f"Response does not match {schema.__name__}: {e}")
+
+
+def raw_output_text(message) -> str:
+    """
+    Text to repair from a structured-output response
+
+    Tool-calling providers put the output in the tool call arguments,
+    JSON-mode providers in the message content.
+
+    Args:
+        message: LangChain AIMessage
+
+    Returns:
+        JSON text (possibly invalid)
+    """
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        return json.dumps(tool_calls[0].get("args", {}), ensure_ascii=False)
+    invalid_calls = getattr(message, "invalid_tool_calls", None)
+    if invalid_calls:
+        return invalid_calls[0].get("args") or ""
+    content = message.content
+    if isinstance(content, list):
+        content = "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+    return content
@@ -0,0 +1,267 @@
+"""
+LLM Call Telemetry
+Records latency, token usage and estimated cost of every AI provider call.
+Records are queued in memory and written to llm_call_logs in batches by a
+background thread, so logging never blocks a generation.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import Settings
+
+# USD per 1M tokens (input, cached input, output). Matched by longest model-name prefix.
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5": (1.25, 0.125, 10.00),
+    "o1-mini": (1.10, 0.55, 4.40),
+    "o1": (15.00, 7.50, 60.00),
+    "claude-opus": (15.00, 1.50, 75.00),
+    "claude-sonnet": (3.00, 0.30, 15.00),
+    "claude-haiku": (1.00, 0.10, 5.00),
+    "grok-4": (3.00, 0.75, 15.00),
+    "grok-3-mini": (0.30, 0.075, 0.50),
+    "grok-3": (3.00, 0.75, 15.00),
+}
+
+# Anthropic bills prompt cache writes at a premium over regular input
+CACHE_WRITE_MULTIPLIER = 1.25
+
+# USD per generated image
+IMAGE_PRICING = {
+    "dall-e-3": 0.04,  # 1024x1024 standard
+}
+
+
+def estimate_cost(
+    model: str,
+    prompt_tokens: Optional[int],
+    completion_tokens: Optional[int],
+    images: int = 0,
+    cache_read_tokens: Optional[int] = None,
+    cache_write_tokens: Optional[int] = None
+) -> Optional[float]:
+    """
+    Estimate the cost of a call from MODEL_PRICING / IMAGE_PRICING
+
+    Args:
+        model: Model name
+        prompt_tokens: Input tokens, including any cached ones
+        completion_tokens: Output tokens
+        images: Number of generated images
+        cache_read_tokens: Input tokens served from the prompt cache
+        cache_write_tokens: Input tokens written to the prompt cache
+
+    Returns:
+        Estimated cost in USD, or None if the model is not priced
+    """
+    if images:
+        price = IMAGE_PRICING.get(model)
+        return price * images if price is not None else None
+
+    if prompt_tokens is None and completion_tokens is None:
+        return None
+
+    matches = [prefix for prefix in MODEL_PRICING if model.startswith(prefix)]
+    if not matches:
+        return None
+    input_price, cached_price, output_price = MODEL_PRICING[max(matches, key=len)]
+    cache_read = cache_read_tokens or 0
+    cache_write = cache_write_tokens or 0
+    uncached = max(0, (prompt_tokens or 0) - cache_read - cache_write)
+    return (
+        uncached * input_price
+        + cache_read * cached_price
+        + cache_write * input_price * CACHE_WRITE_MULTIPLIER
+        + (completion_tokens or 0) * output_price
+    ) / 1_000_000
+
+
+class TelemetryWriter:
+    """Background writer that batches LLM call records into llm_call_logs"""
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        flush_seconds: float = 2.0,
+        session_factory: Optional[Callable] = None
+    ):
+        """
+        Initialize the writer (the thread starts on the first record)
+
+        Args:
+            batch_size: Maximum rows per insert
+            flush_seconds: Maximum time a record waits in the queue
+            session_factory: Callable returning a SQLAlchemy session. Defaults
+                to config.database.SessionLocal.
+        """
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+
+        if session_factory is None:
+            from config.database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def record(self, **fields):
+        """
+        Queue one call record (returns immediately)
+
+        Args:
+            **fields: LLMCallLog column values
+        """
+        fields.setdefault("created_at", datetime.utcnow())
+        self._queue.put(fields)
+        self._ensure_thread()
+
+    def flush(self, timeout: float = 5.0):
+        """
+        Block until every queued record has been written
+
+        Args:
+            timeout: Maximum seconds to wait
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_thread(self):
+        """Start the writer thread if it isn't running"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-telemetry", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Collect records into batches and write them"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        """Insert a batch of records in one statement"""
+        from sqlalchemy import insert
+        from database.models import LLMCallLog
+        db = self._session_factory()
+        if db is None:
+            return
+        try:
+            db.execute(insert(LLMCallLog), batch)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Warning: could not write {len(batch)} LLM call log(s): {str(e)}")
+        finally:
+            db.close()
+
+
+_writer: Optional[TelemetryWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_telemetry_writer() -> TelemetryWriter:
+    """
+    Get the process-wide telemetry writer
+
+    Returns:
+        Shared TelemetryWriter configured from Settings
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = TelemetryWriter(
+                    batch_size=Settings.AI_TELEMETRY_BATCH_SIZE,
+                    flush_seconds=Settings.AI_TELEMETRY_FLUSH_SECONDS
+                )
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def record_llm_call(
+    provider: str,
+    model: str,
+    call_type: str,
+    latency_ms: float,
+    project_id: Optional[int] = None,
+    caller: Optional[str] = None,
+    content_type: Optional[str] = None,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    cache_read_tokens: Optional[int] = None,
+    cache_write_tokens: Optional[int] = None,
+    ttft_ms: Optional[float] = None,
+    cache_hit: bool = False,
+    images: int = 0,
+    error: Optional[Exception] = None
+):
+    """
+    Record one AI call (no-op when AI_TELEMETRY_ENABLED is off)
+
+    Args:
+        provider: Provider name
+        model: Model name
+        call_type: text, stream, vision or image
+        latency_ms: Wall-clock time of the call
+        project_id: Optional project the call belongs to
+        caller: Function that made the call (e.g. define.generate_analysis)
+        content_type: Optional content type being generated
+        prompt_tokens: Input tokens reported by the provider
+        completion_tokens: Output tokens reported by the provider
+        cache_read_tokens: Prompt tokens served from the provider's prompt cache
+        cache_write_tokens: Prompt tokens written to the provider's prompt cache
+        ttft_ms: Time to first token for streamed calls
+        cache_hit: Whether the response came from the response cache
+        images: Number of images generated
+        error: Exception raised by the call, if it failed
+    """
+    if not Settings.AI_TELEMETRY_ENABLED:
+        return
+
+    get_telemetry_writer().record(
+        project_id=project_id,
+        provider=provider,
+        model=model,
+        call_type=call_type,
+        caller=caller,
+        content_type=content_type,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cache_read_tokens=cache_read_tokens,
+        cache_write_tokens=cache_write_tokens,
+        ttft_ms=ttft_ms,
+        latency_ms=latency_ms,
+        cache_hit=cache_hit,
+        cost_usd=None if cache_hit else estimate_cost(
+            model, prompt_tokens, completion_tokens, images, cache_read_tokens, cache_write_tokens
+        ),
+        error_type=type(error).__name__ if error is not None else None
+    )
@@ -7,10 +7,19 @@ import pytest
 from unittest.mock import Mock, patch
 from services.ai_service import AIService
 
+@pytest.fixture(autouse=True)
+def offline_settings(monkeypatch):
+    """Keep AI service tests away from the app database (no leases, call logs or disk cache)"""
+    from config.settings import Settings
+
+    monkeypatch.setattr(Settings, "AI_SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(Settings, "AI_TELEMETRY_ENABLED", False)
+    monkeypatch.setattr(Settings, "AI_CACHE_ENABLED", False)
+
 @pytest.fixture
 def ai_service():
-    """Create AI service instance"""
-    return AIService()
+    """Create AI service instance backed by the offline fake provider"""
+    return AIService(model="fake-fast")
 
 @pytest.fixture
 def sample_project():
@@ -30,12 +39,366 @@ def test_generate_interview_questions(mock_openai, ai_service, sample_project):
     mock_response.choices = [Mock(message=Mock(content="1. Question 1\n2. Question 2"))]
     mock_openai.return_value.chat.completions.create.return_value = mock_response
 
-    # Note: This test requires mocking OpenAI properly
-    # For now, we'll just test that the method exists
-    assert hasattr(ai_service, 'generate_interview_questions')
+    # Questions are generated through the generic chat call, which the
+    # fake provider answers offline
+    questions = ai_service._call_openai("You write interview questions", f"Goal: {sample_project['goal']}", use_cache=False)
+    assert questions.strip()
 
 def test_ai_service_initialization(ai_service):
     """Test AI service initialization"""
     assert ai_service is not None
     assert hasattr(ai_service, 'client')
     assert hasattr(ai_service, 'model')
+
+@pytest.fixture
+def response_cache():
+    """Response cache backed by an in-memory database"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from config.database import Base
+    from services.ai_cache import ResponseCache
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    cache = ResponseCache(max_entries=2, ttl_seconds=60, max_rows=3, session_factory=sessionmaker(bind=engine))
+    yield cache
+    engine.dispose()
+
+def test_response_cache_two_tiers(response_cache):
+    """Test memory hits, disk hits after LRU eviction, and misses"""
+    from services.ai_cache import ResponseCache
+
+    keys = [ResponseCache.make_key("gpt-4.1", 0.7, 100, "system", f"user {i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        response_cache.set(key, f"response {i}", project_id=1)
+
+    assert response_cache.get(keys[2]) == "response 2"  # memory
+    assert response_cache.get(keys[0]) == "response 0"  # evicted from memory, served from disk
+    assert response_cache.get("missing") is None
+
+    stats = response_cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["disk_hits"] == 1
+    assert stats["misses"] == 1
+
+def test_response_cache_invalidate_project(response_cache):
+    """Test per-project invalidation clears both tiers"""
+    response_cache.set("a", "project one", project_id=1)
+    response_cache.set("b", "project two", project_id=2)
+
+    assert response_cache.invalidate_project(1) == 1
+    assert response_cache.get("a") is None
+    assert response_cache.get("b") == "project two"
+
+def test_llm_registry_shares_clients(monkeypatch):
+    """Test that the registry hands out one client per (provider, model, base_url)"""
+    from config.settings import Settings
+    from services.llm_registry import LLMClientRegistry
+
+    monkeypatch.setattr(Settings, "OPENAI_API_KEY", "sk-test")
+    registry = LLMClientRegistry()
+    try:
+        assert registry.get_chat_model("gpt-4.1") is registry.get_chat_model("gpt-4.1")
+        assert registry.get_chat_model("gpt-4.1") is not registry.get_chat_model("gpt-4o")
+        assert registry.get_openai_client() is registry.get_openai_client()
+        assert registry.stats()["chat_models"] == 2
+    finally:
+        registry.close()
+
+def test_stream_text_accumulates_and_caches(monkeypatch):
+    """Test that streamed chunks are accumulated, persisted via on_complete and cached"""
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from config.settings import Settings
+    from services.ai_cache import ResponseCache
+
+    monkeypatch.setattr(Settings, "OPENAI_API_KEY", "sk-test")
+    service = AIService(model="gpt-4.1")
+    service.llm = GenericFakeChatModel(messages=iter([AIMessage(content="hello streaming world")]))
+    service.cache = ResponseCache(session_factory=lambda: None)
+
+    saved = []
+    chunks = list(service.stream_text("system", "user", on_complete=saved.append))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == "hello streaming world"
+    assert saved == ["hello streaming world"]
+    assert list(service.stream_text("system", "user")) == ["hello streaming world"]
+
+def test_regenerate_bypasses_response_cache():
+    """Test that use_cache=False calls the model again instead of replaying the cached response"""
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from services.ai_cache import ResponseCache
+
+    service = AIService(model="fake-fast")
+    service.llm = GenericFakeChatModel(messages=iter([AIMessage(content=text) for text in ("first", "second", "third")]))
+    service.cache = ResponseCache(session_factory=lambda: None)
+
+    assert service._call_openai("system", "ideas") == "first"
+    assert service._call_openai("system", "ideas") == "first"
+    assert service._call_openai("system", "ideas", use_cache=False) == "second"
+    assert "".join(service.stream_text("system", "ideas", use_cache=False)) == "third"
+
+def test_generate_many_runs_concurrently(monkeypatch):
+    """Test that batch generation keeps prompt order and overlaps the calls"""
+    import asyncio
+    import time
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+    from config.settings import Settings
+
+    async def slow_echo(messages):
+        await asyncio.sleep(0.2)
+        return AIMessage(content=messages[-1].content.upper())
+
+    monkeypatch.setattr(Settings, "OPENAI_API_KEY", "sk-test")
+    service = AIService(model="gpt-4.1")
+    service.llm = RunnableLambda(slow_echo)
+    service.cache = None
+
+    started = time.monotonic()
+    results = service.generate_many([("system", f"prompt {i}") for i in range(5)])
+
+    assert results == [f"PROMPT {i}" for i in range(5)]
+    assert time.monotonic() - started < 0.8
+
+def test_call_with_retry_honors_retry_after(monkeypatch):
+    """Test that a 429 is retried after the provider's Retry-After and other errors are typed"""
+    import httpx
+    from services import rate_limiter
+    from services.ai_errors import AIProviderError
+    from services.rate_limiter import ProviderRateLimiter, call_with_retry
+
+    class FakeStatusError(Exception):
+        def __init__(self, status_code, headers=None):
+            super().__init__(f"status {status_code}")
+            self.status_code = status_code
+            self.response = httpx.Response(status_code, headers=headers or {})
+
+    sleeps = []
+    monkeypatch.setattr(rate_limiter.time, "sleep", sleeps.append)
+    monkeypatch.setitem(rate_limiter._limiters, "openai", ProviderRateLimiter("openai", 1000, 1000000))
+
+    responses = iter([FakeStatusError(429, {"retry-after": "7"}), "ok"])
+
+    def flaky():
+        result = next(responses)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert call_with_retry(flaky, "openai", "gpt-4.1", 10) == "ok"
+    assert sleeps and sleeps[0] >= 7
+
+    def bad_request():
+        raise FakeStatusError(400)
+
+    with pytest.raises(AIProviderError) as excinfo:
+        call_with_retry(bad_request, "openai", "gpt-4.1", 10)
+    assert excinfo.value.status_code == 400
+
+def test_telemetry_writer_batches_records():
+    """Test that queued call records are written to llm_call_logs in the background"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from config.database import Base
+    from database.models import LLMCallLog
+    from services.telemetry import TelemetryWriter, estimate_cost
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    writer = TelemetryWriter(batch_size=10, flush_seconds=0.05, session_factory=session_factory)
+
+    for i in range(3):
+        writer.record(provider="openai", model="gpt-4.1", call_type="text", latency_ms=100.0 * (i + 1),
+                      caller="define.generate_analysis", prompt_tokens=1000, completion_tokens=500)
+    writer.flush()
+
+    db = session_factory()
+    try:
+        assert db.query(LLMCallLog).count() == 3
+    finally:
+        db.close()
+        engine.dispose()
+    assert estimate_cost("gpt-4.1-2025-04-14", 1_000_000, 0) == 2.00
+    assert estimate_cost("gpt-4.1-mini", 1_000_000, 0) == 0.40
+
+def test_prompt_builder_trims_by_priority():
+    """Test that high-priority sections are kept and equal-priority sections share the rest"""
+    from services.prompt_builder import PromptBuilder
+
+    builder = PromptBuilder(budget=1000, reserved=100, unit="chars")
+    builder.add("instructions", "keep me " * 25, priority=1)
+    builder.add("small", "short file", priority=0)
+    builder.add("large_a", "a " * 1000, priority=0)
+    builder.add("large_b", "b " * 1000, priority=0)
+    sections = builder.fit()
+    report = builder.report()
+
+    assert sections["instructions"] == "keep me " * 25
+    assert sections["small"] == "short file"
+    assert report["large_a"]["truncated"] and report["large_b"]["truncated"]
+    assert abs(report["large_a"]["used"] - report["large_b"]["used"]) <= 10
+    assert sum(item["used"] for item in report.values()) <= 900
+
+def test_static_system_prompts_marked_cacheable(monkeypatch):
+    """Test that system prompts are static and carry an Anthropic cache breakpoint"""
+    from config.settings import Settings
+    from prompts.summary import DEFINE_STAGE_SUMMARY_PROMPT, IDEATE_STAGE_SUMMARY_PROMPT
+    from prompts.implement.roadmap_generation import ROADMAP_SYSTEM_PROMPT
+    from prompts.implement.task_generation import TASKS_SYSTEM_PROMPT
+
+    for prompt in (DEFINE_STAGE_SUMMARY_PROMPT, IDEATE_STAGE_SUMMARY_PROMPT):
+        assert "{project_name}" not in prompt
+
+    for prompt in (ROADMAP_SYSTEM_PROMPT, TASKS_SYSTEM_PROMPT):
+        assert "{project_name}" not in prompt and "{{" not in prompt
+
+    monkeypatch.setattr(Settings, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(Settings, "ANTHROPIC_API_KEY", "sk-ant-test")
+    system_message, user_message = AIService(model="claude-sonnet-4-5")._build_messages(ROADMAP_SYSTEM_PROMPT, "project")
+    assert system_message.content[0]["text"] == ROADMAP_SYSTEM_PROMPT
+    assert system_message.content[0]["cache_control"] == {"type": "ephemeral"}
+    assert user_message.content == "project"
+
+def test_hedged_race_prefers_first_good_response():
+    """Test that a slow primary is hedged and cancelled, and a fast one is not"""
+    import asyncio
+    from services.hedging import hedged_race
+
+    started = []
+    cancelled = []
+
+    def request(name, seconds, fail=False):
+        async def run():
+            started.append(name)
+            try:
+                await asyncio.sleep(seconds)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+            if fail:
+                raise RuntimeError(name)
+            return name
+        return run
+
+    assert asyncio.run(hedged_race(request("primary", 1.0), request("secondary", 0.01), 0.05)) == ("secondary", 1)
+    assert cancelled == ["primary"]
+
+    started.clear()
+    assert asyncio.run(hedged_race(request("primary", 0.01), request("secondary", 0.01), 0.5)) == ("primary", 0)
+    assert started == ["primary"]
+
+    assert asyncio.run(hedged_race(request("primary", 0.01, fail=True), request("secondary", 0.01), 0.5)) == ("secondary", 1)
+
+def test_hedge_delay_per_kind(monkeypatch):
+    """Test that first tokens use a capped delay and full responses wait for their own p95"""
+    from config.settings import Settings
+    from services import hedging
+
+    monkeypatch.setattr(hedging, "_tracker", hedging.LatencyTracker(session_factory=lambda: None))
+    monkeypatch.setattr(Settings, "AI_HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(Settings, "AI_HEDGE_MAX_DELAY_SECONDS", 10.0)
+
+    assert hedging.get_hedge_delay("gpt-4.1", "ttft") == 10.0
+    assert hedging.get_hedge_delay("gpt-4.1", "latency") is None
+
+    for milliseconds in (20000, 30000, 45000):
+        hedging.get_latency_tracker().observe("gpt-4.1", "latency", milliseconds)
+        hedging.get_latency_tracker().observe("gpt-4.1", "ttft", milliseconds)
+    assert hedging.get_hedge_delay("gpt-4.1", "latency") == 45.0
+    assert hedging.get_hedge_delay("gpt-4.1", "ttft") == 10.0
+
+def test_vision_accepts_bytes_and_base64(monkeypatch):
+    """Test that vision calls send images inline from bytes or stored Base64"""
+    import base64
+    from config.settings import Settings
+
+    monkeypatch.setattr(Settings, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(Settings, "AI_VISION_PREPROCESS", False)
+    service = AIService(model="gpt-4.1")
+    service.client = Mock()
+    service.client.chat.completions.create.return_value = Mock(
+        choices=[Mock(message=Mock(content="A login form"))], usage=None
+    )
+
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+    encoded = base64.b64encode(png).decode("ascii")
+    for image in (png, memoryview(png), encoded):
+        assert service.analyze_image_with_vision(image, "Describe") == "A login form"
+        content = service.client.chat.completions.create.call_args.kwargs["messages"][-1]["content"]
+        assert content[1]["image_url"]["url"] == f"data:image/png;base64,{encoded}"
+
+def test_prepare_for_vision_downscales_and_strips_metadata():
+    """Test that large uploads are resized to the vision resolution and re-encoded"""
+    from io import BytesIO
+    from PIL import Image
+    from services.image_processor import prepare_for_vision, estimate_vision_tokens
+
+    photo = Image.new("RGBA", (4000, 3000), (20, 40, 60, 255))
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"
+    upload = BytesIO()
+    photo.save(upload, format="PNG", exif=exif)
+
+    data, mime_type, detail, tokens = prepare_for_vision(upload.getvalue())
+    prepared = Image.open(BytesIO(data))
+
+    assert (mime_type, detail, prepared.format) == ("image/jpeg", "high", "JPEG")
+    assert prepared.size == (1024, 768)
+    assert not prepared.getexif()
+    assert len(data) < len(upload.getvalue())
+    assert tokens == estimate_vision_tokens(4000, 3000) == 85 + 170 * 4
+
+    icon = BytesIO()
+    Image.new("RGB", (300, 200)).save(icon, format="PNG")
+    assert prepare_for_vision(icon.getvalue())[2:] == ("low", 85)
+
+def test_fake_provider_and_cassette_replay(monkeypatch, tmp_path):
+    """Test that the fake provider is deterministic and cassettes replay it without a provider"""
+    from config.settings import Settings
+    from services import cassette
+
+    monkeypatch.setattr(Settings, "AI_CASSETTE_PATH", str(tmp_path / "ai.jsonl"))
+    monkeypatch.setattr(cassette, "_cassettes", {})
+
+    service = AIService(model="fake-fast")
+    text = service._call_openai("system", "Describe the persona")
+    assert text == AIService(model="fake-fast")._call_openai("system", "Describe the persona")
+
+    monkeypatch.setattr(Settings, "AI_CASSETTE_MODE", "record")
+    recorded = "".join(AIService(model="fake-fast").stream_text("system", "Summarize interviews"))
+    assert len(cassette.get_cassette()) == 1
+
+    monkeypatch.setattr(Settings, "AI_CASSETTE_MODE", "replay")
+    monkeypatch.setattr(cassette, "_cassettes", {})
+    replay = AIService(model="claude-sonnet-4-5-20250929")
+    assert replay.provider == "fake"
+    assert replay._call_openai("system", "Summarize interviews") == recorded
+    with pytest.raises(Exception):
+        replay._call_openai("system", "Never recorded")
+
+def test_generate_structured_repairs_instead_of_regenerating():
+    """Test that truncated output is recovered locally and invalid output gets one repair call"""
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from prompts.implement.schemas import TaskBreakdown
+
+    task = '{"title": "Login", "description": "Build login", "priority": "high"}'
+    truncated = '```json\n{"tasks": [' + task + ', {"title": "Dashb'
+    invalid = '{"tasks": [{"title": "Login", "description": "Build login", "priority": "urgent"}]}'
+    responses = iter([AIMessage(content=truncated), AIMessage(content=invalid), AIMessage(content='{"tasks": [' + task + ']}')])
+
+    service = AIService(model="fake-fast")
+    service.llm = GenericFakeChatModel(messages=responses)
+
+    result = service.generate_structured("system", "make tasks", TaskBreakdown)
+    assert [item.title for item in result.tasks] == ["Login"]
+
+    result = service.generate_structured("system", "make more tasks", TaskBreakdown)
+    assert result.tasks[0].priority == "high"
+    assert next(responses, None) is None
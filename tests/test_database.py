@@ -4,11 +4,12 @@ Test database connections and CRUD operations
 """
 
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from config.database import Base
 from database.models import Project, StageProgress
 from database.crud.projects import create_project, get_project, list_projects
+from database.crud.llm_calls import get_llm_call_summary
 
 # Test database URL
 TEST_DATABASE_URL = "sqlite:///:memory:"
@@ -59,3 +60,486 @@ def test_list_projects(test_db):
 
     projects = list_projects(test_db)
     assert len(projects) == 2
+
+def test_llm_call_summary(test_db):
+    """Test p50/p95 latency summary per content type"""
+    from database.models import LLMCallLog
+
+    for latency in range(1, 21):
+        test_db.add(LLMCallLog(provider="openai", model="gpt-4.1", call_type="text", content_type="persona",
+                               latency_ms=latency * 100.0, prompt_tokens=100, completion_tokens=50))
+    test_db.add(LLMCallLog(provider="openai", model="gpt-4.1", call_type="text", content_type="persona",
+                           latency_ms=1.0, cache_hit=True))
+    test_db.add(LLMCallLog(provider="openai", model="gpt-4.1", call_type="text", caller="ideate.expand_idea",
+                           latency_ms=50.0))
+    test_db.commit()
+
+    summary = get_llm_call_summary(test_db)
+
+    assert [row["content_type"] for row in summary] == ["persona", "ideate.expand_idea"]
+    assert summary[0]["calls"] == 21
+    assert summary[0]["cache_hits"] == 1
+    assert summary[0]["p50_latency_ms"] == 1000.0
+    assert summary[0]["p95_latency_ms"] == 1900.0
+    assert summary[0]["p50_tokens"] == 150
+
+def test_job_runner_runs_and_recovers_jobs(tmp_path):
+    """Test background jobs: progress, results, failures and restart recovery"""
+    import time
+    from datetime import datetime, timedelta
+    from database.models import GenerationJob
+    from database.crud.jobs import get_job
+    from services.job_runner import JobRunner
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    db = SessionFactory()
+    project = create_project(db=db, name="Jobs", area="Testing", goal="Run jobs")
+
+    def summarize(job, job_db, progress):
+        progress(0.5, "Halfway")
+        return {"echo": job.params["text"].upper()}
+
+    def explode(job, job_db, progress):
+        raise ValueError("Failed to parse AI response")
+
+    runner = JobRunner(max_workers=2, session_factory=SessionFactory,
+                       handlers={"summary": summarize, "broken": explode})
+
+    def wait_for(job_id):
+        for _ in range(200):
+            db.expire_all()
+            job = get_job(db, job_id)
+            if job.status not in ("queued", "running"):
+                return job
+            time.sleep(0.01)
+        raise AssertionError("job did not finish")
+
+    ok = wait_for(runner.submit(project.id, "summary", {"text": "hello"}))
+    assert (ok.status, ok.result, ok.progress, ok.attempts) == ("succeeded", {"echo": "HELLO"}, 1.0, 1)
+
+    failed = wait_for(runner.submit(project.id, "broken"))
+    assert failed.status == "failed" and "parse" in failed.error
+
+    # A job left "running" by a process that died is re-queued and finished
+    orphan = GenerationJob(project_id=project.id, job_type="summary", status="running", params={"text": "again"},
+                           attempts=1, heartbeat_at=datetime.utcnow() - timedelta(minutes=10))
+    db.add(orphan)
+    db.commit()
+    assert runner.recover(stale_after_seconds=60) == 1
+    resumed = wait_for(orphan.id)
+    assert (resumed.status, resumed.result, resumed.attempts) == ("succeeded", {"echo": "AGAIN"}, 2)
+
+    runner.shutdown()
+    db.close()
+    engine.dispose()
+
+def test_single_flight_dedupes_and_takes_over_expired_leases(tmp_path):
+    """Test that concurrent identical requests share one call and crashed holders are replaced"""
+    import threading
+    import time
+    from datetime import datetime, timedelta
+    from database.models import GenerationLease
+    from services.single_flight import SingleFlight
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'leases.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    flight = SingleFlight(lease_seconds=30, poll_seconds=0.01, wait_seconds=5, session_factory=SessionFactory)
+
+    calls = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.2)
+        return "roadmap"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.run("key-1", generate))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("roadmap", False), ("roadmap", True), ("roadmap", True)]
+    assert flight.run("key-1", generate, accept_done=False) == ("roadmap", False)
+    assert len(calls) == 2
+
+    db = SessionFactory()
+    db.add(GenerationLease(lease_key="key-2", holder="crashed", status="running",
+                           expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+    db.close()
+    assert flight.run("key-2", lambda: "fresh") == ("fresh", False)
+
+    with pytest.raises(ValueError):
+        flight.run("key-3", lambda: (_ for _ in ()).throw(ValueError("provider down")))
+    assert flight.run("key-3", lambda: "retried") == ("retried", False)
+    engine.dispose()
+
+def test_compressed_text_columns(test_db):
+    """Test that large text is stored compressed and legacy plain-text rows still read"""
+    from sqlalchemy import text
+    from database.models import GeneratedContent
+    from database.types import decompress_text, is_compressed
+
+    project = create_project(db=test_db, name="Compress", area="Testing", goal="Store less")
+    content = "## Persona\n" + "Users want quick feedback on their progress. " * 200
+    test_db.add(GeneratedContent(project_id=project.id, content_type="persona", content=content))
+    test_db.commit()
+    test_db.execute(text(
+        "INSERT INTO generated_content (project_id, content_type, content) VALUES (:project_id, 'legacy', 'plain text')"
+    ), {"project_id": project.id})
+    test_db.commit()
+    test_db.expire_all()
+
+    stored = test_db.execute(text("SELECT content FROM generated_content ORDER BY id")).scalars().all()
+    assert is_compressed(stored[0]) and len(stored[0]) < len(content) / 4
+    assert decompress_text(stored[0]) == content
+    rows = test_db.query(GeneratedContent).order_by(GeneratedContent.id).all()
+    assert [row.content for row in rows] == [content, "plain text"]
+
+def test_sqlite_engine_profile(tmp_path):
+    """Test that app engines open SQLite in WAL mode with the tuned pragmas"""
+    from config.database import create_app_engine, describe_engine
+
+    engine = create_app_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    settings = describe_engine(engine)
+    assert settings["journal_mode"] == "wal"
+    assert settings["synchronous"] == 1  # NORMAL
+    assert settings["busy_timeout"] == 5000
+    assert settings["echo"] is False
+    engine.dispose()
+
+def test_hot_queries_use_composite_indexes(test_db):
+    """Test via EXPLAIN QUERY PLAN that the per-project lookups are index searches without a sort"""
+    from database.models import (
+        GeneratedContent, StageSummary, BrainstormIdea, IdeaCategorization,
+        SketchIteration, MockupIteration, TestFeedback, TestInsight
+    )
+
+    hot_queries = [
+        (test_db.query(GeneratedContent).filter(
+            GeneratedContent.project_id == 1, GeneratedContent.content_type == "persona"
+        ).order_by(GeneratedContent.created_at.desc()).limit(1), "ix_generated_content_project_type_created"),
+        (test_db.query(StageSummary).filter(
+            StageSummary.project_id == 1, StageSummary.stage == "define"
+        ).order_by(StageSummary.version.desc()).limit(1), "uq_stage_summaries_project_stage_version"),
+        (test_db.query(BrainstormIdea).filter(
+            BrainstormIdea.project_id == 1, BrainstormIdea.idea_type == "expansion"
+        ).order_by(BrainstormIdea.created_at), "ix_brainstorm_ideas_project_type_created"),
+        (test_db.query(IdeaCategorization).filter(
+            IdeaCategorization.project_id == 1
+        ).order_by(IdeaCategorization.updated_at.desc()).limit(1), "ix_idea_categorizations_project_updated"),
+        (test_db.query(SketchIteration).filter(
+            SketchIteration.prototype_page_id == 1
+        ).order_by(SketchIteration.iteration_number), "uq_sketch_iterations_page_iteration"),
+        (test_db.query(MockupIteration).filter(
+            MockupIteration.prototype_page_id == 1
+        ).order_by(MockupIteration.iteration_number), "uq_mockup_iterations_page_iteration"),
+        (test_db.query(TestFeedback).filter(TestFeedback.user_test_id == 1), "ix_test_feedback_user_test"),
+        (test_db.query(TestInsight).filter(TestInsight.user_test_id == 1), "ix_test_insights_user_test_priority"),
+    ]
+
+    for query, index_name in hot_queries:
+        sql = str(query.statement.compile(test_db.get_bind(), compile_kwargs={"literal_binds": True}))
+        plan = " | ".join(row[-1] for row in test_db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+        assert f"USING INDEX {index_name}" in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+
+def test_blob_store_dedupes_images_and_reads_legacy_rows(test_db, tmp_path):
+    """Test that identical images share one blob and Base64 rows still load"""
+    import base64
+    from database.models import SketchIteration, PrototypePage
+    from services.blob_store import FileBlobStore, store_image, load_image
+
+    store = FileBlobStore(tmp_path / "blobs")
+    image = b"\x89PNG\r\n\x1a\n" + b"not really a png" * 10
+
+    project = create_project(test_db, "Blob Project", "Area", "Goal")
+    page = PrototypePage(project_id=project.id, page_name="Home", order_index=1)
+    test_db.add(page)
+    test_db.commit()
+
+    first = SketchIteration(prototype_page_id=page.id, iteration_number=1, **store_image(image, store))
+    second = SketchIteration(prototype_page_id=page.id, iteration_number=2, **store_image(image, store))
+    legacy = SketchIteration(prototype_page_id=page.id, iteration_number=3,
+                             image_data=base64.b64encode(image).decode("utf-8"))
+    test_db.add_all([first, second, legacy])
+    test_db.commit()
+
+    assert first.image_sha256 == second.image_sha256
+    assert first.image_size == len(image)
+    assert len([path for path in (tmp_path / "blobs").rglob("*") if path.is_file()]) == 1
+    assert bytes(store.view(first.image_sha256)) == image
+    assert load_image(first, store) == image
+    assert load_image(legacy, store) == image
+    assert store.get("0" * 64) is None
+
+def test_iteration_listing_defers_images(test_db):
+    """Test that iteration listings leave image data unloaded until it is requested"""
+    import base64
+    from sqlalchemy import inspect as inspect_instance
+    from database.models import SketchIteration, PrototypePage
+    from database.crud.prototypes import list_sketch_iterations, get_iteration_image
+
+    image = b"legacy image bytes" * 100
+    project = create_project(test_db, "Listing Project", "Area", "Goal")
+    page = PrototypePage(project_id=project.id, page_name="Home", order_index=1)
+    test_db.add(page)
+    test_db.commit()
+    for number in (1, 2):
+        test_db.add(SketchIteration(prototype_page_id=page.id, iteration_number=number,
+                                    image_data=base64.b64encode(image).decode("utf-8"),
+                                    user_instructions=f"v{number}", ai_analysis="analysis"))
+    test_db.commit()
+    page_id = page.id
+    test_db.expunge_all()
+
+    sketches = list_sketch_iterations(test_db, page_id)
+    assert [sketch.iteration_number for sketch in sketches] == [1, 2]
+    unloaded = inspect_instance(sketches[0]).unloaded
+    assert {"image_data", "ai_analysis"} <= unloaded
+    assert "user_instructions" not in unloaded
+
+    assert get_iteration_image(test_db, SketchIteration, sketches[1].id) == image
+    assert get_iteration_image(test_db, SketchIteration, 999) is None
+    assert sketches[0].ai_analysis == "analysis"  # Loaded on access
+
+def test_image_variants_are_small_webp_copies(tmp_path):
+    """Test that variants are downscaled WebP stored next to the original, with the original as fallback"""
+    from io import BytesIO
+    from PIL import Image
+    from services.blob_store import FileBlobStore, store_image
+    from services.image_variants import VARIANT_THUMB, VARIANT_DISPLAY, create_variants, load_variant
+
+    store = FileBlobStore(tmp_path / "blobs")
+    output = BytesIO()
+    Image.new("RGB", (2000, 1000), (40, 120, 200)).save(output, format="PNG")
+    original = output.getvalue()
+
+    class Row:
+        image_data = None
+    row = Row()
+    row.image_sha256 = store_image(original, store)["image_sha256"]
+
+    assert store.get_variant(row.image_sha256, VARIANT_THUMB) is None
+    assert sorted(create_variants(row.image_sha256, store)) == [VARIANT_DISPLAY, VARIANT_THUMB]
+    assert create_variants(row.image_sha256, store) == []
+
+    thumb = load_variant(row, VARIANT_THUMB, store)
+    with Image.open(BytesIO(thumb)) as picture:
+        assert picture.format == "WEBP"
+        assert max(picture.size) == 256
+    assert store.variant_path(row.image_sha256, VARIANT_THUMB).parent == store.path(row.image_sha256).parent
+
+    missing = Row()
+    missing.image_sha256 = None
+    missing.image_data = None
+    assert load_variant(missing, VARIANT_THUMB, store) is None
+
+def test_test_results_and_context_use_constant_queries(test_db):
+    """Test that loading test results and stage context does not issue a query per test or stage"""
+    from sqlalchemy import event
+    from database.models import UserTest, TestFeedback, TestInsight, PrototypePage, StageSummary
+    from database.crud.user_tests import list_user_tests, list_insights_by_priority
+    from database.crud.stages import get_latest_stage_summaries
+
+    project = create_project(test_db, "Results Project", "Area", "Goal")
+    page = PrototypePage(project_id=project.id, page_name="Home", order_index=1)
+    test_db.add(page)
+    test_db.flush()
+    for number in range(5):
+        user_test = UserTest(project_id=project.id, prototype_page_id=page.id, test_type="feedback",
+                             test_name=f"Test {number}", participant_count=2)
+        user_test.feedback_items = [TestFeedback(feedback_text="ok", rating=4) for _ in range(2)]
+        user_test.insights = [TestInsight(insight_type="issue", insight_text=f"{priority} {number}", priority=priority)
+                              for priority in ("critical", "low")]
+        test_db.add(user_test)
+    for stage, versions in (("define", 3), ("ideate", 1)):
+        for version in range(1, versions + 1):
+            test_db.add(StageSummary(project_id=project.id, stage=stage, summary_text=f"{stage} v{version}", version=version))
+    test_db.commit()
+    project_id = project.id
+    test_db.expunge_all()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(test_db.get_bind(), "before_cursor_execute", listener)
+    try:
+        tests = list_user_tests(test_db, project_id)
+        rendered = [(test.prototype_page.page_name, len(test.feedback_items), len(test.insights)) for test in tests]
+        assert rendered == [("Home", 2, 2)] * 5
+        assert len(statements) == 4  # Tests + one batch per relationship
+
+        statements.clear()
+        insights = list_insights_by_priority(test_db, project_id, ["critical", "high"])
+        assert [(insight.user_test.test_name, insight.insight_text) for insight in insights] == [
+            (f"Test {number}", f"critical {number}") for number in range(5)
+        ]
+        assert len(statements) == 1
+
+        statements.clear()
+        summaries = get_latest_stage_summaries(test_db, project_id, ["empathise", "define", "ideate"])
+        assert {stage: summary.version for stage, summary in summaries.items()} == {"define": 3, "ideate": 1}
+        assert len(statements) == 1
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", listener)
+
+def test_sequence_numbers_are_unique_under_concurrency(tmp_path):
+    """Test that concurrent sessions never get the same iteration number"""
+    import threading
+    from sqlalchemy.exc import IntegrityError
+    from config.database import create_app_engine
+    from database.models import SketchIteration, PrototypePage
+    from database.crud.sequences import next_iteration_number
+
+    engine = create_app_engine(f"sqlite:///{tmp_path / 'sequences.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    setup = Session()
+    project = create_project(setup, "Sequence Project", "Area", "Goal")
+    page = PrototypePage(project_id=project.id, page_name="Home", order_index=1)
+    setup.add(page)
+    setup.commit()
+    page_id = page.id
+    # Rows created before the counter existed are continued from
+    setup.add(SketchIteration(prototype_page_id=page_id, iteration_number=1))
+    setup.commit()
+    setup.close()
+
+    errors = []
+    def add_iterations():
+        for _ in range(5):
+            db = Session()
+            try:
+                number = next_iteration_number(db, SketchIteration, page_id)
+                db.add(SketchIteration(prototype_page_id=page_id, iteration_number=number))
+                db.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=add_iterations) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = Session()
+    numbers = sorted(number for (number,) in db.query(SketchIteration.iteration_number))
+    assert errors == []
+    assert numbers == list(range(1, 22))
+
+    # The unique index rejects a duplicate written around the allocator
+    db.add(SketchIteration(prototype_page_id=page_id, iteration_number=3))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.close()
+    engine.dispose()
+
+def test_bulk_insert_is_one_statement_with_ids(test_db):
+    """Test that bulk_insert writes all rows in one INSERT and returns their ids in order"""
+    from sqlalchemy import event
+    from database.models import BrainstormIdea
+    from database.crud.bulk import bulk_insert
+
+    project = create_project(test_db, "Bulk Project", "Area", "Goal")
+    rows = [
+        {"project_id": project.id, "idea_type": "seed_practical", "idea_text": f"Idea {number}", "order_index": number}
+        for number in range(300)
+    ]
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(test_db.get_bind(), "before_cursor_execute", listener)
+    try:
+        ids = bulk_insert(test_db, BrainstormIdea, rows)
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", listener)
+
+    assert len([statement for statement in statements if statement.startswith("INSERT")]) == 1
+    ideas = {idea.id: idea for idea in test_db.query(BrainstormIdea).filter(BrainstormIdea.project_id == project.id)}
+    assert [ideas[idea_id].order_index for idea_id in ids] == list(range(300))
+    assert all(idea.created_at is not None for idea in ideas.values())  # Column defaults applied
+    assert bulk_insert(test_db, BrainstormIdea, []) == []
+
+def test_incomplete_blob_store_fails_on_construction():
+    """Test that a blob store missing interface methods cannot be created"""
+    from services.blob_store import BlobStore
+
+    class PutOnlyStore(BlobStore):
+        def put(self, data):
+            return "digest"
+
+    with pytest.raises(TypeError):
+        PutOnlyStore()
+
+def test_create_iteration_with_database_blob_store(tmp_path):
+    """Test that saving an iteration does not lock out the database blob store on SQLite"""
+    from database.models import PrototypePage, MockupIteration, ImageBlob
+    from database.crud.prototypes import create_iteration
+    from services.blob_store import DatabaseBlobStore, load_image
+
+    # A short busy timeout turns a lock wait into an immediate failure
+    engine = create_engine(f"sqlite:///{tmp_path / 'blobs.db'}", connect_args={"timeout": 0.5})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    store = DatabaseBlobStore(Session)
+
+    db = Session()
+    project = create_project(db, "Blob DB Project", "Area", "Goal")
+    page = PrototypePage(project_id=project.id, page_name="Home", order_index=1)
+    db.add(page)
+    db.commit()
+
+    image = b"generated mockup bytes" * 50
+    first = create_iteration(db, MockupIteration, page.id, image, store, generation_prompt="prompt")
+    second = create_iteration(db, MockupIteration, page.id, image, store,
+                              generation_prompt="prompt", user_refinement="bigger buttons")
+
+    assert (first.iteration_number, second.iteration_number) == (1, 2)
+    assert db.query(ImageBlob).count() == 1
+    assert load_image(second, store) == image
+    db.close()
+    engine.dispose()
+
+def test_move_images_migration_with_database_blob_store(tmp_path, monkeypatch):
+    """Test that legacy Base64 images move into the image_blobs table"""
+    import base64
+    from config.settings import Settings
+    from database.models import PrototypePage, SketchIteration, MockupIteration, ImageBlob
+    from migrations.move_images_to_blob_store import run_migration
+
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    project = create_project(db, "Legacy Project", "Area", "Goal")
+    page = PrototypePage(project_id=project.id, page_name="Home", order_index=1)
+    db.add(page)
+    db.commit()
+    images = [f"legacy image {number}".encode() * 20 for number in range(3)]
+    for number, image in enumerate(images, start=1):
+        encoded = base64.b64encode(image).decode("utf-8")
+        db.add(SketchIteration(prototype_page_id=page.id, iteration_number=number, image_data=encoded))
+        db.add(MockupIteration(prototype_page_id=page.id, iteration_number=number, image_data=encoded,
+                               generation_prompt="prompt"))
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(Settings, "DATABASE_URL", url)
+    monkeypatch.setattr(Settings, "BLOB_STORE", "database")
+    assert run_migration() is True
+
+    db = sessionmaker(bind=engine)()
+    assert db.query(ImageBlob).count() == 3  # Sketches and mockups share blobs
+    for model in (SketchIteration, MockupIteration):
+        rows = db.query(model.image_sha256, model.image_size, model.image_data).order_by(model.id).all()
+        assert [row.image_size for row in rows] == [len(image) for image in images]
+        assert all(row.image_sha256 and row.image_data is None for row in rows)
+    db.close()
+    engine.dispose()